@@ -0,0 +1 @@
+"""Load and micro benchmarks for the Investment Report Generator"""
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""Run src.api.main:app in one process with event-loop lag and RSS probes.
+
+Started by load_api.py with LLM_PROVIDER=fake; not meant for production.
+"""
+
+import argparse
+import asyncio
+import resource
+import sys
+from pathlib import Path
+from typing import List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import uvicorn
+
+from benchmarks.common import summarize
+from src.api.main import app
+
+LAG_INTERVAL = 0.05
+
+_lag_samples: List[float] = []
+
+
+async def _sample_loop_lag() -> None:
+    """Measure how late the event loop wakes up from a fixed sleep"""
+    loop = asyncio.get_running_loop()
+    while True:
+        started = loop.time()
+        await asyncio.sleep(LAG_INTERVAL)
+        _lag_samples.append(max(0.0, loop.time() - started - LAG_INTERVAL))
+
+
+async def probe():
+    """Report loop lag and peak RSS collected since startup"""
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = maxrss / 1024 if sys.platform != "darwin" else maxrss / (1024 * 1024)
+    return {
+        "event_loop_lag": summarize(_lag_samples),
+        "peak_rss_mb": round(peak_rss_mb, 1),
+    }
+
+
+async def serve(host: str, port: int) -> None:
+    app.add_api_route("/_bench/probe", probe, methods=["GET"], include_in_schema=False)
+    server = uvicorn.Server(uvicorn.Config(app, host=host, port=port, log_level="warning"))
+    sampler = asyncio.create_task(_sample_loop_lag())
+    try:
+        await server.serve()
+    finally:
+        sampler.cancel()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+    asyncio.run(serve(args.host, args.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""Shared helpers for benchmark scripts"""
+
+import subprocess
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Get the q-th percentile (0-100) of samples using linear interpolation"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = (len(ordered) - 1) * q / 100.0
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+
+def summarize(samples: List[float], scale: float = 1000.0) -> Dict[str, float]:
+    """Summarize latency samples in seconds as milliseconds"""
+    return {
+        "count": len(samples),
+        "mean_ms": round(sum(samples) / len(samples) * scale, 3) if samples else 0.0,
+        "p50_ms": round(percentile(samples, 50) * scale, 3),
+        "p95_ms": round(percentile(samples, 95) * scale, 3),
+        "p99_ms": round(percentile(samples, 99) * scale, 3),
+        "max_ms": round(max(samples) * scale, 3) if samples else 0.0,
+    }
+
+
+def git_commit() -> Optional[str]:
+    """Get the current commit hash so results can be compared across commits"""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_metadata(config: Dict[str, Any]) -> Dict[str, Any]:
+    """Common metadata block for benchmark result files"""
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "config": config,
+    }
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""End-to-end load benchmark for the FastAPI service.
+
+Starts src.api.main:app in a separate process against the offline fake
+provider, drives it with concurrent analyses drawn from a ticker-set mix
+while polling /health, and writes machine-readable JSON results.
+
+Example:
+    python benchmarks/load_api.py --concurrency 16 --analyses 200 \\
+        --mix tech,semis,large --output bench_output.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import httpx
+
+from benchmarks.common import REPO_ROOT, run_metadata, summarize
+
+TICKER_MIXES = {
+    "single": [["AAPL"]],
+    "tech": [["AAPL", "MSFT", "GOOGL"]],
+    "semis": [["NVDA", "AMD", "INTC"]],
+    "sectors": [
+        ["TSLA", "F", "GM"], ["JPM", "BAC", "GS"], ["AMZN", "WMT", "TGT"],
+        ["PFE", "JNJ", "MRNA"], ["XOM", "CVX", "BP"],
+    ],
+    "large": [["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "AVGO", "ORCL", "CRM"]],
+}
+
+LONG_MESSAGE = (
+    "Generate comprehensive investment analysis and portfolio allocation recommendations. "
+    "Focus on supply chain exposure, margin pressure, capital allocation and regulatory risk. " * 8
+)
+
+
+class LoadRun:
+    """Collects per-endpoint latencies and errors for one benchmark run"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.statuses: Dict[str, int] = defaultdict(int)
+        self.request_ids: List[str] = []
+
+    async def timed(self, name: str, call) -> Any:
+        started = time.perf_counter()
+        try:
+            response = await call()
+        except httpx.HTTPError:
+            self.errors[name] += 1
+            return None
+        self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors[name] += 1
+        return response
+
+
+async def _analysis_worker(client: httpx.AsyncClient, run: LoadRun, jobs: asyncio.Queue, rng: random.Random, long_ratio: float):
+    while True:
+        try:
+            companies = jobs.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        message = LONG_MESSAGE if rng.random() < long_ratio else None
+        payload = {"companies": companies}
+        if message:
+            payload["message"] = message
+
+        response = await run.timed("POST /analyses", lambda: client.post("/analyses", json=payload))
+        if response is None or response.status_code != 201:
+            continue
+        body = response.json()
+        run.statuses[body["status"]] += 1
+        run.request_ids.append(body["request_id"])
+
+        await run.timed("GET /analyses/{id}", lambda: client.get(f"/analyses/{body['request_id']}"))
+        await run.timed("GET /analyses", lambda: client.get("/analyses", params={"limit": 50}))
+
+
+async def _health_poller(client: httpx.AsyncClient, run: LoadRun, interval: float, stop: asyncio.Event):
+    while not stop.is_set():
+        await run.timed("GET /health", lambda: client.get("/health"))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def _wait_ready(client: httpx.AsyncClient, timeout: float = 30.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("Benchmark server did not become ready")
+
+
+async def drive(args) -> Dict[str, Any]:
+    rng = random.Random(args.seed)
+    mix = [tickers for name in args.mix.split(",") for tickers in TICKER_MIXES[name]]
+    jobs: asyncio.Queue = asyncio.Queue()
+    for _ in range(args.analyses):
+        jobs.put_nowait(rng.choice(mix))
+
+    run = LoadRun()
+    base_url = f"http://127.0.0.1:{args.port}"
+    limits = httpx.Limits(max_connections=args.concurrency + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        await _wait_ready(client)
+
+        stop = asyncio.Event()
+        poller = asyncio.create_task(_health_poller(client, run, args.health_interval, stop))
+        started = time.perf_counter()
+        await asyncio.gather(*[
+            _analysis_worker(client, run, jobs, random.Random(rng.random()), args.long_message_ratio)
+            for _ in range(args.concurrency)
+        ])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await poller
+
+        phases = (await client.get("/stats/phases")).json()
+        probe = (await client.get("/_bench/probe")).json()
+
+    completed = len(run.request_ids)
+    total_requests = sum(len(samples) for samples in run.latencies.values())
+    return {
+        "duration_s": round(elapsed, 3),
+        "throughput": {
+            "analyses_per_s": round(completed / elapsed, 3),
+            "requests_per_s": round(total_requests / elapsed, 3),
+        },
+        "analyses": {"submitted": args.analyses, "returned": completed, "by_status": dict(run.statuses)},
+        "endpoints": {
+            name: {**summarize(samples), "errors": run.errors.get(name, 0)}
+            for name, samples in sorted(run.latencies.items())
+        },
+        "phases": phases,
+        "event_loop_lag": probe["event_loop_lag"],
+        "peak_rss_mb": probe["peak_rss_mb"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, default=8, help="Concurrent analysis clients")
+    parser.add_argument("--analyses", type=int, default=50, help="Total analyses to submit")
+    parser.add_argument("--mix", default="single,tech,sectors", help=f"Comma-separated ticker mixes: {', '.join(TICKER_MIXES)}")
+    parser.add_argument("--long-message-ratio", type=float, default=0.2, help="Share of requests with a long custom message")
+    parser.add_argument("--health-interval", type=float, default=0.1, help="Seconds between /health polls")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--ttft-ms", type=float, default=400.0, help="Fake provider time to first token")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0, help="Fake provider output rate")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake provider 503 rate")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fake provider 429 rate")
+    parser.add_argument("--output", type=Path, default=None, help="Write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    unknown = set(args.mix.split(",")) - set(TICKER_MIXES)
+    if unknown:
+        parser.error(f"Unknown ticker mix: {', '.join(sorted(unknown))}")
+
+    workdir = Path(tempfile.mkdtemp(prefix="investment-bench-"))
+    env = {
+        **os.environ,
+        "LLM_PROVIDER": "fake",
+        "FAKE_TTFT_MS": str(args.ttft_ms),
+        "FAKE_TOKENS_PER_SECOND": str(args.tokens_per_second),
+        "FAKE_ERROR_RATE": str(args.error_rate),
+        "FAKE_RATE_LIMIT_RATE": str(args.rate_limit_rate),
+        "FAKE_SEED": str(args.seed),
+        "REPORTS_DIR": str(workdir / "reports"),
+        "STATE_DB_PATH": str(workdir / "state.db"),
+        "LOG_LEVEL": "WARNING",
+    }
+    server = subprocess.Popen(
+        [sys.executable, str(REPO_ROOT / "benchmarks" / "bench_server.py"), "--port", str(args.port)],
+        cwd=workdir, env=env
+    )
+    try:
+        results = asyncio.run(drive(args))
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    config = {key: (str(value) if isinstance(value, Path) else value) for key, value in vars(args).items()}
+    output = json.dumps({**run_metadata(config), **results}, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+        print(f"Wrote results to {args.output}")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
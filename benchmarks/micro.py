@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""Micro-benchmarks for in-process hot paths.
+
+Covers section extraction on large responses, phase prompt building,
+AnalysisResult construction and serialization, and the service listing and
+stats paths over large result caches. Results are compared against a
+baseline file and the run fails when any benchmark regresses past the
+threshold.
+
+Every timing is also taken relative to a fixed pure-Python calibration
+loop, and compared with the baseline in those units, so a baseline
+recorded on a faster or slower host still flags real regressions. Hosts
+that differ in more than raw CPU speed, such as cache sizes or Python
+builds, still need their own baseline.
+
+Examples:
+    python benchmarks/micro.py                        # compare with baseline
+    python benchmarks/micro.py --save-baseline        # record a new baseline
+    python benchmarks/micro.py --sizes 10000          # smaller caches only
+"""
+
+import argparse
+import asyncio
+import atexit
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Dict, List, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# Services create report, state and trace files; keep them out of the working directory
+WORKDIR = Path(tempfile.mkdtemp(prefix="investment-micro-"))
+atexit.register(shutil.rmtree, WORKDIR, ignore_errors=True)
+os.environ.setdefault("REPORTS_DIR", str(WORKDIR / "reports"))
+os.environ.setdefault("STATE_DB_PATH", str(WORKDIR / "data" / "state.db"))
+os.environ.setdefault("TRACE_FILE_PATH", str(WORKDIR / "logs" / "traces.jsonl"))
+
+from benchmarks.common import run_metadata
+from src.core.analyzer import InvestmentAnalyzer
+from src.core.fake_provider import _allocation, _ranking, _stock_analysis
+from src.core.prompts import (
+    build_investment_ranking_prompt,
+    build_portfolio_allocation_prompt,
+    build_stock_analysis_prompt
+)
+from src.models.schemas import (
+    AnalysisResult,
+    AnalysisStatus,
+    InvestmentRanking,
+    PortfolioAllocation,
+    StockAnalysisResult
+)
+from src.services.investment_service import InvestmentService
+
+BASELINE_PATH = Path(__file__).resolve().parent / "baseline_micro.json"
+
+TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "META", "NVDA", "TSLA", "AVGO", "ORCL", "CRM",
+           "JPM", "BAC", "GS", "XOM", "CVX", "PFE", "JNJ", "WMT", "TGT", "INTC"]
+
+
+def _phase_results(tickers: List[str]) -> Tuple[StockAnalysisResult, InvestmentRanking, PortfolioAllocation]:
+    """Realistic phase outputs; every field holds the full response, as in the analyzer"""
+    stock_text = _stock_analysis(tickers)
+    ranking_text = _ranking(tickers)
+    allocation_text = _allocation(tickers)
+    return (
+        StockAnalysisResult(
+            company_symbols=", ".join(tickers), market_analysis=stock_text,
+            financial_metrics=stock_text, risk_assessment=stock_text, recommendations=stock_text
+        ),
+        InvestmentRanking(
+            ranked_companies=ranking_text, investment_rationale=ranking_text,
+            risk_evaluation=ranking_text, growth_potential=ranking_text
+        ),
+        PortfolioAllocation(
+            allocation_strategy=allocation_text, investment_thesis=allocation_text,
+            risk_management=allocation_text, final_recommendations=allocation_text
+        ),
+    )
+
+
+def _large_response(target_bytes: int) -> str:
+    """Markdown response of roughly target_bytes with many headed sections"""
+    block = _stock_analysis(TICKERS) + "\n\n## Recommendations\n\nHold.\n\n"
+    return (block * (target_bytes // len(block) + 1))[:target_bytes]
+
+
+def _synthetic_cache(size: int, rng: random.Random) -> Dict[str, AnalysisResult]:
+    """Result cache with a realistic status mix and creation times over 60 days"""
+    stock, ranking, portfolio = _phase_results(TICKERS[:3])
+    now = datetime.now()
+    statuses = [AnalysisStatus.COMPLETED] * 8 + [AnalysisStatus.FAILED, AnalysisStatus.IN_PROGRESS]
+    cache = {}
+    for index in range(size):
+        status = rng.choice(statuses)
+        created_at = now - timedelta(seconds=rng.randint(0, 60 * 86400))
+        request_id = f"{index:08d}-bench"
+        cache[request_id] = AnalysisResult(
+            request_id=request_id,
+            companies=rng.sample(TICKERS, rng.randint(1, 5)),
+            status=status,
+            stock_analysis=stock if status == AnalysisStatus.COMPLETED else None,
+            investment_ranking=ranking if status == AnalysisStatus.COMPLETED else None,
+            portfolio_allocation=portfolio if status == AnalysisStatus.COMPLETED else None,
+            error_message="Provider unavailable" if status == AnalysisStatus.FAILED else None,
+            created_at=created_at,
+            completed_at=created_at + timedelta(seconds=40) if status != AnalysisStatus.IN_PROGRESS else None
+        )
+    return cache
+
+
+def _measure(func: Callable[[], object], min_time: float) -> float:
+    """Best-of-5 seconds per call, with the loop count scaled to min_time"""
+    timer = timeit.Timer(func)
+    loops, elapsed = timer.autorange()
+    if elapsed < min_time:
+        loops = max(1, int(loops * min_time / max(elapsed, 1e-9)))
+    return min(timer.repeat(repeat=5, number=loops)) / loops
+
+
+def _calibration_loop() -> int:
+    """Fixed mix of dict, list, string and arithmetic work that stands in for host speed"""
+    table = {f"key{i}": i for i in range(2000)}
+    total = 0
+    for i in range(2000):
+        total += table[f"key{(i * 7) % 2000}"] * 3 % 11
+    return total + len(sorted(table, reverse=True))
+
+
+def collect_benchmarks(sizes: List[int]) -> Dict[str, Callable[[], object]]:
+    """Build the named benchmark callables"""
+    rng = random.Random(42)
+    analyzer = InvestmentAnalyzer()
+    benchmarks: Dict[str, Callable[[], object]] = {}
+
+    for label, size in [("100kb", 100_000), ("1mb", 1_000_000)]:
+        text = _large_response(size)
+        benchmarks[f"extract_section[{label}]"] = lambda text=text: analyzer._extract_section(text, "Risk Assessment")
+        benchmarks[f"extract_section_missing[{label}]"] = lambda text=text: analyzer._extract_section(text, "No Such Section")
+
+    for count in (3, 10):
+        tickers = TICKERS[:count]
+        stock, ranking, _ = _phase_results(tickers)
+        companies = ", ".join(tickers)
+        benchmarks[f"prompt_stock_analysis[{count}]"] = lambda c=companies: build_stock_analysis_prompt(c, "Generate analysis")
+        benchmarks[f"prompt_investment_ranking[{count}]"] = lambda s=stock: build_investment_ranking_prompt(s)
+        benchmarks[f"prompt_portfolio_allocation[{count}]"] = lambda r=ranking: build_portfolio_allocation_prompt(r)
+
+    stock, ranking, portfolio = _phase_results(TICKERS[:10])
+
+    def build_result() -> AnalysisResult:
+        return AnalysisResult(
+            request_id="bench", companies=TICKERS[:10], status=AnalysisStatus.COMPLETED,
+            stock_analysis=stock, investment_ranking=ranking, portfolio_allocation=portfolio
+        )
+
+    result = build_result()
+    payload = result.model_dump_json()
+    benchmarks["analysis_result_construct"] = build_result
+    benchmarks["analysis_result_dump_json"] = result.model_dump_json
+    benchmarks["analysis_result_validate_json"] = lambda: AnalysisResult.model_validate_json(payload)
+
+    for size in sizes:
+        service = InvestmentService()
+        service.analyzer.results_cache = _synthetic_cache(size, rng)
+        benchmarks[f"list_analyses[{size}]"] = lambda s=service: asyncio.run(s.list_analyses(limit=50))
+        benchmarks[f"list_analyses_failed[{size}]"] = lambda s=service: asyncio.run(
+            s.list_analyses(status=AnalysisStatus.FAILED, limit=50)
+        )
+        benchmarks[f"get_service_stats[{size}]"] = lambda s=service: asyncio.run(s.get_service_stats())
+
+    return benchmarks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="10000,100000,1000000", help="Comma-separated result cache sizes")
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this text")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per timing repeat")
+    parser.add_argument("--baseline", type=Path, default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown vs baseline (0.25 = 25%%)")
+    parser.add_argument("--save-baseline", action="store_true", help="Write results as the new baseline")
+    parser.add_argument("--output", type=Path, default=None, help="Also write JSON results here")
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    benchmarks = collect_benchmarks(sizes)
+    stored = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+    baseline = stored.get("results", {})
+
+    calibration = _measure(_calibration_loop, args.min_time)
+    # Scale baseline timings to this host; baselines without a calibration compare raw
+    speed = calibration / stored["calibration_seconds"] if stored.get("calibration_seconds") else 1.0
+    print(f"{'calibration':<40} {calibration * 1e6:>14.2f} us   host speed factor {speed:.2f}")
+
+    results: Dict[str, float] = {}
+    regressions = []
+    for name, func in benchmarks.items():
+        if args.filter and args.filter not in name:
+            continue
+        seconds = _measure(func, args.min_time)
+        results[name] = seconds
+
+        reference = baseline.get(name)
+        line = f"{name:<40} {seconds * 1e6:>14.2f} us"
+        if reference:
+            change = seconds / (reference * speed) - 1
+            line += f"   {change:+7.1%} vs baseline"
+            if change > args.threshold:
+                regressions.append(name)
+                line += "  REGRESSION"
+        print(line)
+
+    report = {
+        **run_metadata({"sizes": sizes, "threshold": args.threshold}),
+        "calibration_seconds": calibration,
+        "results": results
+    }
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2) + "\n")
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(report, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}")
+        return
+
+    if regressions:
+        print(f"\n{len(regressions)} benchmark(s) regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
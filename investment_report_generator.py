@@ -36,6 +36,9 @@ from dataclasses import dataclass
 
 from upsonic import Task, Agent
 
+# Offline stand-in for benchmarks: LLM_PROVIDER=fake python investment_report_generator.py
+if os.getenv("LLM_PROVIDER", "").lower() == "fake":
+    from src.core.fake_provider import FakeAgent as Agent
 
 os.getenv('OPENAI_API_KEY')
 # --- Data structures for structured outputs ---
@@ -3,6 +3,7 @@
 
 import os
 import sys
+import argparse
 from pathlib import Path
 
 # Add src to Python path
@@ -10,20 +11,42 @@ src_path = Path(__file__).parent / "src"
 sys.path.insert(0, str(src_path))
 
 from src.core.logging_config import setup_logging
+from src.core.metrics import prepare_multiprocess_dir
 from src.config.settings import settings
 
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description="Run the FastAPI backend server")
+    parser.add_argument("--production", action="store_true",
+                        help="Run multiple workers with shared SQLite state and reload disabled")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Number of worker processes in production mode")
+    return parser.parse_args()
+
 def main():
     """Main entry point for FastAPI server"""
+    args = parse_args()
+    if args.production:
+        # Exported so every spawned worker picks up the same mode
+        os.environ["DEPLOYMENT_MODE"] = "production"
+        settings.deployment_mode = "production"
+    if args.workers:
+        os.environ["API_WORKERS"] = str(args.workers)
+        settings.api_workers = args.workers
     
-    # Setup logging
-    setup_logging()
+    # Setup logging; in production every worker writes JSON lines to stdout
+    setup_logging(
+        file_logging=not settings.is_production,
+        console_json=settings.is_production and settings.log_json
+    )
     
     # Check for API keys
-    if not settings.has_any_api_key:
+    if not settings.llm_available:
         print("❌ Error: No API key found!")
         print("Please set one of the following environment variables:")
         print("  - OPENAI_API_KEY=your_openai_api_key")
         print("  - ANTHROPIC_API_KEY=your_anthropic_api_key")
+        print("  - LLM_PROVIDER=fake (offline stand-in for benchmarks)")
         print("\nExample:")
         print("  export OPENAI_API_KEY=sk-...")
         print("  python run_api.py")
@@ -36,6 +59,26 @@ def main():
     
     # Import and run
     import uvicorn
+    if settings.is_production:
+        settings.state_db_path.parent.mkdir(parents=True, exist_ok=True)
+        # Workers write metrics to shared files so any of them can answer a scrape for all
+        prepare_multiprocess_dir(settings.metrics_multiproc_dir)
+        print(f"🏭 Production mode: {settings.api_workers} workers")
+        print(f"🗄️  Shared state: {settings.state_db_path}")
+        uvicorn.run(
+            "src.api.main:app",
+            host=settings.api_host,
+            port=settings.api_port,
+            reload=False,
+            workers=settings.api_workers,
+            limit_max_requests=settings.worker_max_requests,
+            limit_max_requests_jitter=settings.worker_max_requests_jitter,
+            # A recycled worker drains its in-flight analyses instead of cutting them off
+            timeout_graceful_shutdown=settings.worker_shutdown_timeout,
+            log_level=settings.log_level.lower()
+        )
+        return
+    
     uvicorn.run(
         "src.api.main:app",
         host=settings.api_host,
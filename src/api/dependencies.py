@@ -1,5 +1,6 @@
 """FastAPI dependencies for common functionality"""
 
+import hmac
 import logging
 from typing import Optional
 from fastapi import Header, HTTPException, Depends
@@ -16,6 +17,20 @@ async def verify_api_key(authorization: Optional[str] = Header(None)):
     return True
 
 
+def check_admin_token(token: Optional[str]) -> None:
+    """Raise unless `token` matches the configured admin token"""
+    if not settings.admin_token:
+        raise HTTPException(status_code=403, detail="Admin endpoints are disabled; set ADMIN_TOKEN to enable them")
+    if not token or not hmac.compare_digest(token, settings.admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """Dependency restricting an endpoint to holders of the admin token"""
+    check_admin_token(x_admin_token)
+    return True
+
+
 async def get_current_settings():
     """Dependency to get current settings"""
     return settings
@@ -1,10 +1,13 @@
 """FastAPI application for Investment Report Generator"""
 
+import asyncio
 import logging
+from contextlib import asynccontextmanager
+from datetime import datetime
 from typing import List, Optional
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, status
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, Header, Query, status
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 from ..models.schemas import (
     AnalysisRequest,
@@ -12,25 +15,74 @@ from ..models.schemas import (
     AnalysisSummary,
     AnalysisStatus,
     HealthCheck,
-    ErrorResponse
+    ErrorResponse,
+    SearchResults,
+    TickerHistory
 )
 from ..services.investment_service import investment_service
+from ..core.metrics import MetricsRegistry, registry
+from ..core.loop_monitor import loop_monitor
+from ..core.profiler import profiler
+from ..core.exports import naive_local
+from ..core.idempotency import IdempotencyKeyReusedError
+from ..core.search_index import SearchQueryError
+from ..core.state_store import SQLiteResultCache
+from ..core.ticker_index import InvalidCursorError
+from ..core.tracing import render_timeline
 from ..config.settings import settings
+from ..core.logging_config import setup_logging
+from .dependencies import check_admin_token, require_admin
 
-# Configure logging
-logging.basicConfig(
-    level=getattr(logging, settings.log_level),
-    format=settings.log_format
-)
+# Configure logging unless the launcher already did; workers in production
+# mode would share the rotating log files, so they write JSON lines to stdout
+if not logging.getLogger().handlers:
+    setup_logging(
+        file_logging=not settings.is_production,
+        console_json=settings.is_production and settings.log_json
+    )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop per-process background monitors and drain pending reports"""
+    if settings.loop_monitor_enabled:
+        loop_monitor.start()
+    registry.start_refresh(settings.metrics_refresh_interval)
+    memory_task = None
+    if settings.memory_high_water_mb and not settings.uses_shared_state:
+        memory_task = asyncio.create_task(investment_service.memory_guard.run())
+    retention_task = None
+    if settings.retention_enabled:
+        retention_task = asyncio.create_task(investment_service.retention.run())
+    tiering_task = None
+    if investment_service.tiers is not None:
+        tiering_task = asyncio.create_task(investment_service.tiers.run())
+    lease_task = None
+    if isinstance(investment_service.analyzer.results_cache, SQLiteResultCache):
+        lease_task = asyncio.create_task(investment_service.analyzer.results_cache.run())
+    yield
+    if memory_task is not None:
+        memory_task.cancel()
+    if retention_task is not None:
+        retention_task.cancel()
+    if tiering_task is not None:
+        tiering_task.cancel()
+    if lease_task is not None:
+        lease_task.cancel()
+    await investment_service.analyzer.report_writer.stop()
+    await loop_monitor.stop()
+    registry.stop_refresh()
+
+
 # Create FastAPI app
 app = FastAPI(
     title=settings.app_name,
     description="AI-powered investment analysis and portfolio allocation system",
     version=settings.app_version,
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
@@ -46,62 +98,115 @@ app.add_middleware(
 @app.exception_handler(Exception)
 async def general_exception_handler(request, exc):
     """Global exception handler"""
-    logger.error(f"Unhandled exception: {str(exc)}")
+    logger.error("Unhandled exception: %s", exc)
     return JSONResponse(
         status_code=500,
         content=ErrorResponse(
             error="Internal server error",
             detail=str(exc) if settings.debug else "An unexpected error occurred"
-        ).dict()
+        ).model_dump(mode="json")
+    )
+
+
+def _health() -> HealthCheck:
+    """Build the health response, degraded while the event loop is lagging"""
+    if not loop_monitor.running:
+        return HealthCheck()
+    stats = loop_monitor.get_stats()
+    return HealthCheck(
+        status="degraded" if stats["lag_ms"] >= settings.loop_block_threshold * 1000 else "healthy",
+        event_loop_lag_ms=stats["lag_ms"],
+        event_loop_lag_p99_ms=stats["lag_p99_ms"]
     )
 
 
 @app.get("/", response_model=HealthCheck)
 async def root():
     """Root endpoint with health check"""
-    return HealthCheck()
+    return _health()
 
 
 @app.get("/health", response_model=HealthCheck)
 async def health_check():
     """Health check endpoint"""
-    return HealthCheck()
+    return _health()
 
 
 @app.post("/analyses", response_model=AnalysisResult, status_code=status.HTTP_201_CREATED)
-async def create_analysis(request: AnalysisRequest, background_tasks: BackgroundTasks):
-    """Create a new investment analysis"""
+async def create_analysis(
+    request: AnalysisRequest,
+    background_tasks: BackgroundTasks,
+    response: Response,
+    x_profile: Optional[str] = Header(None),
+    x_admin_token: Optional[str] = Header(None),
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    """Create a new investment analysis
+    
+    Admins can send `X-Profile: 1` to sample this request's on-loop time;
+    the profile is served at /admin/profiles/{request_id}.
+    
+    Repeating a request with the same `Idempotency-Key` header and body
+    returns the analysis the first one started, finished or not, with
+    status 200 and `Idempotent-Replayed: true`, instead of starting another.
+    """
     try:
         # Validate API key availability
-        if not settings.has_any_api_key:
+        if not settings.llm_available:
             raise HTTPException(
                 status_code=400,
                 detail="No API key configured. Please set OPENAI_API_KEY or ANTHROPIC_API_KEY environment variable."
             )
         
-        logger.info(f"Creating analysis for companies: {request.companies}")
+        logger.info("Creating analysis for companies: %s", request.companies)
+        
+        if x_profile:
+            check_admin_token(x_admin_token)
+        
+        request_id = None
+        if idempotency_key:
+            request_id, existing = await investment_service.claim_idempotency_key(request, idempotency_key)
+            if existing is not None:
+                response.status_code = status.HTTP_200_OK
+                response.headers["Idempotent-Replayed"] = "true"
+                return existing
+        
+        if x_profile:
+            with profiler.profile_current_task() as session:
+                result = await investment_service.create_analysis(request, request_id)
+            profiler.store(result.request_id, session)
+            response.headers["X-Profile-Id"] = result.request_id
+            return result
         
         # Start analysis in background if requested
-        result = await investment_service.create_analysis(request)
+        result = await investment_service.create_analysis(request, request_id)
         
         return result
         
+    except IdempotencyKeyReusedError:
+        raise HTTPException(
+            status_code=422,
+            detail="Idempotency-Key was already used with a different request body"
+        )
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Failed to create analysis: {str(e)}")
+        logger.error("Failed to create analysis: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.get("/analyses", response_model=List[AnalysisSummary])
 async def list_analyses(
     status_filter: Optional[AnalysisStatus] = Query(None, alias="status"),
-    limit: int = Query(50, ge=1, le=100)
+    limit: int = Query(50, ge=1, le=100),
+    offset: int = Query(0, ge=0, description="Analyses to skip, newest first")
 ):
-    """List all analyses with optional filtering"""
+    """List analyses with optional filtering, newest first"""
     try:
-        analyses = investment_service.list_analyses(status=status_filter, limit=limit)
+        analyses = await investment_service.list_analyses(status=status_filter, limit=limit, offset=offset)
         return analyses
     except Exception as e:
-        logger.error(f"Failed to list analyses: {str(e)}")
+        logger.error("Failed to list analyses: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -109,14 +214,160 @@ async def list_analyses(
 async def get_analysis(request_id: str):
     """Get a specific analysis by ID"""
     try:
-        result = investment_service.get_analysis(request_id)
+        result = await investment_service.get_analysis(request_id)
         if not result:
             raise HTTPException(status_code=404, detail="Analysis not found")
         return result
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to get analysis {request_id}: {str(e)}")
+        logger.error("Failed to get analysis %s: %s", request_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/analyses/{request_id}/trace")
+async def get_analysis_trace(
+    request_id: str,
+    output_format: str = Query("json", alias="format", pattern="^(json|text)$")
+):
+    """Get the span timeline of an analysis as JSON or as text bars"""
+    try:
+        timeline = await investment_service.get_analysis_timeline(request_id)
+        if not timeline:
+            raise HTTPException(status_code=404, detail="Trace not found")
+        if output_format == "text":
+            return PlainTextResponse(render_timeline(timeline))
+        return timeline
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to get trace for %s: %s", request_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/analyses/{request_id}/reports")
+async def get_analysis_reports(request_id: str):
+    """Get the manifest of an analysis's stored reports"""
+    try:
+        manifest = await investment_service.get_report_manifest(request_id)
+        if not manifest:
+            raise HTTPException(status_code=404, detail="Reports not found")
+        return manifest
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to get reports for %s: %s", request_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/analyses/{request_id}/reports/{name}")
+async def get_analysis_report(request_id: str, name: str):
+    """Get one report of an analysis as markdown"""
+    try:
+        report = await investment_service.get_report(request_id, name)
+        if report is None:
+            raise HTTPException(status_code=404, detail="Report not found")
+        return PlainTextResponse(report, media_type="text/markdown")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to read report %s for %s: %s", name, request_id, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/exports/analyses")
+async def export_analyses(
+    since: Optional[datetime] = Query(None, description="Analyses created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Analyses created before this time"),
+    status_filter: Optional[AnalysisStatus] = Query(None, alias="status")
+):
+    """Stream every matching analysis as newline-delimited JSON, oldest first"""
+    try:
+        chunks = investment_service.export_analyses(
+            since=naive_local(since), until=naive_local(until), status=status_filter
+        )
+        return StreamingResponse(chunks, media_type="application/x-ndjson")
+    except Exception as e:
+        logger.error("Failed to export analyses: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/exports/reports")
+async def export_reports(
+    since: Optional[datetime] = Query(None, description="Analyses created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Analyses created before this time")
+):
+    """Stream the reports of matching analyses as a tar.gz of <request_id>/<report> files"""
+    try:
+        chunks = investment_service.export_reports(since=naive_local(since), until=naive_local(until))
+        return StreamingResponse(
+            chunks,
+            media_type="application/gzip",
+            headers={"Content-Disposition": 'attachment; filename="reports.tar.gz"'}
+        )
+    except Exception as e:
+        logger.error("Failed to export reports: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/search", response_model=SearchResults)
+async def search_analyses(
+    q: str = Query(..., min_length=1, description='FTS5 query, e.g. "supply chain" AND margin*'),
+    ticker: Optional[str] = Query(None, description="Only analyses that included this symbol"),
+    status_filter: Optional[AnalysisStatus] = Query(None, alias="status"),
+    since: Optional[datetime] = Query(None, description="Analyses created at or after this time"),
+    until: Optional[datetime] = Query(None, description="Analyses created before this time"),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0, le=10000),
+    sort: str = Query("relevance", pattern="^(relevance|recent)$", description="recent is faster for broad terms")
+):
+    """Search phase reports, best matches or newest first"""
+    try:
+        results = await investment_service.search_analyses(
+            q, ticker=ticker, status=status_filter, since=naive_local(since), until=naive_local(until),
+            limit=limit, offset=offset, sort=sort
+        )
+        if results is None:
+            raise HTTPException(status_code=404, detail="Search is disabled")
+        return results
+    except SearchQueryError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid search query: {e}")
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Search failed for %r: %s", q, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/tickers/{symbol}/analyses", response_model=TickerHistory)
+async def get_ticker_history(
+    symbol: str,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    status_filter: Optional[AnalysisStatus] = Query(None, alias="status")
+):
+    """List the analyses that included a symbol, newest first"""
+    try:
+        return await investment_service.get_ticker_history(symbol, limit=limit, cursor=cursor, status=status_filter)
+    except InvalidCursorError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    except Exception as e:
+        logger.error("Failed to get history for %s: %s", symbol, e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/tickers/{symbol}/latest", response_model=AnalysisResult)
+async def get_latest_ticker_analysis(symbol: str):
+    """Get the newest completed analysis that included a symbol"""
+    try:
+        result = await investment_service.get_latest_analysis(symbol)
+        if not result:
+            raise HTTPException(status_code=404, detail="No completed analysis for this symbol")
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error("Failed to get latest analysis for %s: %s", symbol, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -124,24 +375,24 @@ async def get_analysis(request_id: str):
 async def delete_analysis(request_id: str):
     """Delete a specific analysis"""
     try:
-        deleted = investment_service.delete_analysis(request_id)
+        deleted = await investment_service.delete_analysis(request_id)
         if not deleted:
             raise HTTPException(status_code=404, detail="Analysis not found")
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Failed to delete analysis {request_id}: {str(e)}")
+        logger.error("Failed to delete analysis %s: %s", request_id, e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/analyses/cleanup")
 async def cleanup_old_analyses(days: int = Query(None, description="Number of days to keep analyses")):
-    """Clean up old analyses"""
+    """Clean up old analyses and their reports"""
     try:
-        cleaned_count = investment_service.cleanup_old_analyses(days)
-        return {"message": f"Cleaned up {cleaned_count} old analyses"}
+        removed = await investment_service.run_retention(days)
+        return {"message": f"Cleaned up {removed['results']} old analyses", "removed": removed}
     except Exception as e:
-        logger.error(f"Failed to cleanup analyses: {str(e)}")
+        logger.error("Failed to cleanup analyses: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -149,13 +400,72 @@ async def cleanup_old_analyses(days: int = Query(None, description="Number of da
 async def get_service_stats():
     """Get service statistics"""
     try:
-        stats = investment_service.get_service_stats()
+        stats = await investment_service.get_service_stats()
         return stats
     except Exception as e:
-        logger.error(f"Failed to get stats: {str(e)}")
+        logger.error("Failed to get stats: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/stats/phases")
+async def get_phase_report():
+    """Compare per-phase latency and cost across model configurations"""
+    try:
+        return investment_service.get_phase_report()
+    except Exception as e:
+        logger.error("Failed to get phase report: %s", e)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics():
+    """Prometheus metrics in text exposition format, for every worker in production mode"""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(content=registry.render(), media_type=MetricsRegistry.CONTENT_TYPE)
+
+
+@app.post("/admin/profile", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def profile_process(seconds: float = Query(10.0, gt=0, description="Seconds to sample")):
+    """Sample every thread of this process and return collapsed stacks for a flame graph"""
+    if seconds > settings.profiler_max_seconds:
+        raise HTTPException(status_code=400, detail=f"At most {settings.profiler_max_seconds:.0f} seconds")
+    session = await profiler.profile_process(seconds)
+    return PlainTextResponse(session.collapsed(), headers={"X-Profile-Samples": str(session.sample_count)})
+
+
+@app.get("/admin/profiles/{request_id}", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def get_request_profile(request_id: str):
+    """Get the collapsed-stack profile recorded for a profiled analysis request"""
+    collapsed = profiler.get_profile(request_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return PlainTextResponse(collapsed)
+
+
+@app.get("/admin/memory", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def get_memory_report(top: int = Query(20, ge=1, le=200, description="Allocation sites to list")):
+    """Report RSS, results cache size by status and top tracemalloc allocation sites"""
+    try:
+        return await investment_service.get_memory_report(top)
+    except Exception as e:
+        logger.error("Failed to get memory report: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/admin/memory/tracemalloc", dependencies=[Depends(require_admin)], include_in_schema=False)
+async def toggle_tracemalloc(
+    enabled: bool = Query(..., description="Start or stop allocation tracing"),
+    frames: int = Query(1, ge=1, le=50, description="Frames kept per allocation")
+):
+    """Start or stop tracemalloc in this worker"""
+    if enabled:
+        investment_service.allocations.start(frames)
+    else:
+        investment_service.allocations.stop()
+    return {"tracemalloc": investment_service.allocations.enabled}
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
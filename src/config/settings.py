@@ -1,8 +1,9 @@
 """Configuration settings for the Investment Report Generator"""
 
+import math
 import os
 from pathlib import Path
-from typing import Optional
+from typing import Any, Dict, Optional
 from pydantic_settings import BaseSettings
 from pydantic import Field
 
@@ -24,18 +25,151 @@ class Settings(BaseSettings):
     api_port: int = Field(8000, description="API port")
     api_reload: bool = Field(True, description="API reload")
     
+    # Deployment Settings
+    deployment_mode: str = Field("development", description="Deployment mode (development or production)")
+    api_workers: int = Field(default_factory=lambda: os.cpu_count() or 1, description="API worker processes in production mode")
+    worker_max_requests: Optional[int] = Field(10000, description="Requests served before a worker is recycled")
+    worker_max_requests_jitter: int = Field(1000, description="Random jitter added to worker_max_requests")
+    worker_graceful_timeout: int = Field(30, description="Seconds a stopping worker waits for in-flight requests beyond the analysis deadline")
+    analysis_deadline_seconds: float = Field(900.0, description="Seconds an analysis may take, including its wait for a run slot, before it fails")
+    
+    # Shared State
+    state_backend: str = Field("memory", description="Result state backend (memory or sqlite)")
+    state_db_path: Path = Field(Path("data/state.db"), description="SQLite file for state shared across workers")
+    state_lease_seconds: float = Field(60.0, description="Seconds an unfinished analysis survives without its worker's heartbeat")
+    
     # Streamlit Settings
     streamlit_host: str = Field("0.0.0.0", description="Streamlit host")
     streamlit_port: int = Field(8501, description="Streamlit port")
     
     # Model Settings
+    llm_provider: str = Field("upsonic", description="Agent backend (upsonic, or fake for offline runs)")
     default_model: str = Field("openai/gpt-4o-mini", description="Default model")
+    secondary_model: Optional[str] = Field(None, description="Secondary model for hedging and failover")
     max_tokens: int = Field(4000, description="Max tokens")
     temperature: float = Field(0.1, description="Temperature")
+    model_routing: Dict[str, Dict[str, Any]] = Field(
+        default_factory=dict,
+        description='Per-phase or per-agent model routes, e.g. {"stock_analysis": {"model": "openai/gpt-4o-mini", "max_tokens": 2000}, "investment_lead": {"model": "openai/gpt-4o", "temperature": 0.2}}'
+    )
+    prompt_caching_enabled: bool = Field(True, description="Request provider prompt caching where it is opt-in")
+    prompt_cache_min_tokens: int = Field(1024, description="Smallest prefix providers will cache")
+    prompt_cache_ttl: float = Field(300.0, description="Seconds a cached prefix is assumed to stay warm")
+    model_prices: Dict[str, Dict[str, float]] = Field(
+        default_factory=lambda: {
+            "openai/gpt-4o-mini": {"input": 0.15, "output": 0.60},
+            "openai/gpt-4o": {"input": 2.50, "output": 10.00},
+            "anthropic/claude-3-5-haiku-latest": {"input": 0.80, "output": 4.00},
+            "anthropic/claude-3-5-sonnet-latest": {"input": 3.00, "output": 15.00},
+        },
+        description="USD per million input/output tokens by model, for cost reports"
+    )
+    
+    # Provider Rate Limiting
+    rate_limit_enabled: bool = Field(True, description="Enable client-side provider rate limiting")
+    rate_limit_rpm: Optional[int] = Field(500, description="Default requests per minute per model")
+    rate_limit_tpm: Optional[int] = Field(200000, description="Default tokens per minute per model")
+    rate_limits: Dict[str, Dict[str, int]] = Field(
+        default_factory=dict,
+        description='Per provider or model overrides, e.g. {"openai": {"rpm": 3500}, "openai/gpt-4o": {"tpm": 30000}}'
+    )
+    rate_limit_max_wait: float = Field(120.0, description="Max seconds a call may queue for quota")
+    
+    # Retries and Circuit Breaking
+    retry_max_attempts: int = Field(3, description="Max attempts per agent call for transient errors")
+    retry_base_delay: float = Field(1.0, description="Base backoff delay in seconds")
+    retry_max_delay: float = Field(30.0, description="Max backoff delay in seconds")
+    circuit_breaker_failure_threshold: int = Field(5, description="Consecutive transient failures that open a provider breaker")
+    circuit_breaker_reset_timeout: float = Field(60.0, description="Seconds an open breaker fails fast before a trial call")
+    
+    # Adaptive Concurrency
+    adaptive_concurrency_enabled: bool = Field(True, description="Adapt concurrent calls per provider with AIMD")
+    concurrency_initial_limit: float = Field(8.0, description="Concurrent calls per provider allowed at startup")
+    concurrency_min_limit: float = Field(1.0, description="Floor of the adaptive concurrency limit")
+    concurrency_max_limit: float = Field(64.0, description="Ceiling of the adaptive concurrency limit")
+    concurrency_backoff: float = Field(0.5, description="Factor the limit is multiplied by on 429s, 5xx, timeouts or latency inflation")
+    concurrency_latency_tolerance: float = Field(2.0, description="Recent over baseline latency ratio treated as inflation")
+    
+    # Hedging and Failover
+    hedging_enabled: bool = Field(False, description="Hedge slow phase calls on the secondary model")
+    hedge_percentile: float = Field(0.95, description="Latency percentile after which a call is hedged")
+    hedge_min_samples: int = Field(20, description="Latency samples required before hedging")
+    hedge_min_delay: float = Field(1.0, description="Minimum seconds before a call is hedged")
+    failover_enabled: bool = Field(True, description="Retry failed phase calls on the secondary model")
+    
+    # Offline Fake Provider
+    fake_ttft_ms: float = Field(400.0, description="Fake provider median time to first token in ms")
+    fake_ttft_jitter: float = Field(0.5, description="Sigma of the lognormal time-to-first-token distribution")
+    fake_tokens_per_second: float = Field(80.0, description="Fake provider output tokens per second")
+    fake_error_rate: float = Field(0.0, description="Fraction of fake calls failing with a 503")
+    fake_rate_limit_rate: float = Field(0.0, description="Fraction of fake calls failing with a 429")
+    fake_seed: Optional[int] = Field(None, description="Seed for reproducible fake latency and faults")
+    
+    # Observability
+    metrics_enabled: bool = Field(True, description="Expose Prometheus metrics at /metrics")
+    metrics_multiproc_dir: Path = Field(Path("data/prometheus"), description="Directory workers share metrics through in production mode")
+    metrics_refresh_interval: float = Field(5.0, description="Seconds between callback gauge updates in multiprocess metrics mode")
+    loop_monitor_enabled: bool = Field(True, description="Measure event loop lag and log blocking callbacks")
+    loop_lag_interval: float = Field(0.1, description="Seconds between event loop lag measurements")
+    loop_block_threshold: float = Field(0.25, description="Loop stall in seconds after which the blocking stack is logged")
+    tracing_enabled: bool = Field(True, description="Record spans for analyses, phases, agent calls and report writes")
+    trace_sample_rate: float = Field(1.0, description="Fraction of analyses traced")
+    trace_exporter: str = Field("file", description="Span exporter (file, otlp or none)")
+    trace_file_path: Path = Field(Path("logs/traces.jsonl"), description="JSON Lines file for the file exporter")
+    trace_file_max_mb: float = Field(50.0, description="Size in MB at which the trace file is rotated")
+    trace_file_backups: int = Field(3, description="Rotated trace files kept")
+    trace_otlp_endpoint: str = Field("http://localhost:4318/v1/traces", description="OTLP/HTTP collector traces endpoint")
+    trace_buffer_size: int = Field(500, description="Recent traces kept in memory for timelines")
+    
+    # Admin and Profiling
+    admin_token: Optional[str] = Field(None, description="Token required by admin endpoints (X-Admin-Token); unset disables them")
+    profiler_interval_ms: float = Field(5.0, description="Sampling profiler interval in milliseconds")
+    profiler_max_seconds: float = Field(60.0, description="Longest allowed on-demand profile")
+    profiler_keep_profiles: int = Field(50, description="Per-request profiles kept for retrieval")
+    
+    # Memory
+    memory_high_water_mb: Optional[float] = Field(None, description="RSS in MB above which cached analyses are evicted; unset disables")
+    memory_check_interval: float = Field(10.0, description="Seconds between RSS checks")
+    memory_evict_fraction: float = Field(0.25, description="Fraction of cached analyses evicted per check above the mark")
+    memory_low_water_mb: Optional[float] = Field(None, description="RSS in MB below which eviction stops; defaults to 90% of the high-water mark")
+    memory_max_ineffective_evictions: int = Field(2, description="Evictions in a row without an RSS drop before eviction pauses")
+    memory_evict_cooldown: float = Field(300.0, description="Seconds eviction pauses after evictions stop lowering RSS")
+    result_size_sample_rate: float = Field(0.1, description="Fraction of finished analyses whose deep size is measured for analysis_result_bytes")
+    tracemalloc_enabled: bool = Field(False, description="Trace allocations from startup (adds CPU and memory overhead)")
+    tracemalloc_frames: int = Field(1, description="Frames kept per traced allocation")
     
     # File Management
     reports_dir: Path = Field(Path("reports"), description="Reports directory")
     max_report_age_days: int = Field(30, description="Max report age in days")
+    report_batch_size: int = Field(32, description="Most analyses whose reports share one round of fsyncs")
+    report_batch_window: float = Field(0.05, description="Seconds the report writer waits to fill a batch")
+    report_queue_size: int = Field(1000, description="Analyses queued for report writing before submitters wait")
+    report_write_attempts: int = Field(3, description="Attempts to store a batch of reports before it is given up")
+    report_retry_delay: float = Field(0.5, description="Seconds before the first retry of a failed report batch; doubles per retry")
+    report_fsync: bool = Field(True, description="Fsync reports and their directories before they count as written")
+    report_compression: str = Field("auto", description="Report blob codec: auto (zstd if installed, else gzip), zstd or gzip")
+    report_compression_level: Optional[int] = Field(None, description="Codec compression level; unset uses the codec default")
+    max_reports_mb: Optional[float] = Field(None, description="Cap on the report store in MB; oldest days are removed above it")
+    retention_enabled: bool = Field(True, description="Run the retention sweeper in the background")
+    retention_interval: float = Field(3600.0, description="Seconds between retention sweeps")
+    search_enabled: bool = Field(True, description="Index phase reports for full-text search")
+    
+    # Scheduling
+    max_concurrent_analyses: Optional[int] = Field(None, description="Analyses run at once per worker; more wait as pending. Unset runs all at once")
+    scheduler_policy: str = Field("fifo", description="Order pending analyses are admitted in: fifo or sjf (shortest estimated job first)")
+    scheduler_aging_rate: float = Field(1.0, description="Seconds of estimated runtime forgiven per second waited under sjf")
+    eta_default_phase_seconds: float = Field(30.0, description="Phase duration assumed for ETAs before any history")
+    eta_window: int = Field(200, description="Recent runs per phase used to fit runtime estimates")
+    
+    # Idempotency
+    idempotency_ttl_hours: float = Field(24.0, description="Hours an Idempotency-Key on POST /analyses is remembered")
+    idempotency_claim_grace_seconds: float = Field(10.0, description="Seconds a claimed key is waited on for its analysis to appear before it is taken over")
+    
+    # Result Tiers
+    tiering_enabled: bool = Field(False, description="Move aging results to disk tiers instead of deleting them")
+    hot_result_hours: float = Field(24.0, description="Hours finished results stay in memory before moving to the warm tier")
+    warm_result_days: int = Field(90, description="Days results stay in the warm tier before moving to monthly archives")
+    tiering_interval: float = Field(300.0, description="Seconds between tier moves")
     
     # Logging
     log_level: str = Field("INFO", description="Log level")
@@ -43,6 +177,7 @@ class Settings(BaseSettings):
         "%(asctime)s - %(name)s - %(levelname)s - %(message)s",
         description="Log format"
     )
+    log_json: bool = Field(True, description="Write file logs, and console logs in production mode, as JSON lines with request_id and phase")
     
     class Config:
         env_file = ".env"
@@ -53,6 +188,23 @@ class Settings(BaseSettings):
         super().__init__(**kwargs)
         # Ensure reports directory exists
         self.reports_dir.mkdir(parents=True, exist_ok=True)
+        if self.uses_shared_state:
+            self.state_db_path.parent.mkdir(parents=True, exist_ok=True)
+    
+    @property
+    def worker_shutdown_timeout(self) -> int:
+        """Seconds a stopping worker waits, long enough for any analysis it is running to finish"""
+        return math.ceil(self.analysis_deadline_seconds) + self.worker_graceful_timeout
+    
+    @property
+    def is_production(self) -> bool:
+        """Check if running in multi-worker production mode"""
+        return self.deployment_mode.lower() == "production"
+    
+    @property
+    def uses_shared_state(self) -> bool:
+        """Check if result state must be shared across worker processes"""
+        return self.is_production or self.state_backend.lower() == "sqlite"
     
     @property
     def has_openai_key(self) -> bool:
@@ -64,10 +216,32 @@ class Settings(BaseSettings):
         """Check if Anthropic API key is configured"""
         return bool(self.anthropic_api_key)
     
+    @property
+    def uses_fake_provider(self) -> bool:
+        """Check if agents run against the offline fake provider"""
+        return self.llm_provider.lower() == "fake"
+    
+    def has_key_for(self, model: str) -> bool:
+        """Check if the provider of a model identifier has an API key configured"""
+        if self.uses_fake_provider:
+            return True
+        provider = model.split("/", 1)[0] if "/" in model else "openai"
+        if provider == "openai":
+            return self.has_openai_key
+        if provider == "anthropic":
+            return self.has_anthropic_key
+        # Other providers read their keys from their own environment variables
+        return True
+    
     @property
     def has_any_api_key(self) -> bool:
         """Check if any API key is configured"""
         return self.has_openai_key or self.has_anthropic_key
+    
+    @property
+    def llm_available(self) -> bool:
+        """Check if agents can run, either with a provider key or offline"""
+        return self.has_any_api_key or self.uses_fake_provider
 
 
 # Global settings instance
@@ -1,110 +1,183 @@
 """Investment analysis agents using Upsonic framework"""
 
 import logging
-from typing import Optional
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
 from upsonic import Agent, Task
 
 from ..config.settings import settings
+from .fake_provider import FakeAgent
+from .prompts import PHASE_INSTRUCTIONS
+from .tokens import provider_of
 
 logger = logging.getLogger(__name__)
 
 
+# Analysis phases and the agent that runs each one
+PHASE_AGENTS = {
+    "stock_analysis": "stock_analyst",
+    "investment_ranking": "research_analyst",
+    "portfolio_allocation": "investment_lead",
+}
+
+
+AGENT_PROFILES = {
+    "stock_analyst": dict(
+        name="Stock Analyst",
+        role="Senior Investment Analyst at Goldman Sachs",
+        goal="Comprehensive market analysis, financial statement evaluation, industry trend identification, news impact assessment, risk factor analysis, and growth potential evaluation",
+        instructions="""
+        1. Market Research 📊
+           - Analyze company fundamentals and metrics
+           - Review recent market performance
+           - Evaluate competitive positioning
+           - Assess industry trends and dynamics
+        2. Financial Analysis 💹
+           - Examine key financial ratios
+           - Review analyst recommendations
+           - Analyze recent news impact
+           - Identify growth catalysts
+        3. Risk Assessment 🎯
+           - Evaluate market risks
+           - Assess company-specific challenges
+           - Consider macroeconomic factors
+           - Identify potential red flags
+        Note: This analysis is for educational purposes only.
+        """
+    ),
+    "research_analyst": dict(
+        name="Research Analyst",
+        role="Senior Research Analyst at Goldman Sachs",
+        goal="Investment opportunity evaluation, comparative analysis, risk-reward assessment, growth potential ranking, and strategic recommendations",
+        instructions="""
+        1. Investment Analysis 🔍
+           - Evaluate each company's potential
+           - Compare relative valuations
+           - Assess competitive advantages
+           - Consider market positioning
+        2. Risk Evaluation 📈
+           - Analyze risk factors
+           - Consider market conditions
+           - Evaluate growth sustainability
+           - Assess management capability
+        3. Company Ranking 🏆
+           - Rank based on investment potential
+           - Provide detailed rationale
+           - Consider risk-adjusted returns
+           - Explain competitive advantages
+        """
+    ),
+    "investment_lead": dict(
+        name="Investment Lead",
+        role="Senior Investment Lead at Goldman Sachs",
+        goal="Portfolio strategy development, asset allocation optimization, risk management, investment rationale articulation, and client recommendation delivery",
+        instructions="""
+        1. Portfolio Strategy 💼
+           - Develop allocation strategy
+           - Optimize risk-reward balance
+           - Consider diversification
+           - Set investment timeframes
+        2. Investment Rationale 📝
+           - Explain allocation decisions
+           - Support with analysis
+           - Address potential concerns
+           - Highlight growth catalysts
+        3. Recommendation Delivery 📊
+           - Present clear allocations
+           - Explain investment thesis
+           - Provide actionable insights
+           - Include risk considerations
+        """
+    ),
+}
+
+
+@dataclass
+class ModelRoute:
+    """Model and generation settings for one analysis phase"""
+    model: str
+    max_tokens: int
+    temperature: float
+    secondary_model: Optional[str] = None
+
+
 class InvestmentAgents:
     """Factory class for creating investment analysis agents"""
     
     def __init__(self):
-        self._stock_analyst: Optional[Agent] = None
-        self._research_analyst: Optional[Agent] = None
-        self._investment_lead: Optional[Agent] = None
+        self._agents: Dict[Tuple[str, str], Agent] = {}
+    
+    def get_route(self, phase: str) -> ModelRoute:
+        """Get the model route for a phase from the routing table.
+        
+        Routes may be keyed by phase ("stock_analysis") or by agent
+        ("stock_analyst"); unset fields fall back to the global settings.
+        """
+        overrides = settings.model_routing.get(phase) or settings.model_routing.get(PHASE_AGENTS[phase], {})
+        return ModelRoute(
+            model=overrides.get("model", settings.default_model),
+            max_tokens=int(overrides.get("max_tokens", settings.max_tokens)),
+            temperature=float(overrides.get("temperature", settings.temperature)),
+            secondary_model=overrides.get("secondary_model", settings.secondary_model)
+        )
+    
+    def get_agent(self, phase: str, model: Optional[str] = None) -> Agent:
+        """Get or create the agent for a phase, bound to one model.
+        
+        Each (phase, model) pair gets its own agent so concurrent hedged
+        calls never swap the model under a running agent.
+        """
+        route = self.get_route(phase)
+        model = model or route.model
+        key = (phase, model)
+        if key not in self._agents:
+            profile = AGENT_PROFILES[PHASE_AGENTS[phase]]
+            model_settings = {"max_tokens": route.max_tokens, "temperature": route.temperature}
+            if settings.prompt_caching_enabled and provider_of(model) == "anthropic":
+                # Anthropic only caches prefixes marked with cache_control
+                model_settings["anthropic_cache_instructions"] = True
+            agent_class = FakeAgent if settings.uses_fake_provider else Agent
+            self._agents[key] = agent_class(model, settings=model_settings, **profile)
+            logger.info("Created %s agent on %s", profile["name"], model)
+        return self._agents[key]
+    
+    def get_static_prefix(self, phase: str) -> str:
+        """Get the request-independent start of every prompt sent for a phase"""
+        profile = AGENT_PROFILES[PHASE_AGENTS[phase]]
+        return "\n".join([
+            profile["role"], profile["goal"], profile["instructions"], PHASE_INSTRUCTIONS[phase]
+        ])
     
     @property
     def stock_analyst(self) -> Agent:
         """Get or create stock analyst agent"""
-        if self._stock_analyst is None:
-            self._stock_analyst = Agent(
-                name="Stock Analyst",
-                role="Senior Investment Analyst at Goldman Sachs",
-                goal="Comprehensive market analysis, financial statement evaluation, industry trend identification, news impact assessment, risk factor analysis, and growth potential evaluation",
-                instructions="""
-                1. Market Research 📊
-                   - Analyze company fundamentals and metrics
-                   - Review recent market performance
-                   - Evaluate competitive positioning
-                   - Assess industry trends and dynamics
-                2. Financial Analysis 💹
-                   - Examine key financial ratios
-                   - Review analyst recommendations
-                   - Analyze recent news impact
-                   - Identify growth catalysts
-                3. Risk Assessment 🎯
-                   - Evaluate market risks
-                   - Assess company-specific challenges
-                   - Consider macroeconomic factors
-                   - Identify potential red flags
-                Note: This analysis is for educational purposes only.
-                """
-            )
-            logger.info("Created Stock Analyst agent")
-        return self._stock_analyst
+        return self.get_agent("stock_analysis")
     
     @property
     def research_analyst(self) -> Agent:
         """Get or create research analyst agent"""
-        if self._research_analyst is None:
-            self._research_analyst = Agent(
-                name="Research Analyst",
-                role="Senior Research Analyst at Goldman Sachs",
-                goal="Investment opportunity evaluation, comparative analysis, risk-reward assessment, growth potential ranking, and strategic recommendations",
-                instructions="""
-                1. Investment Analysis 🔍
-                   - Evaluate each company's potential
-                   - Compare relative valuations
-                   - Assess competitive advantages
-                   - Consider market positioning
-                2. Risk Evaluation 📈
-                   - Analyze risk factors
-                   - Consider market conditions
-                   - Evaluate growth sustainability
-                   - Assess management capability
-                3. Company Ranking 🏆
-                   - Rank based on investment potential
-                   - Provide detailed rationale
-                   - Consider risk-adjusted returns
-                   - Explain competitive advantages
-                """
-            )
-            logger.info("Created Research Analyst agent")
-        return self._research_analyst
+        return self.get_agent("investment_ranking")
     
     @property
     def investment_lead(self) -> Agent:
         """Get or create investment lead agent"""
-        if self._investment_lead is None:
-            self._investment_lead = Agent(
-                name="Investment Lead",
-                role="Senior Investment Lead at Goldman Sachs",
-                goal="Portfolio strategy development, asset allocation optimization, risk management, investment rationale articulation, and client recommendation delivery",
-                instructions="""
-                1. Portfolio Strategy 💼
-                   - Develop allocation strategy
-                   - Optimize risk-reward balance
-                   - Consider diversification
-                   - Set investment timeframes
-                2. Investment Rationale 📝
-                   - Explain allocation decisions
-                   - Support with analysis
-                   - Address potential concerns
-                   - Highlight growth catalysts
-                3. Recommendation Delivery 📊
-                   - Present clear allocations
-                   - Explain investment thesis
-                   - Provide actionable insights
-                   - Include risk considerations
-                """
-            )
-            logger.info("Created Investment Lead agent")
-        return self._investment_lead
+        return self.get_agent("portfolio_allocation")
+    
+    def get_model_config(self, phase: Optional[str] = None) -> str:
+        """Get the configured model for agents, optionally for one phase"""
+        if phase is None:
+            return settings.default_model
+        return self.get_route(phase).model
     
-    def get_model_config(self) -> str:
-        """Get the configured model for agents"""
-        return settings.default_model
+    def get_secondary_model(self, phase: Optional[str] = None) -> Optional[str]:
+        """Get the secondary model for hedging and failover, if usable"""
+        if phase is None:
+            model, primary = settings.secondary_model, settings.default_model
+        else:
+            route = self.get_route(phase)
+            model, primary = route.secondary_model, route.model
+        if not model or model == primary:
+            return None
+        if not settings.has_key_for(model):
+            return None
+        return model
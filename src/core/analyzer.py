@@ -1,12 +1,18 @@
 """Core investment analysis workflow logic"""
 
+import asyncio
+import itertools
 import logging
+import random
+import time
 import uuid
+from collections.abc import MutableMapping
+from contextlib import AsyncExitStack
 from pathlib import Path
-from typing import Dict, Any, Optional
+from typing import Awaitable, Dict, Any, List, Optional, Tuple, TypeVar
 from datetime import datetime
 
-from upsonic import Task
+from upsonic import Agent, Task
 
 from ..models.schemas import (
     AnalysisRequest, 
@@ -17,98 +23,236 @@ from ..models.schemas import (
     AnalysisStatus
 )
 from ..config.settings import settings
-from .agents import InvestmentAgents
+from .agents import PHASE_AGENTS, InvestmentAgents
+from .concurrency import AdaptiveConcurrencyLimiter
+from .exceptions import AnalysisError
+from .hedging import HedgedExecutor
+from .logging_config import log_context
+from .memory import deep_sizeof
+from .metrics import (
+    AGENT_CALL_LATENCY,
+    AGENT_TOKENS,
+    ANALYSES,
+    ANALYSIS_RESULT_BYTES,
+    ANALYSES_IN_FLIGHT,
+    CACHE_LOOKUPS,
+    CACHE_SIZE,
+    FAILURES,
+    PHASE_DURATION,
+    RATE_LIMIT_WAITERS
+)
+from .phase_stats import PhaseProfiler
+from .prompt_cache import PromptCacheTracker
+from .prompts import (
+    build_investment_ranking_prompt,
+    build_portfolio_allocation_prompt,
+    build_stock_analysis_prompt
+)
+from .rate_limiter import ProviderRateLimiter
+from .scheduler import AnalysisScheduler
+from .report_writer import ReportWriter
+from .resilience import ResilienceLayer
+from .search_index import AnalysisSearchIndex
+from .state_store import SQLiteResultCache
+from .ticker_index import TickerIndex
+from .tokens import CallUsage, estimate_tokens, provider_of, usage_from_output
+from .tracing import Tracer, trace_id_for
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 
 class InvestmentAnalyzer:
     """Main investment analysis workflow orchestrator"""
     
     def __init__(self):
         self.agents = InvestmentAgents()
-        self.results_cache: Dict[str, AnalysisResult] = {}
+        self.results_cache: MutableMapping[str, AnalysisResult] = (
+            SQLiteResultCache(settings.state_db_path, settings.state_lease_seconds) if settings.uses_shared_state else {}
+        )
+        self.rate_limiter = ProviderRateLimiter.from_settings()
+        self.resilience = ResilienceLayer.from_settings()
+        self.concurrency = AdaptiveConcurrencyLimiter.from_settings()
+        self.hedger = HedgedExecutor.from_settings()
+        self.phase_profiler = PhaseProfiler()
+        self.prompt_cache = PromptCacheTracker.from_settings()
+        self.tracer = Tracer.from_settings()
+        self.report_writer = ReportWriter.from_settings(self.tracer)
+        self.search_index = AnalysisSearchIndex.from_settings() if settings.search_enabled else None
+        self.ticker_index = TickerIndex.from_settings()
+        self.scheduler = AnalysisScheduler.from_settings()
+        
+        RATE_LIMIT_WAITERS.set_function(lambda: self.rate_limiter.waiting)
+        CACHE_SIZE.set_function(lambda: len(self.results_cache))
     
-    async def analyze(self, request: AnalysisRequest) -> AnalysisResult:
+    async def analyze(self, request: AnalysisRequest, request_id: Optional[str] = None) -> AnalysisResult:
         """Run complete investment analysis workflow"""
-        request_id = str(uuid.uuid4())
+        request_id = request_id or str(uuid.uuid4())
         companies_str = ", ".join(request.companies)
+        # Size drives the runtime estimate: more tickers and longer messages mean longer phases
+        size = estimate_tokens(build_stock_analysis_prompt(companies_str, request.message))
         
         # Initialize result
         result = AnalysisResult(
             request_id=request_id,
             companies=request.companies,
-            status=AnalysisStatus.IN_PROGRESS,
+            status=AnalysisStatus.PENDING,
             stock_analysis=None,
             investment_ranking=None,
             portfolio_allocation=None,
             error_message=None,
             completed_at=None
         )
-        self.results_cache[request_id] = result
+        await self._store(result)
         
-        logger.info(f"Starting analysis {request_id} for companies: {companies_str}")
+        logger.info("Starting analysis %s for companies: %s", request_id, companies_str)
+        ANALYSES_IN_FLIGHT.inc()
         
-        try:
-            # Phase 1: Stock Analysis
-            logger.info(f"Phase 1: Stock analysis for {request_id}")
-            stock_analysis = await self._analyze_stocks(companies_str, request.message)
-            result.stock_analysis = stock_analysis
-            
-            # Phase 2: Investment Ranking
-            logger.info(f"Phase 2: Investment ranking for {request_id}")
-            ranking_analysis = await self._rank_investments(stock_analysis)
-            result.investment_ranking = ranking_analysis
-            
-            # Phase 3: Portfolio Allocation
-            logger.info(f"Phase 3: Portfolio allocation for {request_id}")
-            portfolio_strategy = await self._create_portfolio_allocation(ranking_analysis)
-            result.portfolio_allocation = portfolio_strategy
-            
-            # Mark as completed
-            result.status = AnalysisStatus.COMPLETED
-            result.completed_at = datetime.now()
-            
-            # Save reports
-            await self._save_reports(request_id, result)
-            
-            logger.info(f"Analysis {request_id} completed successfully")
+        with log_context(request_id=request_id), self.tracer.start_span(
+            "analysis",
+            root=True,
+            trace_id=trace_id_for(request_id),
+            request_id=request_id,
+            ticker_count=len(request.companies),
+            companies=companies_str
+        ) as root_span:
+            try:
+                # The request lasts as long as the analysis, so this also bounds a recycled worker's drain
+                async with asyncio.timeout(settings.analysis_deadline_seconds) as deadline:
+                    with self.tracer.start_span("admission.wait", size=size) as wait_span:
+                        waited = await self.scheduler.acquire(request_id, size)
+                        wait_span.set_attribute("wait_ms", round(waited * 1000, 3))
+                    result.status = AnalysisStatus.IN_PROGRESS
+                    await self._store(result)
+                    await self._index_tickers(result)
+                    
+                    # Phase 1: Stock Analysis
+                    logger.info("Phase 1: Stock analysis for %s", request_id)
+                    stock_analysis = await self._run_phase(
+                        request_id, "stock_analysis", self._analyze_stocks(companies_str, request.message)
+                    )
+                    result.stock_analysis = stock_analysis
+                    await self._store(result)
+                    await self._index_phase(result, "stock_analysis", stock_analysis.market_analysis)
+                    
+                    # Phase 2: Investment Ranking
+                    logger.info("Phase 2: Investment ranking for %s", request_id)
+                    ranking_analysis = await self._run_phase(
+                        request_id, "investment_ranking", self._rank_investments(stock_analysis)
+                    )
+                    result.investment_ranking = ranking_analysis
+                    await self._store(result)
+                    await self._index_phase(result, "investment_ranking", ranking_analysis.ranked_companies)
+                    
+                    # Phase 3: Portfolio Allocation
+                    logger.info("Phase 3: Portfolio allocation for %s", request_id)
+                    portfolio_strategy = await self._run_phase(
+                        request_id, "portfolio_allocation", self._create_portfolio_allocation(ranking_analysis)
+                    )
+                    result.portfolio_allocation = portfolio_strategy
+                    
+                    # Mark as completed
+                    result.status = AnalysisStatus.COMPLETED
+                    result.completed_at = datetime.now()
+                    await self._index_phase(result, "portfolio_allocation", portfolio_strategy.allocation_strategy)
+                    
+                    # Save reports
+                    await self._save_reports(request_id, result)
+                    
+                    logger.info("Analysis %s completed successfully", request_id)
+                    
+            except Exception as e:
+                error = e
+                if deadline.expired():
+                    error = AnalysisError(f"Analysis exceeded its {settings.analysis_deadline_seconds:g}s deadline")
+                logger.error("Analysis %s failed (%s): %s", request_id, type(error).__name__, error)
+                FAILURES.labels("analysis", type(error).__name__).inc()
+                root_span.record_error(error)
+                result.status = AnalysisStatus.FAILED
+                result.error_message = str(error)
+                result.completed_at = datetime.now()
+            finally:
+                ANALYSES_IN_FLIGHT.dec()
+                self.scheduler.release(request_id)
+            root_span.set_attribute("status", result.status.value)
             
-        except Exception as e:
-            logger.error(f"Analysis {request_id} failed: {str(e)}")
-            result.status = AnalysisStatus.FAILED
-            result.error_message = str(e)
-            result.completed_at = datetime.now()
+            # Walking the whole result is costly on the loop, so only a sample is measured
+            if random.random() < settings.result_size_sample_rate:
+                result_bytes = deep_sizeof(result)
+                ANALYSIS_RESULT_BYTES.observe(result_bytes)
+                root_span.set_attribute("result_bytes", result_bytes)
         
-        self.results_cache[request_id] = result
+        ANALYSES.labels(result.status.value).inc()
+        await self._store(result)
+        await self._index_tickers(result)
+        if result.status == AnalysisStatus.FAILED:
+            await self._index_status(result)
         return result
     
+    async def _store(self, result: AnalysisResult) -> None:
+        """Save a result to the registry; the shared SQLite one is written off the loop"""
+        if isinstance(self.results_cache, SQLiteResultCache):
+            await asyncio.to_thread(self.results_cache.__setitem__, result.request_id, result)
+        else:
+            self.results_cache[result.request_id] = result
+    
+    async def _run_phase(self, request_id: str, phase: str, work: Awaitable[T]) -> T:
+        """Await one phase under its own span and record its duration and outcome"""
+        started = time.monotonic()
+        outcome = "error"
+        self.scheduler.phase_started(request_id, phase)
+        try:
+            with log_context(phase=phase), self.tracer.start_span(f"phase.{phase}", phase=phase):
+                value = await work
+            outcome = "success"
+            self.scheduler.phase_finished(request_id, phase, time.monotonic() - started)
+            return value
+        finally:
+            PHASE_DURATION.labels(phase, outcome).observe(time.monotonic() - started)
+    
+    async def _index_phase(self, result: AnalysisResult, phase: str, body: str) -> None:
+        """Make a finished phase searchable; indexing failures never fail the analysis"""
+        if self.search_index is None:
+            return
+        try:
+            await asyncio.to_thread(
+                self.search_index.add,
+                result.request_id,
+                phase,
+                body,
+                result.companies,
+                result.created_at,
+                result.status.value
+            )
+        except Exception as e:
+            logger.error("Failed to index %s for %s: %s", phase, result.request_id, e)
+            FAILURES.labels("search_index", type(e).__name__).inc()
+    
+    async def _index_tickers(self, result: AnalysisResult) -> None:
+        """Post the analysis, with its current status, under each of its symbols"""
+        try:
+            await asyncio.to_thread(
+                self.ticker_index.record, result.request_id, result.companies, result.created_at, result.status.value
+            )
+        except Exception as e:
+            logger.error("Failed to update ticker index for %s: %s", result.request_id, e)
+            FAILURES.labels("ticker_index", type(e).__name__).inc()
+    
+    async def _index_status(self, result: AnalysisResult) -> None:
+        """Record a final status on phases indexed before the analysis ended"""
+        if self.search_index is None:
+            return
+        try:
+            await asyncio.to_thread(self.search_index.set_status, result.request_id, result.status.value)
+        except Exception as e:
+            logger.error("Failed to update search index for %s: %s", result.request_id, e)
+    
     async def _analyze_stocks(self, companies: str, message: str) -> StockAnalysisResult:
         """Phase 1: Comprehensive stock analysis"""
-        analysis_task = Task(f"""
-        {message}
-
-        CRITICAL INSTRUCTION: You MUST analyze ONLY these specific companies using their EXACT stock symbols: {companies}
-
-        Please conduct a comprehensive analysis of ONLY the following companies: {companies}
-
-        For EACH of these specific companies ({companies}), provide:
-        1. Current market position and financial metrics
-        2. Recent performance and analyst recommendations
-        3. Industry trends and competitive landscape
-        4. Risk factors and growth potential
-        5. News impact and market sentiment
+        prompt = build_stock_analysis_prompt(companies, message)
         
-        IMPORTANT: 
-        - Use ONLY the company symbols provided: {companies}
-        - Do NOT use generic names like "Company A", "Tech Inc.", etc.
-        - Reference each company by its actual stock symbol (e.g., AAPL for Apple, MSFT for Microsoft)
-        
-        Companies to analyze: {companies}
-        """)
-        
-        result = self.agents.stock_analyst.do(analysis_task, model=self.agents.get_model_config())
-        analysis_text = str(result)
+        analysis_text = await self._run_agent("stock_analysis", prompt)
         
         # Use the full AI response for all fields to ensure content is preserved
         return StockAnalysisResult(
@@ -121,34 +265,9 @@ class InvestmentAnalyzer:
     
     async def _rank_investments(self, stock_analysis: StockAnalysisResult) -> InvestmentRanking:
         """Phase 2: Investment potential ranking"""
-        ranking_task = Task(f"""
-        Based on the comprehensive stock analysis below, please rank these EXACT companies by investment potential: {stock_analysis.company_symbols}
-        
-        MANDATORY: ONLY rank these specific companies: {stock_analysis.company_symbols}
+        prompt = build_investment_ranking_prompt(stock_analysis)
         
-        STOCK ANALYSIS:
-        - Market Analysis: {stock_analysis.market_analysis}
-        - Financial Metrics: {stock_analysis.financial_metrics}
-        - Risk Assessment: {stock_analysis.risk_assessment}
-        - Initial Recommendations: {stock_analysis.recommendations}
-        
-        CRITICAL REQUIREMENTS:
-        - Use ONLY the actual company symbols: {stock_analysis.company_symbols}
-        - Do NOT create fictional companies or use generic names
-        - Reference each company by its stock ticker (e.g., NVDA, AMD, INTC)
-        - Rank ALL and ONLY the companies listed: {stock_analysis.company_symbols}
-        
-        Please provide:
-        1. Detailed ranking of THESE EXACT companies ({stock_analysis.company_symbols}) from best to worst investment potential
-        2. Investment rationale for each of these specific companies
-        3. Risk evaluation and mitigation strategies for each company
-        4. Growth potential assessment for each company
-        
-        Remember: Analyze ONLY {stock_analysis.company_symbols} - no other companies!
-        """)
-        
-        result = self.agents.research_analyst.do(ranking_task, model=self.agents.get_model_config())
-        ranking_text = str(result)
+        ranking_text = await self._run_agent("investment_ranking", prompt)
         
         # Use the full AI response for all fields to ensure content is preserved
         return InvestmentRanking(
@@ -160,36 +279,9 @@ class InvestmentAnalyzer:
     
     async def _create_portfolio_allocation(self, ranking_analysis: InvestmentRanking) -> PortfolioAllocation:
         """Phase 3: Portfolio allocation strategy"""
-        portfolio_task = Task(f"""
-        Based on the investment ranking and analysis below, create a strategic portfolio allocation for EXACTLY these companies.
-        
-        MANDATORY CONSTRAINTS: 
-        - Allocate ONLY to the companies from the ranking analysis
-        - Use the EXACT company stock symbols, not generic names
-        - Do NOT create or mention any other companies
-        - Allocations must total EXACTLY 100%
-        - Reference companies by their stock tickers (e.g., NVDA, AMD, INTC)
-        
-        COMPANIES TO ALLOCATE (and ONLY these):
-        From the ranking analysis: {ranking_analysis.ranked_companies}
-        
-        INVESTMENT RANKING DATA:
-        - Company Rankings: {ranking_analysis.ranked_companies}
-        - Investment Rationale: {ranking_analysis.investment_rationale}
-        - Risk Evaluation: {ranking_analysis.risk_evaluation}
-        - Growth Potential: {ranking_analysis.growth_potential}
-        
-        REQUIRED OUTPUT:
-        1. Specific allocation percentages for EACH company mentioned in the rankings (must total exactly 100%)
-        2. Investment thesis for EACH specific company
-        3. Risk management approach for the portfolio
-        4. Final actionable recommendations for THESE EXACT companies
+        prompt = build_portfolio_allocation_prompt(ranking_analysis)
         
-        IMPORTANT: Use ONLY the companies mentioned in the ranking analysis above. Do not invent new companies!
-        """)
-        
-        result = self.agents.investment_lead.do(portfolio_task, model=self.agents.get_model_config())
-        portfolio_text = str(result)
+        portfolio_text = await self._run_agent("portfolio_allocation", prompt)
         
         # Use the full AI response for all fields to ensure content is preserved
         return PortfolioAllocation(
@@ -199,6 +291,93 @@ class InvestmentAnalyzer:
             final_recommendations=portfolio_text
         )
     
+    async def _run_agent(self, phase: str, prompt: str) -> str:
+        """Run a phase's agent call on its routed model, hedging or failing over to the secondary model"""
+        return await self.hedger.run(
+            phase,
+            self.agents.get_model_config(phase),
+            self.agents.get_secondary_model(phase),
+            lambda model: self._call_model(phase, prompt, model)
+        )
+    
+    async def _call_model(self, phase: str, prompt: str, model: str) -> str:
+        """Run a single agent call on one model within the provider rate limits.
+        
+        Transient provider errors are retried with backoff behind a
+        per-provider circuit breaker.
+        """
+        agent = self.agents.get_agent(phase, model)
+        prefix = self.agents.get_static_prefix(phase)
+        prefix_tokens = estimate_tokens(prefix)
+        prompt_tokens = prefix_tokens + estimate_tokens(prompt)
+        provider = provider_of(model)
+        
+        async def attempt() -> Tuple[str, Optional[CallUsage]]:
+            if settings.rate_limit_enabled:
+                with self.tracer.start_span("rate_limit.acquire", model=model, tokens=prompt_tokens) as wait_span:
+                    waited = await self.rate_limiter.acquire(model, prompt_tokens)
+                    wait_span.set_attribute("wait_ms", round(waited * 1000, 3))
+            async with AsyncExitStack() as stack:
+                # The slot is held through the call; its outcome feeds the provider's limit
+                with self.tracer.start_span("concurrency.acquire", provider=provider) as slot_span:
+                    limit = await stack.enter_async_context(self.concurrency.slot(provider, f"{phase}/{model}"))
+                    if limit is not None:
+                        slot_span.set_attribute("limit", round(limit.limit, 2))
+                with self.tracer.start_span("provider_call", model=model):
+                    return await self._invoke(agent, Task(prompt))
+        
+        agent_name = PHASE_AGENTS.get(phase, phase)
+        with self.tracer.start_span(
+            "agent_call",
+            phase=phase,
+            agent=agent_name,
+            model=model,
+            prompt_chars=len(prompt),
+            prompt_tokens=prompt_tokens
+        ) as span:
+            started = time.monotonic()
+            try:
+                text, usage = await self.resilience.call(provider, attempt)
+            except BaseException:
+                AGENT_CALL_LATENCY.labels(agent_name, model, "error").observe(time.monotonic() - started)
+                raise
+            elapsed = time.monotonic() - started
+            AGENT_CALL_LATENCY.labels(agent_name, model, "success").observe(elapsed)
+            span.set_attribute("completion_chars", len(text))
+        
+        if usage is None:
+            usage = CallUsage(
+                prompt_tokens=prompt_tokens,
+                completion_tokens=estimate_tokens(text),
+                cached_tokens=self.prompt_cache.estimate_cached(model, prefix, prefix_tokens)
+            )
+        self.prompt_cache.record(phase, model, usage)
+        AGENT_TOKENS.labels(agent_name, model, "prompt").observe(usage.prompt_tokens)
+        AGENT_TOKENS.labels(agent_name, model, "completion").observe(usage.completion_tokens)
+        
+        route = self.agents.get_route(phase)
+        self.phase_profiler.record(
+            phase,
+            f"{model} (max_tokens={route.max_tokens}, temperature={route.temperature})",
+            model,
+            elapsed,
+            usage.prompt_tokens,
+            usage.completion_tokens
+        )
+        return text
+    
+    @staticmethod
+    async def _invoke(agent: Agent, task: Task) -> Tuple[str, Optional[CallUsage]]:
+        """Call the agent without blocking the event loop so calls can be raced and cancelled.
+        
+        Returns the response text and the provider-reported usage, if any.
+        """
+        if hasattr(agent, "do_async"):
+            output = await agent.do_async(task, return_output=True)
+            return str(getattr(output, "output", output)), usage_from_output(output)
+        result = await asyncio.to_thread(agent.do, task)
+        return str(result), None
+    
     def _extract_section(self, text: str, section_name: str) -> str:
         """Extract a specific section from the analysis text"""
         lines = text.split('\n')
@@ -217,51 +396,38 @@ class InvestmentAnalyzer:
         return '\n'.join(section_content).strip() if section_content else f"Analysis for {section_name} section"
     
     async def _save_reports(self, request_id: str, result: AnalysisResult) -> None:
-        """Save analysis reports to files"""
-        reports_dir = settings.reports_dir / "investment" / request_id
-        reports_dir.mkdir(parents=True, exist_ok=True)
-        
-        try:
-            # Save stock analysis report
-            if result.stock_analysis:
-                stock_report_path = reports_dir / "stock_analyst_report.md"
-                with open(stock_report_path, "w", encoding="utf-8") as f:
-                    f.write("# Stock Analysis Report\n\n")
-                    f.write(f"**Companies:** {result.stock_analysis.company_symbols}\n\n")
-                    f.write(f"**Analysis Date:** {result.stock_analysis.analysis_date.isoformat()}\n\n")
-                    f.write("## Complete Analysis\n\n")
-                    f.write(result.stock_analysis.market_analysis)
-                    f.write("\n\n")
-            
-            # Save ranking report
-            if result.investment_ranking:
-                ranking_report_path = reports_dir / "research_analyst_report.md"
-                with open(ranking_report_path, "w", encoding="utf-8") as f:
-                    f.write("# Investment Ranking Report\n\n")
-                    f.write(f"**Analysis Date:** {result.investment_ranking.analysis_date.isoformat()}\n\n")
-                    f.write("## Complete Ranking Analysis\n\n")
-                    f.write(result.investment_ranking.ranked_companies)
-                    f.write("\n\n")
-            
-            # Save portfolio report
-            if result.portfolio_allocation:
-                portfolio_report_path = reports_dir / "investment_report.md"
-                with open(portfolio_report_path, "w", encoding="utf-8") as f:
-                    f.write("# Investment Portfolio Report\n\n")
-                    f.write(f"**Analysis Date:** {result.portfolio_allocation.analysis_date.isoformat()}\n\n")
-                    f.write("## Complete Portfolio Analysis\n\n")
-                    f.write(result.portfolio_allocation.allocation_strategy)
-                    f.write("\n\n")
-            
-            logger.info(f"Reports saved for analysis {request_id}")
-            
-        except Exception as e:
-            logger.error(f"Failed to save reports for {request_id}: {str(e)}")
+        """Hand the analysis's reports to the background writer"""
+        await self.report_writer.submit(request_id, result)
     
-    def get_analysis(self, request_id: str) -> Optional[AnalysisResult]:
-        """Get analysis result by request ID"""
-        return self.results_cache.get(request_id)
+    async def get_analysis(self, request_id: str) -> Optional[AnalysisResult]:
+        """Get analysis result by request ID; the shared SQLite registry is read off the loop"""
+        if isinstance(self.results_cache, SQLiteResultCache):
+            result = await asyncio.to_thread(self.results_cache.get, request_id)
+        else:
+            result = self.results_cache.get(request_id)
+        CACHE_LOOKUPS.labels("hit" if result is not None else "miss").inc()
+        return result
+    
+    async def list_analyses(self,
+                            status: Optional[AnalysisStatus] = None,
+                            limit: int = 50,
+                            offset: int = 0) -> List[AnalysisResult]:
+        """Get one page of cached analyses, newest first"""
+        if isinstance(self.results_cache, SQLiteResultCache):
+            return await asyncio.to_thread(self.results_cache.newest, status, limit, offset)
+        # The dict keeps analyses in creation order, so the newest are at its end
+        matching = (
+            result for result in reversed(self.results_cache.values())
+            if status is None or result.status == status
+        )
+        return list(itertools.islice(matching, offset, offset + limit))
     
-    def list_analyses(self) -> Dict[str, AnalysisResult]:
-        """List all cached analyses"""
-        return self.results_cache.copy()
+    async def count_analyses(self, since: datetime) -> Dict[str, Tuple[int, int]]:
+        """Count cached analyses per status, in all and created after `since`"""
+        if isinstance(self.results_cache, SQLiteResultCache):
+            return await asyncio.to_thread(self.results_cache.count_by_status, since)
+        counts: Dict[str, Tuple[int, int]] = {}
+        for result in self.results_cache.values():
+            total, recent = counts.get(result.status.value, (0, 0))
+            counts[result.status.value] = (total + 1, recent + (result.created_at > since))
+        return counts
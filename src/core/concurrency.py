@@ -0,0 +1,215 @@
+"""Adaptive (AIMD) concurrency limits for provider calls"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from ..config.settings import settings
+from . import exceptions
+from .exceptions import ProviderUnavailableError, RateLimitError
+from .metrics import AGENT_CONCURRENCY_IN_FLIGHT, AGENT_CONCURRENCY_LIMIT
+from .resilience import classify_error
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the provider is overloaded, as opposed to a bad request
+OVERLOAD_ERRORS = (RateLimitError, ProviderUnavailableError, exceptions.TimeoutError)
+
+
+class _LatencyBaseline:
+    """Fast and slow moving averages of one kind of call's latency"""
+
+    def __init__(self):
+        self.samples = 0
+        self.short = 0.0
+        self.long = 0.0
+
+    def observe(self, seconds: float, short_alpha: float = 0.3, long_alpha: float = 0.02) -> None:
+        if self.samples == 0:
+            self.short = self.long = seconds
+        else:
+            self.short += short_alpha * (seconds - self.short)
+            self.long += long_alpha * (seconds - self.long)
+        self.samples += 1
+
+
+class AIMDLimit:
+    """Additive-increase, multiplicative-decrease limit on concurrent calls to one provider.
+
+    Each healthy completion adds `increase / limit`, so the limit grows by
+    about `increase` per round trip of a full window. A 429, 5xx or timeout,
+    or recent latency of one kind of call above `tolerance` times its
+    long-run average, multiplies the limit by `backoff`; decreases are at
+    most one per recent latency, since calls started before a cut report
+    the same congestion. The limit only grows while more than half of it
+    is in use, so an idle provider does not build up headroom it never
+    tested.
+    """
+
+    def __init__(self,
+                 name: str,
+                 initial: float = 8.0,
+                 minimum: float = 1.0,
+                 maximum: float = 64.0,
+                 increase: float = 1.0,
+                 backoff: float = 0.5,
+                 tolerance: float = 2.0,
+                 min_samples: int = 10):
+        self.name = name
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.increase = increase
+        self.backoff = backoff
+        self.tolerance = tolerance
+        self.min_samples = min_samples
+        self.in_flight = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+        self._baselines: Dict[str, _LatencyBaseline] = {}
+        self._waiters: Deque[asyncio.Future] = deque()
+        AGENT_CONCURRENCY_LIMIT.labels(name).set(self.limit)
+
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """Wait, in arrival order, until a call fits under the limit"""
+        if not self._waiters and self.in_flight < int(self.limit):
+            self._take()
+            return
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # Granted a slot just as the wait was cancelled; hand it on
+                self.release()
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+            raise
+
+    def _take(self) -> None:
+        self.in_flight += 1
+        AGENT_CONCURRENCY_IN_FLIGHT.labels(self.name).set(self.in_flight)
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        AGENT_CONCURRENCY_IN_FLIGHT.labels(self.name).set(self.in_flight)
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = self._waiters.popleft()
+            # Cancelled waiters stay queued until their task runs; skip them
+            if waiter.done():
+                continue
+            self._take()
+            waiter.set_result(None)
+
+    def on_success(self, kind: str, seconds: float) -> None:
+        """Grow the limit after a healthy call, or cut it if latency has inflated"""
+        baseline = self._baselines.setdefault(kind, _LatencyBaseline())
+        baseline.observe(seconds)
+        if baseline.samples >= self.min_samples and baseline.short > self.tolerance * baseline.long:
+            self._decrease(f"{kind} latency {baseline.short:.2f}s against {baseline.long:.2f}s", baseline.short)
+            return
+        # Counted before this call's slot is released
+        if self.in_flight > self.limit / 2:
+            self._set(min(self.limit + self.increase / self.limit, self.maximum))
+
+    def on_overload(self, error: Exception) -> None:
+        """Cut the limit after a 429, 5xx or timeout"""
+        recent = max((b.short for b in self._baselines.values()), default=1.0)
+        self._decrease(type(error).__name__, recent)
+
+    def _decrease(self, reason: str, cooldown: float) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        previous = self.limit
+        self._set(max(self.limit * self.backoff, self.minimum))
+        logger.info("Concurrency limit for '%s' cut from %.1f to %.1f (%s)", self.name, previous, self.limit, reason)
+
+    def _set(self, limit: float) -> None:
+        self.limit = limit
+        AGENT_CONCURRENCY_LIMIT.labels(self.name).set(limit)
+        self._wake()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "decreases": self.decreases,
+            "latency": {
+                kind: {"recent_s": round(b.short, 3), "baseline_s": round(b.long, 3), "samples": b.samples}
+                for kind, b in self._baselines.items()
+            }
+        }
+
+
+class AdaptiveConcurrencyLimiter:
+    """One AIMD limit per provider around individual provider calls"""
+
+    def __init__(self, enabled: bool = True, **limit_options: Any):
+        self.enabled = enabled
+        self.limit_options = limit_options
+        self.limits: Dict[str, AIMDLimit] = {}
+
+    @classmethod
+    def from_settings(cls) -> "AdaptiveConcurrencyLimiter":
+        """Build the limiter from application settings"""
+        return cls(
+            enabled=settings.adaptive_concurrency_enabled,
+            initial=settings.concurrency_initial_limit,
+            minimum=settings.concurrency_min_limit,
+            maximum=settings.concurrency_max_limit,
+            backoff=settings.concurrency_backoff,
+            tolerance=settings.concurrency_latency_tolerance
+        )
+
+    def limit_for(self, provider: str) -> AIMDLimit:
+        if provider not in self.limits:
+            self.limits[provider] = AIMDLimit(provider, **self.limit_options)
+        return self.limits[provider]
+
+    @asynccontextmanager
+    async def slot(self, provider: str, kind: str) -> AsyncIterator[Optional[AIMDLimit]]:
+        """Hold one of the provider's call slots and feed the call's outcome back into its limit.
+
+        `kind` groups calls of comparable latency, e.g. one phase. Cancelled
+        calls, such as hedging losers, and permanent errors leave the limit
+        unchanged.
+        """
+        if not self.enabled:
+            yield None
+            return
+        limit = self.limit_for(provider)
+        await limit.acquire()
+        started = time.monotonic()
+        try:
+            yield limit
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if isinstance(classify_error(e), OVERLOAD_ERRORS):
+                limit.on_overload(e)
+            raise
+        else:
+            limit.on_success(kind, time.monotonic() - started)
+        finally:
+            limit.release()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "providers": {name: limit.get_stats() for name, limit in self.limits.items()}
+        }
@@ -55,3 +55,18 @@ class TimeoutError(InvestmentAnalyzerError):
 class RateLimitError(InvestmentAnalyzerError):
     """Rate limiting errors"""
     pass
+
+
+class ClientRateLimitError(RateLimitError):
+    """Raised by the client-side rate limiter before any provider call is made"""
+    pass
+
+
+class ProviderUnavailableError(NetworkError):
+    """Provider server errors and overload responses"""
+    pass
+
+
+class CircuitOpenError(AgentError):
+    """Provider circuit breaker is open and calls are failing fast"""
+    pass
@@ -0,0 +1,144 @@
+"""Streaming bulk exports of analyses as NDJSON and of their reports as tar.gz"""
+
+import heapq
+import io
+import logging
+import os
+import tarfile
+from datetime import datetime
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from ..models.schemas import AnalysisResult, AnalysisStatus
+
+logger = logging.getLogger(__name__)
+
+# Bytes gathered before a chunk is handed to the response
+CHUNK_BYTES = 64 * 1024
+
+# One exported analysis: (created_at, request_id, JSON payload)
+AnalysisRecord = Tuple[str, str, str]
+
+
+def naive_local(value: Optional[datetime]) -> Optional[datetime]:
+    """Convert a timezone-aware bound to naive local time, which is how analyses are stamped"""
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone().replace(tzinfo=None)
+
+
+def iter_results(results: Iterable[AnalysisResult],
+                 since: Optional[datetime] = None,
+                 until: Optional[datetime] = None,
+                 status: Optional[AnalysisStatus] = None) -> Iterator[AnalysisRecord]:
+    """Serialize in-memory results one at a time, in their (creation) order"""
+    for result in results:
+        if since and result.created_at < since:
+            continue
+        if until and result.created_at >= until:
+            continue
+        if status and result.status != status:
+            continue
+        yield result.created_at.isoformat(), result.request_id, result.model_dump_json()
+
+
+def stream_ndjson(sources: List[Iterator[AnalysisRecord]]) -> Iterator[bytes]:
+    """Merge creation-ordered sources into NDJSON chunks of about CHUNK_BYTES.
+
+    A result moving between tiers while the export runs can show up in two
+    sources; the merge puts both copies side by side, so only the first is
+    kept.
+    """
+    lines: List[bytes] = []
+    size = 0
+    previous = None
+    for created_at, request_id, payload in heapq.merge(*sources):
+        if (created_at, request_id) == previous:
+            continue
+        previous = (created_at, request_id)
+        line = payload.encode("utf-8") + b"\n"
+        lines.append(line)
+        size += len(line)
+        if size >= CHUNK_BYTES:
+            yield b"".join(lines)
+            lines, size = [], 0
+    if lines:
+        yield b"".join(lines)
+
+
+class _ChunkBuffer(io.RawIOBase):
+    """Write-only file object that collects what tarfile writes until it is taken"""
+
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self.size = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks, self.size = [], 0
+        return data
+
+
+def _legacy_files(legacy_dir: Optional[Path],
+                  since: Optional[datetime],
+                  until: Optional[datetime]) -> Iterator[Tuple[str, str]]:
+    """Yield (path, archive name) for reports in pre-store per-analysis directories"""
+    if legacy_dir is None or not legacy_dir.is_dir():
+        return
+    with os.scandir(legacy_dir) as entries:
+        for entry in entries:
+            try:
+                if not entry.is_dir(follow_symlinks=False):
+                    continue
+                modified = datetime.fromtimestamp(entry.stat().st_mtime)
+                if (since and modified < since) or (until and modified >= until):
+                    continue
+                with os.scandir(entry.path) as files:
+                    names = [f.name for f in files if f.is_file(follow_symlinks=False)]
+            except OSError as e:
+                logger.warning("Skipping report directory %s: %s", entry.path, e)
+                continue
+            for name in sorted(names):
+                yield os.path.join(entry.path, name), f"{entry.name}/{name}"
+
+
+def stream_reports_tar(reports: Iterator[Tuple[str, str, str, str]],
+                       legacy_dir: Optional[Path] = None,
+                       since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> Iterator[bytes]:
+    """Stream reports as a gzipped tar of `<request_id>/<report name>` members.
+
+    `reports` yields (request_id, name, created_at, markdown) from the report
+    store; reports still in legacy per-analysis directories follow them. The
+    tar is written in stream mode, so only the member being added and the
+    compressor's window are held in memory.
+    """
+    buffer = _ChunkBuffer()
+    with tarfile.open(fileobj=buffer, mode="w|gz") as tar:
+        for request_id, name, created_at, text in reports:
+            data = text.encode("utf-8")
+            info = tarfile.TarInfo(f"{request_id}/{name}")
+            info.size = len(data)
+            info.mtime = int(datetime.fromisoformat(created_at).timestamp())
+            tar.addfile(info, io.BytesIO(data))
+            if buffer.size >= CHUNK_BYTES:
+                yield buffer.take()
+
+        for path, arcname in _legacy_files(legacy_dir, since, until):
+            try:
+                tar.add(path, arcname=arcname, recursive=False)
+            except OSError as e:
+                logger.warning("Skipping report %s: %s", path, e)
+                continue
+            if buffer.size >= CHUNK_BYTES:
+                yield buffer.take()
+    yield buffer.take()
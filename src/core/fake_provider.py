@@ -0,0 +1,258 @@
+"""Deterministic offline stand-in for Upsonic agents.
+
+Used for load tests and benchmarks without a provider key or network. The
+fake agent returns ticker-aware markdown shaped like real phase output,
+sleeps according to a time-to-first-token plus per-token latency model,
+and injects provider errors and 429s at configured rates.
+"""
+
+import asyncio
+import hashlib
+import random
+import re
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.settings import settings
+from .tokens import estimate_tokens
+
+_TICKER_LINE = re.compile(r"^\s*(?i:companies to (?:analyze|rank)):\s*(.+)$", re.MULTILINE)
+_RANKED_TICKER = re.compile(r"(?:^|\s)\d+\. \*\*([A-Z0-9.\-]{1,10})\*\*", re.MULTILINE)
+# Lines such as "**Companies:** AAPL, MSFT" in the reports earlier phases pass on
+_COMPANY_LINE = re.compile(r"^.*\bcompan(?:y|ies)\b[^:\n]*:\**(.+)$", re.IGNORECASE | re.MULTILINE)
+_SYMBOL = re.compile(r"\b[A-Z]{1,5}\b")
+# Capitalised words the prompts use for emphasis, never tickers
+_NOT_TICKERS = frozenset({
+    "A", "ALL", "AND", "ANY", "EACH", "EXACT", "FOR", "IN", "IS", "MUST", "NO", "NOT", "OF", "ON",
+    "ONLY", "OR", "THE", "THESE", "TO", "USE"
+})
+
+
+class FakeProviderError(Exception):
+    """Simulated provider failure carrying an HTTP status code"""
+
+    def __init__(self, message: str, status_code: int):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+@dataclass
+class FakeRunOutput:
+    """Minimal stand-in for Upsonic's AgentRunOutput"""
+    output: str
+
+
+@dataclass
+class FakeLatencyModel:
+    """Latency and failure model for the fake provider"""
+    ttft_ms: float = 400.0
+    ttft_jitter: float = 0.5
+    tokens_per_second: float = 80.0
+    error_rate: float = 0.0
+    rate_limit_rate: float = 0.0
+    seed: Optional[int] = None
+
+    @classmethod
+    def from_settings(cls) -> "FakeLatencyModel":
+        """Build the latency model from application settings"""
+        return cls(
+            ttft_ms=settings.fake_ttft_ms,
+            ttft_jitter=settings.fake_ttft_jitter,
+            tokens_per_second=settings.fake_tokens_per_second,
+            error_rate=settings.fake_error_rate,
+            rate_limit_rate=settings.fake_rate_limit_rate,
+            seed=settings.fake_seed
+        )
+
+
+_rng_lock = threading.Lock()
+_rng: Optional[random.Random] = None
+
+
+def _shared_rng(seed: Optional[int]) -> random.Random:
+    """Process-wide RNG for latency and fault draws, reproducible when seeded"""
+    global _rng
+    with _rng_lock:
+        if _rng is None:
+            _rng = random.Random(seed)
+        return _rng
+
+
+def _stable_int(*parts: str) -> int:
+    """Deterministic integer derived from the given strings"""
+    digest = hashlib.sha256("\x1f".join(parts).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def _extract_tickers(prompt: str) -> List[str]:
+    """Find the ticker list a phase prompt refers to"""
+    match = _TICKER_LINE.search(prompt)
+    if match:
+        return [t.strip() for t in match.group(1).split(",") if t.strip()]
+    ranked = _RANKED_TICKER.findall(prompt)
+    if ranked:
+        return list(dict.fromkeys(ranked))
+    symbols = [
+        symbol
+        for line in _COMPANY_LINE.findall(prompt)
+        for symbol in _SYMBOL.findall(line)
+        if symbol not in _NOT_TICKERS
+    ]
+    return list(dict.fromkeys(symbols)) or ["AAPL"]
+
+
+def _metrics(ticker: str) -> Dict[str, float]:
+    """Deterministic, plausible-looking metrics for a ticker"""
+    rng = random.Random(_stable_int("metrics", ticker))
+    return {
+        "pe": round(rng.uniform(8, 45), 1),
+        "growth": round(rng.uniform(-5, 35), 1),
+        "margin": round(rng.uniform(5, 40), 1),
+        "debt": round(rng.uniform(0.1, 2.5), 2),
+        "score": round(rng.uniform(4, 9.5), 1),
+        "beta": round(rng.uniform(0.6, 1.8), 2),
+    }
+
+
+def _stock_analysis(tickers: List[str]) -> str:
+    lines = ["# Comprehensive Stock Analysis", ""]
+    for ticker in tickers:
+        m = _metrics(ticker)
+        lines += [
+            f"## {ticker}",
+            "",
+            "### Market Position",
+            f"{ticker} holds an established position in its segment with a "
+            f"composite competitive score of {m['score']}/10.",
+            "",
+            "### Financial Metrics",
+            f"- P/E ratio: {m['pe']}",
+            f"- Revenue growth (YoY): {m['growth']}%",
+            f"- Operating margin: {m['margin']}%",
+            f"- Debt/Equity: {m['debt']}",
+            "",
+            "### Risk Assessment",
+            f"- Beta of {m['beta']} relative to the broad market",
+            "- Exposure to supply chain disruption and margin pressure",
+            "- Regulatory and macroeconomic sensitivity",
+            "",
+            "### Growth Potential",
+            f"Analyst consensus points to continued expansion; momentum for {ticker} "
+            f"is {'strong' if m['growth'] > 15 else 'moderate' if m['growth'] > 0 else 'weak'}.",
+            "",
+        ]
+    lines.append("_This analysis is for educational purposes only._")
+    return "\n".join(lines)
+
+
+def _ranking(tickers: List[str]) -> str:
+    ranked = sorted(tickers, key=lambda t: _metrics(t)["score"], reverse=True)
+    lines = ["# Investment Ranking", "", "## Company Rankings", ""]
+    for position, ticker in enumerate(ranked, 1):
+        lines.append(f"{position}. **{ticker}** - score {_metrics(ticker)['score']}/10")
+    lines += ["", "## Investment Rationale", ""]
+    for ticker in ranked:
+        m = _metrics(ticker)
+        lines.append(f"- **{ticker}**: {m['growth']}% growth at {m['pe']}x earnings.")
+    lines += ["", "## Risk Evaluation", ""]
+    for ticker in ranked:
+        lines.append(f"- **{ticker}**: beta {_metrics(ticker)['beta']}, leverage {_metrics(ticker)['debt']}.")
+    lines += ["", "## Growth Potential", ""]
+    for ticker in ranked:
+        lines.append(f"- **{ticker}**: margin {_metrics(ticker)['margin']}% supports reinvestment.")
+    return "\n".join(lines)
+
+
+def _allocation(tickers: List[str]) -> str:
+    scores = {t: _metrics(t)["score"] for t in tickers}
+    total = sum(scores.values())
+    weights = {t: int(round(100 * s / total)) for t, s in scores.items()}
+    # Push rounding drift onto the top pick so the allocation totals exactly 100%
+    top = max(scores, key=scores.get)
+    weights[top] += 100 - sum(weights.values())
+
+    lines = ["# Portfolio Allocation", "", "## Allocation Strategy", "",
+             "| Ticker | Allocation |", "|---|---|"]
+    for ticker in sorted(weights, key=weights.get, reverse=True):
+        lines.append(f"| {ticker} | {weights[ticker]}% |")
+    lines += ["", "## Investment Thesis", ""]
+    for ticker in tickers:
+        lines.append(f"- **{ticker}**: weighted by risk-adjusted score {scores[ticker]}/10.")
+    lines += ["", "## Risk Management", "",
+              "- Rebalance quarterly and cap any single position at 50%.", "",
+              "## Final Recommendations", "",
+              f"Overweight {top}; hold the remaining positions at target weights."]
+    return "\n".join(lines)
+
+
+_PHASE_WRITERS = {
+    "Stock Analyst": _stock_analysis,
+    "Research Analyst": _ranking,
+    "Investment Lead": _allocation,
+}
+
+
+class FakeAgent:
+    """Drop-in replacement for upsonic.Agent that never touches the network"""
+
+    def __init__(self,
+                 model: str = "fake/model",
+                 *,
+                 name: str = "Stock Analyst",
+                 role: Optional[str] = None,
+                 goal: Optional[str] = None,
+                 instructions: Optional[str] = None,
+                 settings: Optional[Dict[str, Any]] = None,
+                 latency: Optional[FakeLatencyModel] = None):
+        self.model = model
+        self.name = name
+        self.role = role
+        self.goal = goal
+        self.instructions = instructions
+        self.settings = settings or {}
+        self.latency = latency or FakeLatencyModel.from_settings()
+
+    def _respond(self, task: Any, model: Optional[str]) -> Tuple[str, float, Optional[FakeProviderError]]:
+        """Build the response text and decide how long it takes, or pick a fault.
+
+        Faults come back with the sampled time to first token, since a real
+        provider also takes a round trip to refuse a request.
+        """
+        prompt = getattr(task, "description", None) or str(task)
+        rng = _shared_rng(self.latency.seed)
+        with _rng_lock:
+            fault = rng.random()
+            ttft = (self.latency.ttft_ms / 1000.0) * rng.lognormvariate(0, self.latency.ttft_jitter)
+
+        if fault < self.latency.rate_limit_rate:
+            return "", ttft, FakeProviderError("429 Too Many Requests: rate limit reached for requests", 429)
+        if fault < self.latency.rate_limit_rate + self.latency.error_rate:
+            return "", ttft, FakeProviderError("503 Service Unavailable: the server is overloaded", 503)
+
+        writer = _PHASE_WRITERS.get(self.name, _stock_analysis)
+        text = writer(_extract_tickers(prompt))
+
+        completion_tokens = estimate_tokens(text)
+        max_tokens = self.settings.get("max_tokens")
+        if max_tokens:
+            completion_tokens = min(completion_tokens, max_tokens)
+        duration = ttft + completion_tokens / max(self.latency.tokens_per_second, 1e-6)
+        return text, duration, None
+
+    async def do_async(self, task: Any, model: Optional[str] = None, return_output: bool = False, **kwargs) -> Any:
+        """Async counterpart of Agent.do_async"""
+        text, duration, error = self._respond(task, model)
+        await asyncio.sleep(duration)
+        if error is not None:
+            raise error
+        return FakeRunOutput(output=text) if return_output else text
+
+    def do(self, task: Any, model: Optional[str] = None, **kwargs) -> str:
+        """Blocking counterpart of Agent.do"""
+        text, duration, error = self._respond(task, model)
+        time.sleep(duration)
+        if error is not None:
+            raise error
+        return text
@@ -0,0 +1,206 @@
+"""Hedged requests and provider failover for agent calls"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, Optional, Tuple, TypeVar
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies per phase and model"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def record(self, phase: str, model: str, seconds: float) -> None:
+        """Record the latency of one call"""
+        key = (phase, model)
+        if key not in self._samples:
+            self._samples[key] = deque(maxlen=self.window)
+        self._samples[key].append(seconds)
+
+    def percentile(self, phase: str, model: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """Get the q-th percentile (0-1) of recent latencies, if enough samples exist"""
+        samples = self._samples.get((phase, model))
+        if not samples or len(samples) < min_samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(q * len(ordered)))
+        return ordered[index]
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get sample counts and percentiles per phase and model"""
+        stats = {}
+        for (phase, model), samples in self._samples.items():
+            ordered = sorted(samples)
+            stats[f"{phase}:{model}"] = {
+                "samples": len(ordered),
+                "p50": round(ordered[len(ordered) // 2], 3),
+                "p95": round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))], 3)
+            }
+        return stats
+
+
+class HedgedExecutor:
+    """Runs a phase call on the primary model with optional hedging and failover.
+
+    When hedging is enabled and the primary call has not returned within the
+    configured percentile of its recent latency, a duplicate call is started
+    on the secondary model. The first successful result wins and the other
+    call is cancelled. Independently, a primary call that fails is retried
+    once on the secondary model when failover is enabled.
+    """
+
+    def __init__(self,
+                 hedging_enabled: bool = False,
+                 hedge_percentile: float = 0.95,
+                 hedge_min_samples: int = 20,
+                 hedge_min_delay: float = 1.0,
+                 failover_enabled: bool = True):
+        self.hedging_enabled = hedging_enabled
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples
+        self.hedge_min_delay = hedge_min_delay
+        self.failover_enabled = failover_enabled
+        self.latency = LatencyTracker()
+        self.calls = 0
+        self.hedges_fired = 0
+        self.hedge_wins = 0
+        self.failovers = 0
+        self.failover_successes = 0
+
+    @classmethod
+    def from_settings(cls) -> "HedgedExecutor":
+        """Build the executor from application settings"""
+        return cls(
+            hedging_enabled=settings.hedging_enabled,
+            hedge_percentile=settings.hedge_percentile,
+            hedge_min_samples=settings.hedge_min_samples,
+            hedge_min_delay=settings.hedge_min_delay,
+            failover_enabled=settings.failover_enabled
+        )
+
+    async def run(self,
+                  phase: str,
+                  primary_model: str,
+                  secondary_model: Optional[str],
+                  call: Callable[[str], Awaitable[T]]) -> T:
+        """Run `call(model)` for a phase, hedging and failing over to the secondary model"""
+        self.calls += 1
+        if not secondary_model or secondary_model == primary_model:
+            return await self._timed(phase, primary_model, call)
+
+        delay = self._hedge_delay(phase, primary_model)
+        primary = asyncio.ensure_future(self._timed(phase, primary_model, call))
+
+        try:
+            if delay is not None:
+                done, _ = await asyncio.wait({primary}, timeout=delay)
+                if not done:
+                    return await self._hedge(phase, primary, primary_model, secondary_model, call)
+            try:
+                return await primary
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                if not self.failover_enabled:
+                    raise
+                return await self._failover(phase, e, primary_model, secondary_model, call)
+        finally:
+            if not primary.done():
+                primary.cancel()
+
+    def _hedge_delay(self, phase: str, model: str) -> Optional[float]:
+        """Get how long to wait for the primary before hedging, if hedging applies"""
+        if not self.hedging_enabled:
+            return None
+        threshold = self.latency.percentile(
+            phase, model, self.hedge_percentile, self.hedge_min_samples
+        )
+        if threshold is None:
+            return None
+        return max(threshold, self.hedge_min_delay)
+
+    async def _hedge(self,
+                     phase: str,
+                     primary: "asyncio.Future[T]",
+                     primary_model: str,
+                     secondary_model: str,
+                     call: Callable[[str], Awaitable[T]]) -> T:
+        """Race a duplicate call on the secondary model against the slow primary"""
+        self.hedges_fired += 1
+        logger.info("Hedging %s call on %s after slow %s", phase, secondary_model, primary_model)
+        started = time.monotonic()
+        hedge = asyncio.ensure_future(self._timed(phase, secondary_model, call))
+
+        try:
+            winner = await self._first_success([primary, hedge])
+        finally:
+            for task in (primary, hedge):
+                if not task.done():
+                    task.cancel()
+
+        if winner is hedge:
+            self.hedge_wins += 1
+            # The abandoned primary took at least this long; keep the window honest
+            self.latency.record(phase, primary_model, time.monotonic() - started)
+        return winner.result()
+
+    @staticmethod
+    async def _first_success(tasks: Iterable["asyncio.Future[T]"]) -> "asyncio.Future[T]":
+        """Wait for the first task that completes without error"""
+        pending = set(tasks)
+        error: Optional[BaseException] = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is None:
+                    return task
+                error = task.exception()
+        raise error if error else asyncio.CancelledError()
+
+    async def _failover(self,
+                        phase: str,
+                        error: Exception,
+                        primary_model: str,
+                        secondary_model: str,
+                        call: Callable[[str], Awaitable[T]]) -> T:
+        """Retry a failed primary call once on the secondary model"""
+        self.failovers += 1
+        logger.warning(
+            "%s call on %s failed (%s), failing over to %s",
+            phase, primary_model, type(error).__name__, secondary_model
+        )
+        result = await self._timed(phase, secondary_model, call)
+        self.failover_successes += 1
+        return result
+
+    async def _timed(self, phase: str, model: str, call: Callable[[str], Awaitable[T]]) -> T:
+        """Run a call and record its latency on success"""
+        started = time.monotonic()
+        result = await call(model)
+        self.latency.record(phase, model, time.monotonic() - started)
+        return result
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get hedging and failover counters"""
+        return {
+            "calls": self.calls,
+            "hedges_fired": self.hedges_fired,
+            "hedge_wins": self.hedge_wins,
+            "hedge_fire_rate": round(self.hedges_fired / self.calls, 4) if self.calls else 0.0,
+            "hedge_win_rate": round(self.hedge_wins / self.hedges_fired, 4) if self.hedges_fired else 0.0,
+            "failovers": self.failovers,
+            "failover_successes": self.failover_successes,
+            "latency": self.latency.get_stats()
+        }
@@ -0,0 +1,124 @@
+"""Durable Idempotency-Key records for analysis submissions"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from ..config.settings import settings
+from .state_store import connect_shared_db
+
+logger = logging.getLogger(__name__)
+
+
+class IdempotencyKeyReusedError(ValueError):
+    """An Idempotency-Key was sent again with a different request body"""
+
+
+def fingerprint(body: Dict[str, Any]) -> str:
+    """Hash a request body independently of key order"""
+    return hashlib.sha256(json.dumps(body, sort_keys=True, separators=(",", ":")).encode("utf-8")).hexdigest()
+
+
+class IdempotencyStore:
+    """Maps client idempotency keys to the analysis they started.
+
+    A key is claimed atomically before any agent work starts, so concurrent
+    or retried submissions with the same key and body all resolve to one
+    request ID, across worker processes. Keys expire after `ttl` seconds;
+    expired rows are purged at most once per `purge_interval`. A claim can
+    only be released once it is `grace` seconds old, so a worker that has
+    claimed a key but not yet stored its analysis keeps it.
+    """
+
+    def __init__(self, path: Path, ttl: float = 86400.0, grace: float = 10.0, purge_interval: float = 3600.0):
+        self.path = path
+        self.ttl = ttl
+        self.grace = grace
+        self.purge_interval = purge_interval
+        self.repeats = 0
+        self._last_purge = 0.0
+        self._lock = threading.Lock()
+        self._conn = connect_shared_db(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS idempotency_keys (
+                key TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                request_id TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                claimed_at REAL NOT NULL DEFAULT 0
+            );
+            CREATE INDEX IF NOT EXISTS idx_idempotency_expires ON idempotency_keys (expires_at);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(idempotency_keys)")}
+        if "claimed_at" not in columns:
+            self._conn.execute("ALTER TABLE idempotency_keys ADD COLUMN claimed_at REAL NOT NULL DEFAULT 0")
+
+    @classmethod
+    def from_settings(cls) -> "IdempotencyStore":
+        """Build the store from application settings"""
+        return cls(
+            settings.reports_dir / "idempotency.db",
+            ttl=settings.idempotency_ttl_hours * 3600,
+            grace=settings.idempotency_claim_grace_seconds
+        )
+
+    def claim(self, key: str, body_fingerprint: str, request_id: str) -> Tuple[str, bool]:
+        """Bind `key` to `request_id` unless a live record exists.
+
+        Returns the bound request ID and whether this call claimed the key.
+        Raises IdempotencyKeyReusedError if the key is live for another body.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT fingerprint, request_id FROM idempotency_keys WHERE key = ? AND expires_at > ?",
+                    (key, now)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, request_id, expires_at, claimed_at) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        (key, body_fingerprint, request_id, now + self.ttl, now)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            if now - self._last_purge > self.purge_interval:
+                self._last_purge = now
+                purged = self._conn.execute("DELETE FROM idempotency_keys WHERE expires_at <= ?", (now,)).rowcount
+                if purged:
+                    logger.info("Purged %d expired idempotency keys", purged)
+
+        if row is None:
+            return request_id, True
+        if row[0] != body_fingerprint:
+            raise IdempotencyKeyReusedError(key)
+        self.repeats += 1
+        return row[1], False
+
+    def release(self, key: str, request_id: str) -> bool:
+        """Forget a key whose analysis is gone, so the next submission starts a new one.
+
+        Only claims older than the grace period are released; returns
+        whether the key was released.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM idempotency_keys WHERE key = ? AND request_id = ? AND claimed_at <= ?",
+                (key, request_id, time.time() - self.grace)
+            )
+        return cursor.rowcount > 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            live = self._conn.execute(
+                "SELECT COUNT(*) FROM idempotency_keys WHERE expires_at > ?", (time.time(),)
+            ).fetchone()[0]
+        return {"live_keys": live, "repeats": self.repeats, "ttl_hours": round(self.ttl / 3600, 2)}
@@ -1,13 +1,54 @@
 """Centralized logging configuration"""
 
+import atexit
+import copy
+import json
 import logging
+import queue
 import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
 from pathlib import Path
-from logging.handlers import RotatingFileHandler
-from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from datetime import datetime, timezone
+from typing import Iterator, Optional
 
 from ..config.settings import settings
 
+# Analysis context stamped onto every record logged from the current task
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+phase_var: ContextVar[Optional[str]] = ContextVar("phase", default=None)
+
+_listener: Optional[QueueListener] = None
+
+
+@contextmanager
+def log_context(request_id: Optional[str] = None, phase: Optional[str] = None) -> Iterator[None]:
+    """Tag log records emitted inside the block with a request ID and/or phase"""
+    tokens = []
+    if request_id is not None:
+        tokens.append((request_id_var, request_id_var.set(request_id)))
+    if phase is not None:
+        tokens.append((phase_var, phase_var.set(phase)))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Copies the request ID and phase from context variables onto each record.
+    
+    Runs in the logging thread's caller, before the record is queued, since
+    context variables are not visible from the listener thread.
+    """
+    
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        record.phase = phase_var.get()
+        return True
+
 
 class ColoredFormatter(logging.Formatter):
     """Custom formatter with colors for console output"""
@@ -25,56 +66,132 @@ class ColoredFormatter(logging.Formatter):
         log_color = self.COLORS.get(record.levelname, self.COLORS['RESET'])
         reset_color = self.COLORS['RESET']
         
-        # Add color to levelname
+        # Color a copy so other handlers see the plain levelname
+        record = copy.copy(record)
         record.levelname = f"{log_color}{record.levelname}{reset_color}"
         
         return super().format(record)
 
 
-def setup_logging():
-    """Setup centralized logging configuration"""
+class JSONFormatter(logging.Formatter):
+    """One JSON object per record, carrying the analysis request ID and phase"""
+    
+    def format(self, record):
+        payload = {
+            "timestamp": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "request_id": getattr(record, "request_id", None),
+            "phase": getattr(record, "phase", None),
+            "process": record.process,
+            "thread": record.threadName
+        }
+        if record.exc_info:
+            payload["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            payload["exception"] = record.exc_text
+        return json.dumps(payload, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    """Queue handler that keeps exception text out of the merged message.
+    
+    The stock handler formats the traceback into the message before
+    queueing; this keeps it in exc_text so the JSON formatter can put it in
+    its own field.
+    """
+    
+    def prepare(self, record):
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+
+def stop_logging() -> None:
+    """Flush queued records and stop the background logging thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def setup_logging(file_logging: bool = True, console_json: bool = False):
+    """Setup centralized logging configuration
+    
+    Records are handed to a queue and written by a background listener
+    thread, so formatting, file I/O and rotation never run on the event loop.
+    Set `file_logging=False` where several processes would share the log files,
+    and `console_json=True` to keep structured records on stdout instead.
+    """
+    global _listener
     
     # Create logs directory
     logs_dir = Path("logs")
-    logs_dir.mkdir(exist_ok=True)
+    if file_logging:
+        logs_dir.mkdir(exist_ok=True)
     
     # Root logger configuration
     root_logger = logging.getLogger()
     root_logger.setLevel(getattr(logging, settings.log_level))
     
     # Clear existing handlers
+    stop_logging()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
     
-    # Console handler with colors
+    handlers = []
+    
+    # Console handler with colors, or JSON lines for a log collector
     console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setLevel(logging.INFO)
-    console_formatter = ColoredFormatter(
-        '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-    )
+    if console_json:
+        console_formatter = JSONFormatter()
+    else:
+        console_formatter = ColoredFormatter(
+            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+        )
     console_handler.setFormatter(console_formatter)
-    root_logger.addHandler(console_handler)
-    
-    # File handler with rotation
-    file_handler = RotatingFileHandler(
-        logs_dir / "investment_analyzer.log",
-        maxBytes=10 * 1024 * 1024,  # 10MB
-        backupCount=5
-    )
-    file_handler.setLevel(logging.DEBUG)
-    file_formatter = logging.Formatter(settings.log_format)
-    file_handler.setFormatter(file_formatter)
-    root_logger.addHandler(file_handler)
-    
-    # Error-only file handler
-    error_handler = RotatingFileHandler(
-        logs_dir / "errors.log",
-        maxBytes=5 * 1024 * 1024,  # 5MB
-        backupCount=3
-    )
-    error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(file_formatter)
-    root_logger.addHandler(error_handler)
+    handlers.append(console_handler)
+    
+    if file_logging:
+        file_formatter = JSONFormatter() if settings.log_json else logging.Formatter(settings.log_format)
+        
+        # File handler with rotation
+        file_handler = RotatingFileHandler(
+            logs_dir / "investment_analyzer.log",
+            maxBytes=10 * 1024 * 1024,  # 10MB
+            backupCount=5
+        )
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(file_formatter)
+        handlers.append(file_handler)
+        
+        # Error-only file handler
+        error_handler = RotatingFileHandler(
+            logs_dir / "errors.log",
+            maxBytes=5 * 1024 * 1024,  # 5MB
+            backupCount=3
+        )
+        error_handler.setLevel(logging.ERROR)
+        error_handler.setFormatter(file_formatter)
+        handlers.append(error_handler)
+    
+    # Callers only enqueue; the listener thread formats and writes
+    log_queue = queue.SimpleQueue()
+    queue_handler = _ContextQueueHandler(log_queue)
+    queue_handler.addFilter(ContextFilter())
+    root_logger.addHandler(queue_handler)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
     
     # Configure specific loggers
     
@@ -92,6 +209,9 @@ def setup_logging():
     logging.info("Logging configuration completed")
 
 
+atexit.register(stop_logging)
+
+
 def get_logger(name: str) -> logging.Logger:
     """Get a logger with the specified name"""
     return logging.getLogger(name)
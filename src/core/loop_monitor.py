@@ -0,0 +1,128 @@
+"""Event-loop lag monitor with a watchdog that logs blocking callbacks"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+from ..config.settings import settings
+from .metrics import EVENT_LOOP_BLOCKS, EVENT_LOOP_LAG, EVENT_LOOP_LAG_CURRENT
+
+logger = logging.getLogger(__name__)
+
+
+class LoopMonitor:
+    """Measures event-loop lag and reports callbacks that block the loop.
+
+    A task on the loop sleeps for `interval` and records how late it wakes
+    up. Each wake-up also stamps a heartbeat; a watchdog thread that sees
+    no heartbeat for `block_threshold` captures the loop thread's stack,
+    which is the callback currently blocking it, and logs it once per stall.
+    """
+
+    def __init__(self, interval: float = 0.1, block_threshold: float = 0.25, window: int = 600):
+        self.interval = interval
+        self.block_threshold = block_threshold
+        self.lag = 0.0
+        self.blocked_count = 0
+        self._lags: Deque[float] = deque(maxlen=window)
+        self._heartbeat = time.monotonic()
+        self._beats = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._task: Optional["asyncio.Task"] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def from_settings(cls) -> "LoopMonitor":
+        """Build the monitor from application settings"""
+        return cls(interval=settings.loop_lag_interval, block_threshold=settings.loop_block_threshold)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        """Start measuring on the running loop and start the watchdog thread"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._task = self._loop.create_task(self._measure(), name="loop-lag-monitor")
+        self._watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            "Event loop monitor started (interval %.0fms, block threshold %.0fms)",
+            self.interval * 1000, self.block_threshold * 1000
+        )
+
+    async def stop(self) -> None:
+        """Stop the measuring task and the watchdog"""
+        self._stop.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._watchdog is not None:
+            self._watchdog.join(timeout=self.block_threshold * 2)
+            self._watchdog = None
+
+    async def _measure(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - started - self.interval)
+            self._heartbeat = time.monotonic()
+            self._beats += 1
+            self.lag = lag
+            self._lags.append(lag)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_CURRENT.set(lag)
+
+    def _watch(self) -> None:
+        reported_beat = -1
+        while not self._stop.wait(self.block_threshold / 2):
+            stalled_for = time.monotonic() - self._heartbeat
+            # The heartbeat is due every `interval`; anything beyond that is blocking
+            if stalled_for - self.interval < self.block_threshold or self._beats == reported_beat:
+                continue
+            reported_beat = self._beats
+            self.blocked_count += 1
+            EVENT_LOOP_BLOCKS.inc()
+
+            frame = sys._current_frames().get(self._loop_thread_id)
+            stack = "".join(traceback.format_stack(frame)) if frame is not None else "<no frame>\n"
+            task = asyncio.current_task(self._loop) if self._loop is not None else None
+            logger.warning(
+                "Event loop blocked for %.0fms+ (task %s); blocking stack:\n%s",
+                (stalled_for - self.interval) * 1000,
+                task.get_name() if task is not None else "none",
+                stack
+            )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get current and recent loop lag"""
+        ordered = sorted(self._lags)
+        count = len(ordered)
+        return {
+            "running": self.running,
+            "lag_ms": round(self.lag * 1000, 3),
+            "lag_p99_ms": round(ordered[min(count - 1, int(0.99 * count))] * 1000, 3) if count else 0.0,
+            "lag_max_ms": round(ordered[-1] * 1000, 3) if count else 0.0,
+            "blocked_count": self.blocked_count
+        }
+
+
+# Global monitor instance
+loop_monitor = LoopMonitor.from_settings()
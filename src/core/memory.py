@@ -0,0 +1,256 @@
+"""Memory accounting: deep sizes, tracemalloc allocation sites and a high-water guard"""
+
+import asyncio
+import gc
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from ..config.settings import settings
+from .metrics import PROCESS_RSS, RESULTS_EVICTED
+
+logger = logging.getLogger(__name__)
+
+# Leaves whose size is counted but never traversed
+_ATOMIC = (str, bytes, bytearray, int, float, complex, bool, type(None), datetime)
+
+
+def deep_sizeof(obj: Any, seen: Optional[set] = None) -> int:
+    """Estimate the bytes reachable from `obj`, counting shared objects once per `seen`"""
+    seen = set() if seen is None else seen
+    total = 0
+    stack = [obj]
+    while stack:
+        item = stack.pop()
+        if id(item) in seen or isinstance(item, (type, Enum)):
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+
+        if isinstance(item, _ATOMIC):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset, deque)):
+            stack.extend(item)
+        elif isinstance(item, BaseModel):
+            stack.append(item.__dict__)
+        elif hasattr(item, "__dict__"):
+            stack.append(vars(item))
+    return total
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process, where /proc is available"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def registry_size_by_status(results: List[Any], sample_limit: int = 5000) -> Dict[str, Dict[str, Any]]:
+    """Estimate the deep size of cached results grouped by status.
+
+    Above `sample_limit` results an evenly spaced sample is measured and
+    scaled up per status.
+    """
+    step = max(1, len(results) // sample_limit) if sample_limit else 1
+    counts: Dict[str, int] = {}
+    sampled: Dict[str, Tuple[int, int]] = {}
+    seen: set = set()
+
+    for index, result in enumerate(results):
+        status = result.status.value
+        counts[status] = counts.get(status, 0) + 1
+        if index % step:
+            continue
+        measured, size = sampled.get(status, (0, 0))
+        sampled[status] = (measured + 1, size + deep_sizeof(result, seen))
+
+    by_status = {}
+    for status, count in counts.items():
+        measured, size = sampled.get(status, (0, 0))
+        estimate = int(size * count / measured) if measured else 0
+        by_status[status] = {"count": count, "bytes": estimate, "mb": round(estimate / 2**20, 2)}
+    return by_status
+
+
+class AllocationTracker:
+    """Opt-in tracemalloc wrapper reporting the top allocation sites"""
+
+    _IGNORED = ("<frozen importlib._bootstrap>", "<frozen importlib._bootstrap_external>", tracemalloc.__file__)
+
+    @property
+    def enabled(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        """Start tracing allocations, keeping `frames` frames per traceback"""
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+            logger.info("tracemalloc started with %d frame(s)", frames)
+
+    def stop(self) -> None:
+        """Stop tracing and free the traces"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+            logger.info("tracemalloc stopped")
+
+    def traced_bytes(self) -> Optional[int]:
+        """Currently traced bytes, or None while tracing is off"""
+        return tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+
+    def top(self, limit: int = 20, group_by: str = "lineno") -> List[Dict[str, Any]]:
+        """Get the allocation sites holding the most memory"""
+        if not tracemalloc.is_tracing():
+            return []
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, pattern) for pattern in self._IGNORED]
+        )
+        return [
+            {
+                "site": "; ".join(f"{frame.filename}:{frame.lineno}" for frame in stat.traceback),
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count
+            }
+            for stat in snapshot.statistics(group_by)[:limit]
+        ]
+
+    def get_stats(self, limit: int = 20) -> Dict[str, Any]:
+        """Get tracemalloc totals and top allocation sites"""
+        if not tracemalloc.is_tracing():
+            return {"enabled": False}
+        current, peak = tracemalloc.get_traced_memory()
+        return {
+            "enabled": True,
+            "frames": tracemalloc.get_traceback_limit(),
+            "current_mb": round(current / 2**20, 2),
+            "peak_mb": round(peak / 2**20, 2),
+            "top": self.top(limit)
+        }
+
+
+class MemoryGuard:
+    """Evicts finished analyses when RSS crosses a high-water mark.
+
+    Runs as a background task. Once RSS is above the high-water mark, each
+    check evicts a fraction of the cache, oldest finished analyses first,
+    then collects garbage, until RSS falls below the low-water mark. Freed
+    objects often leave RSS where it was, so after `max_ineffective`
+    evictions in a row that did not lower it eviction pauses for
+    `cooldown` seconds instead of draining the cache.
+    """
+
+    def __init__(self,
+                 evict: Callable[[float], Awaitable[int]],
+                 high_water_mb: Optional[float] = None,
+                 interval: float = 10.0,
+                 evict_fraction: float = 0.25,
+                 low_water_mb: Optional[float] = None,
+                 max_ineffective: int = 2,
+                 cooldown: float = 300.0):
+        self.evict = evict
+        self.high_water_mb = high_water_mb
+        self.low_water_mb = low_water_mb if low_water_mb is not None else (high_water_mb or 0) * 0.9
+        self.interval = interval
+        self.evict_fraction = evict_fraction
+        self.max_ineffective = max_ineffective
+        self.cooldown = cooldown
+        self.evictions = 0
+        self.evicted_results = 0
+        self.pauses = 0
+        self.ineffective = 0
+        self._evicting = False
+        self._last_evict_rss: Optional[int] = None
+        self._paused_until = 0.0
+
+    @classmethod
+    def from_settings(cls, evict: Callable[[float], Awaitable[int]]) -> "MemoryGuard":
+        """Build the guard from application settings"""
+        return cls(
+            evict,
+            high_water_mb=settings.memory_high_water_mb,
+            interval=settings.memory_check_interval,
+            evict_fraction=settings.memory_evict_fraction,
+            low_water_mb=settings.memory_low_water_mb,
+            max_ineffective=settings.memory_max_ineffective_evictions,
+            cooldown=settings.memory_evict_cooldown
+        )
+
+    async def check(self) -> int:
+        """Evict if RSS calls for it; returns results evicted"""
+        rss = current_rss_bytes()
+        if rss is None or not self.high_water_mb:
+            return 0
+        if rss < self.low_water_mb * 2**20:
+            self._evicting = False
+            self._last_evict_rss = None
+            self.ineffective = 0
+            return 0
+        if not self._evicting and rss < self.high_water_mb * 2**20:
+            return 0
+
+        now = time.monotonic()
+        if now < self._paused_until:
+            return 0
+        if self._last_evict_rss is not None:
+            self.ineffective = 0 if rss < self._last_evict_rss else self.ineffective + 1
+        if self.ineffective >= self.max_ineffective:
+            self._paused_until = now + self.cooldown
+            self._last_evict_rss = None
+            self.ineffective = 0
+            self.pauses += 1
+            logger.warning(
+                "RSS %.0fMB did not drop after %d evictions; pausing eviction for %.0fs",
+                rss / 2**20, self.max_ineffective, self.cooldown
+            )
+            return 0
+
+        evicted = await self.evict(self.evict_fraction)
+        await asyncio.to_thread(gc.collect)
+        self._evicting = True
+        self._last_evict_rss = rss
+        self.evictions += 1
+        self.evicted_results += evicted
+        RESULTS_EVICTED.labels("memory").inc(evicted)
+        logger.warning(
+            "RSS %.0fMB above low-water mark %.0fMB; evicted %d cached analyses",
+            rss / 2**20, self.low_water_mb, evicted
+        )
+        return evicted
+
+    async def run(self) -> None:
+        """Check memory every `interval` seconds until cancelled"""
+        if current_rss_bytes() is None:
+            logger.warning("RSS is not readable on this platform; memory high-water mark disabled")
+            return
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.check()
+            except Exception as e:
+                logger.error("Memory check failed: %s", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "high_water_mb": self.high_water_mb,
+            "low_water_mb": self.low_water_mb,
+            "evictions": self.evictions,
+            "evicted_results": self.evicted_results,
+            "pauses": self.pauses,
+            "paused": time.monotonic() < self._paused_until
+        }
+
+
+PROCESS_RSS.set_function(lambda: current_rss_bytes() or 0)
@@ -0,0 +1,206 @@
+"""Prometheus metrics for the API workers, with multiprocess support"""
+
+import logging
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+
+logger = logging.getLogger(__name__)
+
+# Agent calls take seconds to minutes; phases chain up to three of them
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+SIZE_BUCKETS = (4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+TOKEN_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096, 8192, 16384, 32768, 65536)
+
+# Set by run_api.py in production mode before any worker imports prometheus_client
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def multiprocess_enabled() -> bool:
+    """Whether metrics are shared across worker processes through PROMETHEUS_MULTIPROC_DIR"""
+    return bool(os.environ.get(MULTIPROC_DIR_ENV))
+
+
+def prepare_multiprocess_dir(path: Path) -> None:
+    """Point workers at an empty metrics directory; call in the parent before they start"""
+    shutil.rmtree(path, ignore_errors=True)
+    path.mkdir(parents=True, exist_ok=True)
+    os.environ[MULTIPROC_DIR_ENV] = str(path)
+
+
+class CallbackGauge(Gauge):
+    """Gauge that can be read from a callback in either metrics mode.
+
+    A single process reads the callback at scrape time. In multiprocess
+    mode the scrape is served from files every worker writes, so each
+    worker copies its callbacks into them from `MetricsRegistry.refresh`.
+    """
+
+    _callback: Optional[Callable[[], float]] = None
+
+    def set_function(self, f: Callable[[], float]) -> None:
+        self._callback = f
+        if not multiprocess_enabled():
+            super().set_function(f)
+
+    def refresh(self) -> None:
+        if self._callback is not None:
+            self.set(float(self._callback()))
+
+
+class MetricsRegistry:
+    """Creates metrics in a private registry and renders them for scraping.
+
+    Gauges take a `multiprocess_mode` that says how worker values combine
+    when they are scraped together: `livesum` for counts of work in hand,
+    `max` for figures every worker reads from shared state, and `all` to
+    keep one series per worker `pid`.
+    """
+
+    CONTENT_TYPE = CONTENT_TYPE_LATEST
+
+    def __init__(self, namespace: str = ""):
+        self.namespace = namespace
+        self.collectors = CollectorRegistry(auto_describe=True)
+        self._gauges: List[CallbackGauge] = []
+        self._refresher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        """Create a counter"""
+        return Counter(name, documentation, labelnames, namespace=self.namespace, registry=self.collectors)
+
+    def gauge(self,
+              name: str,
+              documentation: str,
+              labelnames: Sequence[str] = (),
+              multiprocess_mode: str = "all") -> CallbackGauge:
+        """Create a gauge"""
+        gauge = CallbackGauge(
+            name, documentation, labelnames,
+            namespace=self.namespace, registry=self.collectors, multiprocess_mode=multiprocess_mode
+        )
+        self._gauges.append(gauge)
+        return gauge
+
+    def histogram(self,
+                  name: str,
+                  documentation: str,
+                  labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        """Create a histogram"""
+        return Histogram(
+            name, documentation, labelnames, namespace=self.namespace, registry=self.collectors, buckets=buckets
+        )
+
+    def refresh(self) -> None:
+        """Copy callback gauges into this worker's metric files"""
+        for gauge in self._gauges:
+            try:
+                gauge.refresh()
+            except Exception as e:
+                logger.debug("Could not refresh gauge %s: %s", gauge._name, e)
+
+    def start_refresh(self, interval: float) -> None:
+        """Refresh callback gauges from a background thread; only needed in multiprocess mode"""
+        if not multiprocess_enabled() or self._refresher is not None:
+            return
+        self._stop.clear()
+
+        def run() -> None:
+            while not self._stop.wait(interval):
+                self.refresh()
+
+        self._refresher = threading.Thread(target=run, name="metrics-refresh", daemon=True)
+        self._refresher.start()
+
+    def stop_refresh(self) -> None:
+        """Stop refreshing and drop this worker's live gauges from the shared view"""
+        if self._refresher is None:
+            return
+        self._stop.set()
+        self._refresher.join()
+        self._refresher = None
+        multiprocess.mark_process_dead(os.getpid())
+
+    def render(self) -> bytes:
+        """Render every metric in the Prometheus text exposition format.
+
+        In multiprocess mode this aggregates the files of every worker, so
+        any worker answers for all of them.
+        """
+        if not multiprocess_enabled():
+            return generate_latest(self.collectors)
+        self.refresh()
+        collectors = CollectorRegistry()
+        multiprocess.MultiProcessCollector(collectors)
+        return generate_latest(collectors)
+
+
+# Global registry and application metrics
+registry = MetricsRegistry(namespace="investment")
+
+PHASE_DURATION = registry.histogram(
+    "phase_duration_seconds", "Duration of each analysis phase", ["phase", "outcome"]
+)
+AGENT_CALL_LATENCY = registry.histogram(
+    "agent_call_latency_seconds", "Latency of agent calls including retries", ["agent", "model", "outcome"]
+)
+AGENT_TOKENS = registry.histogram(
+    "agent_tokens", "Prompt and completion tokens per agent call", ["agent", "model", "kind"], TOKEN_BUCKETS
+)
+ANALYSES_IN_FLIGHT = registry.gauge("analyses_in_flight", "Analyses currently running", multiprocess_mode="livesum")
+RATE_LIMIT_WAITERS = registry.gauge(
+    "rate_limit_waiters", "Agent calls sleeping until their rate-limit reservation matures", multiprocess_mode="livesum"
+)
+CACHE_SIZE = registry.gauge("results_cache_size", "Analysis results held in the results cache")
+CACHE_LOOKUPS = registry.counter("results_cache_lookups_total", "Results cache lookups", ["result"])
+ANALYSES = registry.counter("analyses_total", "Finished analyses", ["status"])
+RETRIES = registry.counter("agent_retries_total", "Agent call retries after transient errors", ["provider", "error"])
+FAILURES = registry.counter("failures_total", "Failures by stage and exception type", ["stage", "error"])
+EVENT_LOOP_LAG = registry.histogram("event_loop_lag_seconds", "Event loop wake-up lag", buckets=LAG_BUCKETS)
+EVENT_LOOP_LAG_CURRENT = registry.gauge("event_loop_lag_current_seconds", "Most recent event loop lag")
+EVENT_LOOP_BLOCKS = registry.counter("event_loop_blocked_total", "Stalls longer than the block threshold")
+PROCESS_RSS = registry.gauge("process_resident_memory_bytes", "Resident set size of this worker")
+RESULTS_EVICTED = registry.counter("results_evicted_total", "Analyses evicted from the results cache", ["reason"])
+ANALYSIS_RESULT_BYTES = registry.histogram(
+    "analysis_result_bytes", "Estimated deep size of each finished analysis result", buckets=SIZE_BUCKETS
+)
+REPORT_WRITE_LATENCY = registry.histogram(
+    "report_write_latency_seconds", "Time from queueing an analysis's reports until they are durable on disk"
+)
+REPORT_QUEUE_DEPTH = registry.gauge(
+    "report_queue_depth", "Analyses waiting for their reports to be written", multiprocess_mode="livesum"
+)
+REPORT_STORE_BYTES = registry.gauge(
+    "report_store_bytes", "Compressed bytes held in the report blob store", multiprocess_mode="max"
+)
+RETENTION_REMOVED = registry.counter(
+    "retention_removed_total", "Reports, blobs and legacy report directories removed by retention", ["kind"]
+)
+RESULT_TIER_LOOKUP_LATENCY = registry.histogram(
+    "result_tier_lookup_seconds", "Latency of result lookups by the tier that answered", ["tier"], LAG_BUCKETS
+)
+RESULTS_TIERED = registry.counter("results_tiered_total", "Analyses moved to a colder storage tier", ["tier"])
+AGENT_CONCURRENCY_LIMIT = registry.gauge(
+    "agent_concurrency_limit", "Current adaptive limit on concurrent provider calls", ["provider"]
+)
+AGENT_CONCURRENCY_IN_FLIGHT = registry.gauge(
+    "agent_concurrency_in_flight", "Provider calls holding a concurrency slot", ["provider"], multiprocess_mode="livesum"
+)
+ADMISSION_QUEUE_DEPTH = registry.gauge(
+    "admission_queue_depth", "Analyses waiting for a run slot", multiprocess_mode="livesum"
+)
+ADMISSION_WAIT = registry.histogram(
+    "admission_wait_seconds", "Time analyses waited for a run slot", buckets=LATENCY_BUCKETS
+)
+ETA_ACCURACY = registry.histogram(
+    "analysis_eta_ratio", "Actual over estimated analysis runtime",
+    buckets=(0.25, 0.5, 0.75, 0.9, 1.1, 1.25, 1.5, 2.0, 3.0, 5.0)
+)
@@ -0,0 +1,73 @@
+"""Per-phase latency and cost profiles for comparing model routing configurations"""
+
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Tuple
+
+from ..config.settings import settings
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int) -> float:
+    """Estimate the USD cost of a call from the configured per-million-token prices"""
+    prices = settings.model_prices.get(model)
+    if not prices:
+        return 0.0
+    return (
+        prompt_tokens * prices.get("input", 0.0)
+        + completion_tokens * prices.get("output", 0.0)
+    ) / 1_000_000
+
+
+@dataclass
+class _ProfileWindow:
+    """Counters and a latency window for one phase/configuration pair"""
+    calls: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    cost: float = 0.0
+    latencies: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+
+class PhaseProfiler:
+    """Aggregates latency, tokens and cost per phase and model configuration"""
+
+    def __init__(self):
+        self._profiles: Dict[Tuple[str, str], _ProfileWindow] = {}
+
+    def record(self,
+               phase: str,
+               config: str,
+               model: str,
+               seconds: float,
+               prompt_tokens: int,
+               completion_tokens: int) -> float:
+        """Record one completed call and return its estimated cost"""
+        cost = estimate_cost(model, prompt_tokens, completion_tokens)
+        key = (phase, config)
+        if key not in self._profiles:
+            self._profiles[key] = _ProfileWindow()
+        profile = self._profiles[key]
+        profile.calls += 1
+        profile.prompt_tokens += prompt_tokens
+        profile.completion_tokens += completion_tokens
+        profile.cost += cost
+        profile.latencies.append(seconds)
+        return cost
+
+    def get_report(self) -> Dict[str, Dict[str, Any]]:
+        """Get a phase -> configuration comparison of latency and cost"""
+        report: Dict[str, Dict[str, Any]] = {}
+        for (phase, config), profile in sorted(self._profiles.items()):
+            ordered = sorted(profile.latencies)
+            count = len(ordered)
+            report.setdefault(phase, {})[config] = {
+                "calls": profile.calls,
+                "latency_p50": round(ordered[count // 2], 3),
+                "latency_p95": round(ordered[min(count - 1, int(0.95 * count))], 3),
+                "latency_mean": round(sum(ordered) / count, 3),
+                "avg_prompt_tokens": profile.prompt_tokens // profile.calls,
+                "avg_completion_tokens": profile.completion_tokens // profile.calls,
+                "avg_cost_usd": round(profile.cost / profile.calls, 6),
+                "total_cost_usd": round(profile.cost, 6)
+            }
+        return report
@@ -0,0 +1,162 @@
+"""On-demand statistical profiler producing collapsed stacks for flame graphs"""
+
+import asyncio
+import logging
+import os
+import sys
+import threading
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from types import FrameType
+from typing import Dict, Iterator, List, Optional
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+def _frame_label(frame: FrameType) -> str:
+    code = frame.f_code
+    filename = os.sep.join(code.co_filename.rsplit(os.sep, 2)[-2:])
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})"
+
+
+def collapse_stack(frame: Optional[FrameType], max_depth: int = 128) -> str:
+    """Render a frame's call stack root-first as semicolon-separated labels"""
+    labels: List[str] = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class ProfileSession:
+    """Samples collected for one profiling request"""
+
+    def __init__(self,
+                 loop: Optional[asyncio.AbstractEventLoop] = None,
+                 task: Optional["asyncio.Task"] = None,
+                 thread_id: Optional[int] = None):
+        self.loop = loop
+        self.task = task
+        self.thread_id = thread_id
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+
+    def sample(self, frames: Dict[int, FrameType], thread_names: Dict[int, str], sampler_id: int) -> None:
+        self.sample_count += 1
+        if self.task is not None:
+            # Only count samples taken while this task is the one running on its loop
+            frame = frames.get(self.thread_id)
+            if frame is not None and asyncio.current_task(self.loop) is self.task:
+                self.samples[collapse_stack(frame)] += 1
+            return
+
+        for thread_id, frame in frames.items():
+            if thread_id == sampler_id:
+                continue
+            name = thread_names.get(thread_id, str(thread_id))
+            self.samples[f"{name};{collapse_stack(frame)}"] += 1
+
+    def collapsed(self) -> str:
+        """Collapsed-stack text, one `stack count` line per stack, hottest first"""
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+class SamplingProfiler:
+    """Wall-clock sampler over sys._current_frames().
+
+    The sampling thread only exists while at least one session is active,
+    so an idle profiler costs nothing. Whole-process sessions sample every
+    thread; task sessions sample the event loop thread only while their
+    task is running on it, which attributes on-loop time to one request.
+    """
+
+    def __init__(self, interval: float = 0.005, keep_profiles: int = 50):
+        self.interval = interval
+        self.keep_profiles = keep_profiles
+        self._sessions: List[ProfileSession] = []
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._profiles: "OrderedDict[str, str]" = OrderedDict()
+
+    @classmethod
+    def from_settings(cls) -> "SamplingProfiler":
+        """Build the profiler from application settings"""
+        return cls(
+            interval=settings.profiler_interval_ms / 1000.0,
+            keep_profiles=settings.profiler_keep_profiles
+        )
+
+    @property
+    def active(self) -> bool:
+        return bool(self._sessions)
+
+    def _start_session(self, session: ProfileSession) -> None:
+        with self._lock:
+            self._sessions.append(session)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+                self._thread.start()
+
+    def _end_session(self, session: ProfileSession) -> None:
+        with self._lock:
+            if session in self._sessions:
+                self._sessions.remove(session)
+
+    def _run(self) -> None:
+        sampler_id = threading.get_ident()
+        stop = threading.Event()
+        while not stop.wait(self.interval):
+            with self._lock:
+                sessions = list(self._sessions)
+                if not sessions:
+                    self._thread = None
+                    return
+
+            frames = sys._current_frames()
+            thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for session in sessions:
+                session.sample(frames, thread_names, sampler_id)
+            del frames
+
+    async def profile_process(self, seconds: float) -> ProfileSession:
+        """Sample every thread in the process for `seconds`"""
+        session = ProfileSession()
+        self._start_session(session)
+        logger.info("Profiling process for %.1fs", seconds)
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            self._end_session(session)
+        return session
+
+    @contextmanager
+    def profile_current_task(self) -> Iterator[ProfileSession]:
+        """Sample the calling asyncio task for the duration of the block"""
+        session = ProfileSession(
+            loop=asyncio.get_running_loop(),
+            task=asyncio.current_task(),
+            thread_id=threading.get_ident()
+        )
+        self._start_session(session)
+        try:
+            yield session
+        finally:
+            self._end_session(session)
+
+    def store(self, key: str, session: ProfileSession) -> None:
+        """Keep a finished profile for later retrieval, evicting the oldest"""
+        with self._lock:
+            self._profiles[key] = session.collapsed()
+            while len(self._profiles) > self.keep_profiles:
+                self._profiles.popitem(last=False)
+
+    def get_profile(self, key: str) -> Optional[str]:
+        """Get a stored collapsed-stack profile"""
+        return self._profiles.get(key)
+
+
+# Global profiler instance
+profiler = SamplingProfiler.from_settings()
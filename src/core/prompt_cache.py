@@ -0,0 +1,74 @@
+"""Prompt-cache accounting for agent calls"""
+
+import hashlib
+import logging
+import time
+from typing import Any, Dict, Tuple
+
+from ..config.settings import settings
+from .tokens import CallUsage
+
+logger = logging.getLogger(__name__)
+
+
+class PromptCacheTracker:
+    """Reports the share of prompt tokens served from the provider's prefix cache.
+
+    Providers that report cached tokens are used as-is. Otherwise the cached
+    share is estimated: a static prefix at or above the provider minimum
+    that was sent to the same model within the cache TTL counts as cached,
+    rounded down to the provider's cache block size.
+    """
+
+    CACHE_BLOCK_TOKENS = 128
+
+    def __init__(self, min_tokens: int = 1024, ttl: float = 300.0):
+        self.min_tokens = min_tokens
+        self.ttl = ttl
+        self._last_seen: Dict[Tuple[str, str], float] = {}
+        self._totals: Dict[str, Dict[str, int]] = {}
+
+    @classmethod
+    def from_settings(cls) -> "PromptCacheTracker":
+        """Build the tracker from application settings"""
+        return cls(min_tokens=settings.prompt_cache_min_tokens, ttl=settings.prompt_cache_ttl)
+
+    def estimate_cached(self, model: str, prefix: str, prefix_tokens: int) -> int:
+        """Estimate cached tokens for a call whose prompt starts with `prefix`"""
+        key = (model, hashlib.sha1(prefix.encode("utf-8")).hexdigest())
+        now = time.monotonic()
+        last_seen = self._last_seen.get(key)
+        self._last_seen[key] = now
+
+        if prefix_tokens < self.min_tokens or last_seen is None or now - last_seen > self.ttl:
+            return 0
+        return (prefix_tokens // self.CACHE_BLOCK_TOKENS) * self.CACHE_BLOCK_TOKENS
+
+    def record(self, phase: str, model: str, usage: CallUsage) -> float:
+        """Record a call's usage and return its cached-token ratio"""
+        ratio = usage.cached_tokens / usage.prompt_tokens if usage.prompt_tokens else 0.0
+        logger.debug(
+            "Prompt cache for %s on %s: %d/%d tokens cached (%.0f%%, %s)",
+            phase, model, usage.cached_tokens, usage.prompt_tokens, ratio * 100,
+            "reported" if usage.reported else "estimated"
+        )
+
+        totals = self._totals.setdefault(
+            phase, {"calls": 0, "reported_calls": 0, "prompt_tokens": 0, "cached_tokens": 0}
+        )
+        totals["calls"] += 1
+        totals["reported_calls"] += int(usage.reported)
+        totals["prompt_tokens"] += usage.prompt_tokens
+        totals["cached_tokens"] += usage.cached_tokens
+        return ratio
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get cached-token ratios per phase"""
+        return {
+            phase: {
+                **totals,
+                "cached_ratio": round(totals["cached_tokens"] / totals["prompt_tokens"], 4)
+                if totals["prompt_tokens"] else 0.0
+            }
+            for phase, totals in self._totals.items()
+        }
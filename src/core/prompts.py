@@ -0,0 +1,129 @@
+"""Task prompts for the three analysis phases.
+
+Each prompt starts with a static instruction block that is byte-identical
+across requests, so providers can serve it from their prompt prefix cache.
+Everything that varies per request (the user message, ticker list and
+earlier phase output) is appended after it.
+"""
+
+from typing import List, Tuple
+
+from ..models.schemas import InvestmentRanking, StockAnalysisResult
+
+
+STOCK_ANALYSIS_INSTRUCTIONS = """\
+CRITICAL INSTRUCTION: You MUST analyze ONLY the companies listed under COMPANIES TO ANALYZE at the end of this prompt, using their EXACT stock symbols.
+
+Please conduct a comprehensive analysis of ONLY those companies.
+
+For EACH of these specific companies, provide:
+1. Current market position and financial metrics
+2. Recent performance and analyst recommendations
+3. Industry trends and competitive landscape
+4. Risk factors and growth potential
+5. News impact and market sentiment
+
+IMPORTANT:
+- Use ONLY the company symbols provided under COMPANIES TO ANALYZE
+- Do NOT use generic names like "Company A", "Tech Inc.", etc.
+- Reference each company by its actual stock symbol (e.g., AAPL for Apple, MSFT for Microsoft)
+"""
+
+INVESTMENT_RANKING_INSTRUCTIONS = """\
+Based on the comprehensive stock analysis at the end of this prompt, please rank the EXACT companies listed under COMPANIES TO RANK by investment potential.
+
+CRITICAL REQUIREMENTS:
+- Use ONLY the actual company symbols listed under COMPANIES TO RANK
+- Do NOT create fictional companies or use generic names
+- Reference each company by its stock ticker (e.g., NVDA, AMD, INTC)
+- Rank ALL and ONLY the companies listed
+
+Please provide:
+1. Detailed ranking of THESE EXACT companies from best to worst investment potential
+2. Investment rationale for each of these specific companies
+3. Risk evaluation and mitigation strategies for each company
+4. Growth potential assessment for each company
+
+Remember: Analyze ONLY the listed companies - no other companies!
+"""
+
+PORTFOLIO_ALLOCATION_INSTRUCTIONS = """\
+Based on the investment ranking and analysis at the end of this prompt, create a strategic portfolio allocation for EXACTLY the companies in that ranking.
+
+MANDATORY CONSTRAINTS:
+- Allocate ONLY to the companies from the ranking analysis
+- Use the EXACT company stock symbols, not generic names
+- Do NOT create or mention any other companies
+- Allocations must total EXACTLY 100%
+- Reference companies by their stock tickers (e.g., NVDA, AMD, INTC)
+
+REQUIRED OUTPUT:
+1. Specific allocation percentages for EACH company mentioned in the rankings (must total exactly 100%)
+2. Investment thesis for EACH specific company
+3. Risk management approach for the portfolio
+4. Final actionable recommendations for THESE EXACT companies
+
+IMPORTANT: Use ONLY the companies mentioned in the ranking analysis. Do not invent new companies!
+"""
+
+# Static prefix of every phase prompt
+PHASE_INSTRUCTIONS = {
+    "stock_analysis": STOCK_ANALYSIS_INSTRUCTIONS,
+    "investment_ranking": INVESTMENT_RANKING_INSTRUCTIONS,
+    "portfolio_allocation": PORTFOLIO_ALLOCATION_INSTRUCTIONS,
+}
+
+
+def _format_sections(sections: List[Tuple[str, str]]) -> str:
+    """Format labelled sections, merging labels whose content is identical.
+
+    Phase results currently store the full response in every field, so
+    this keeps the same text from being sent to the model several times.
+    """
+    merged: List[Tuple[List[str], str]] = []
+    for label, content in sections:
+        for labels, existing in merged:
+            if existing == content:
+                labels.append(label)
+                break
+        else:
+            merged.append(([label], content))
+    return "\n\n".join(f"### {' / '.join(labels)}\n{content}" for labels, content in merged)
+
+
+def build_stock_analysis_prompt(companies: str, message: str) -> str:
+    """Build the Phase 1 prompt"""
+    return (
+        f"{STOCK_ANALYSIS_INSTRUCTIONS}\n"
+        f"REQUEST: {message}\n\n"
+        f"COMPANIES TO ANALYZE: {companies}\n"
+    )
+
+
+def build_investment_ranking_prompt(stock_analysis: StockAnalysisResult) -> str:
+    """Build the Phase 2 prompt"""
+    analysis = _format_sections([
+        ("Market Analysis", stock_analysis.market_analysis),
+        ("Financial Metrics", stock_analysis.financial_metrics),
+        ("Risk Assessment", stock_analysis.risk_assessment),
+        ("Initial Recommendations", stock_analysis.recommendations),
+    ])
+    return (
+        f"{INVESTMENT_RANKING_INSTRUCTIONS}\n"
+        f"COMPANIES TO RANK: {stock_analysis.company_symbols}\n\n"
+        f"STOCK ANALYSIS:\n{analysis}\n"
+    )
+
+
+def build_portfolio_allocation_prompt(ranking_analysis: InvestmentRanking) -> str:
+    """Build the Phase 3 prompt"""
+    ranking = _format_sections([
+        ("Company Rankings", ranking_analysis.ranked_companies),
+        ("Investment Rationale", ranking_analysis.investment_rationale),
+        ("Risk Evaluation", ranking_analysis.risk_evaluation),
+        ("Growth Potential", ranking_analysis.growth_potential),
+    ])
+    return (
+        f"{PORTFOLIO_ALLOCATION_INSTRUCTIONS}\n"
+        f"INVESTMENT RANKING DATA:\n{ranking}\n"
+    )
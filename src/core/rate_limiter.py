@@ -0,0 +1,202 @@
+"""Client-side provider rate limiting with token buckets shared across workers"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from ..config.settings import settings
+from .exceptions import ClientRateLimitError
+from .state_store import connect_shared_db
+from .tokens import provider_of
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class BucketLimit:
+    """Requests-per-minute and tokens-per-minute quota for one provider or model"""
+    rpm: Optional[int] = None
+    tpm: Optional[int] = None
+
+
+class ProviderRateLimiter:
+    """Token-bucket limiter for RPM and TPM, per provider and per model.
+
+    Buckets live in SQLite so every worker process draws from the same quota.
+    A call reserves its cost up front and the bucket may go negative; the
+    caller then sleeps until its reservation matures. Waiters are therefore
+    served in arrival order at the refill rate instead of retrying in bursts.
+    A caller cancelled before its call is made, such as a hedging loser,
+    refunds its reservation.
+    """
+
+    def __init__(self,
+                 db_path: Optional[Path] = None,
+                 default_limit: Optional[BucketLimit] = None,
+                 overrides: Optional[Dict[str, BucketLimit]] = None,
+                 max_wait: float = 120.0):
+        self.default_limit = default_limit or BucketLimit()
+        self.overrides = overrides or {}
+        self.max_wait = max_wait
+        self._lock = threading.Lock()
+        self._conn = connect_shared_db(db_path or Path(":memory:"))
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                bucket TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+        self.waiting = 0
+        self.total_acquired = 0
+        self.total_waits = 0
+        self.total_wait_seconds = 0.0
+        self.total_rejected = 0
+        self.total_refunded = 0
+
+    @classmethod
+    def from_settings(cls) -> "ProviderRateLimiter":
+        """Build the limiter from application settings"""
+        overrides = {
+            key: BucketLimit(rpm=limit.get("rpm"), tpm=limit.get("tpm"))
+            for key, limit in settings.rate_limits.items()
+        }
+        return cls(
+            db_path=settings.state_db_path if settings.uses_shared_state else None,
+            default_limit=BucketLimit(rpm=settings.rate_limit_rpm, tpm=settings.rate_limit_tpm),
+            overrides=overrides,
+            max_wait=settings.rate_limit_max_wait
+        )
+
+    def _buckets_for(self, model: str, tokens: int) -> List[Tuple[str, float, float]]:
+        """Get (bucket key, capacity, cost) for every bucket a call must draw from"""
+        buckets = []
+        provider = provider_of(model)
+
+        # Provider-wide quota only applies when explicitly configured
+        scopes = [(model, self.overrides.get(model, self.default_limit))]
+        if provider in self.overrides:
+            scopes.append((provider, self.overrides[provider]))
+
+        for scope, limit in scopes:
+            if limit.rpm:
+                buckets.append((f"rpm:{scope}", float(limit.rpm), 1.0))
+            if limit.tpm:
+                # A single oversized prompt may use at most one full minute of quota
+                buckets.append((f"tpm:{scope}", float(limit.tpm), float(min(tokens, limit.tpm))))
+        return buckets
+
+    def _reserve(self, model: str, tokens: int) -> float:
+        """Atomically debit all buckets and return the seconds to wait"""
+        buckets = self._buckets_for(model, tokens)
+        if not buckets:
+            return 0.0
+
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                balances = []
+                wait = 0.0
+                for key, capacity, cost in buckets:
+                    row = self._conn.execute(
+                        "SELECT tokens, updated_at FROM rate_buckets WHERE bucket = ?", (key,)
+                    ).fetchone()
+                    rate = capacity / 60.0
+                    if row is None:
+                        available = capacity
+                    else:
+                        available = min(capacity, row[0] + (now - row[1]) * rate)
+                    remaining = available - cost
+                    if remaining < 0:
+                        wait = max(wait, -remaining / rate)
+                    balances.append((key, remaining))
+
+                if wait > self.max_wait:
+                    self._conn.execute("ROLLBACK")
+                    return wait
+
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO rate_buckets (bucket, tokens, updated_at) VALUES (?, ?, ?)",
+                    [(key, remaining, now) for key, remaining in balances]
+                )
+                self._conn.execute("COMMIT")
+                return wait
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def _refund(self, model: str, tokens: int) -> None:
+        """Credit a reservation back to all buckets it debited"""
+        buckets = self._buckets_for(model, tokens)
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for key, capacity, cost in buckets:
+                    row = self._conn.execute(
+                        "SELECT tokens, updated_at FROM rate_buckets WHERE bucket = ?", (key,)
+                    ).fetchone()
+                    if row is None:
+                        continue
+                    available = min(capacity, row[0] + (now - row[1]) * capacity / 60.0)
+                    self._conn.execute(
+                        "UPDATE rate_buckets SET tokens = ?, updated_at = ? WHERE bucket = ?",
+                        (min(capacity, available + cost), now, key)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.total_refunded += 1
+
+    async def acquire(self, model: str, tokens: int) -> float:
+        """Wait until a call with the estimated token count fits the quota.
+
+        Returns the number of seconds spent waiting.
+        """
+        reservation = asyncio.ensure_future(asyncio.to_thread(self._reserve, model, tokens))
+        try:
+            wait = await asyncio.shield(reservation)
+        except asyncio.CancelledError:
+            # The debit still lands in its thread; hand it back once it has
+            if await reservation <= self.max_wait:
+                await asyncio.to_thread(self._refund, model, tokens)
+            raise
+
+        if wait > self.max_wait:
+            self.total_rejected += 1
+            raise ClientRateLimitError(
+                f"Client-side rate limit for {model} exceeded",
+                details=f"Estimated wait of {wait:.1f}s exceeds {self.max_wait:.0f}s"
+            )
+
+        self.total_acquired += 1
+        if wait > 0:
+            self.total_waits += 1
+            self.total_wait_seconds += wait
+            logger.debug("Rate limiter queued %s call for %.2fs (%d tokens)", model, wait, tokens)
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                await asyncio.to_thread(self._refund, model, tokens)
+                raise
+            finally:
+                self.waiting -= 1
+        return wait
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get limiter statistics"""
+        return {
+            "acquired": self.total_acquired,
+            "queued": self.total_waits,
+            "waiting": self.waiting,
+            "rejected": self.total_rejected,
+            "refunded": self.total_refunded,
+            "total_wait_seconds": round(self.total_wait_seconds, 3)
+        }
@@ -0,0 +1,399 @@
+"""Content-addressed, compressed report store with a manifest per analysis"""
+
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from .state_store import connect_shared_db
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# File extension of each codec; the extension is how a blob is decoded
+CODEC_EXTENSIONS = {"zstd": ".zst", "gzip": ".gz"}
+
+# One report as stored: a small per-analysis header plus a shareable body
+ReportSection = Tuple[str, str]
+
+
+def resolve_codec(compression: str) -> str:
+    """Pick the codec for `auto`, `zstd` or `gzip`, falling back to gzip without zstandard"""
+    if compression in ("auto", "zstd") and zstandard is not None:
+        return "zstd"
+    if compression == "zstd":
+        logger.warning("zstandard is not installed; compressing reports with gzip")
+    return "gzip"
+
+
+class ReportBlobStore:
+    """Stores report bodies once per distinct content.
+
+    Bodies are keyed by their SHA-256, compressed and written under
+    `blobs/<aa>/<hash><ext>` with a temp file, fsync and rename, so a blob is
+    either absent or complete. Re-runs that produce identical text share one
+    blob. The per-analysis manifest (report name, blob hash and the short
+    header carrying the analysis date) and blob reference counts live in a
+    SQLite index next to the blobs, which costs no inode per analysis.
+    """
+
+    def __init__(self, root: Path, compression: str = "auto", level: Optional[int] = None, fsync: bool = True):
+        self.root = Path(root)
+        self.codec = resolve_codec(compression)
+        self.level = level
+        self.fsync = fsync
+        self.blobs_dir = self.root / "blobs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = connect_shared_db(self.root / "index.db")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS blobs (
+                hash TEXT PRIMARY KEY,
+                codec TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                stored_size INTEGER NOT NULL,
+                refs INTEGER NOT NULL DEFAULT 0,
+                created_at TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS manifests (
+                request_id TEXT NOT NULL,
+                name TEXT NOT NULL,
+                hash TEXT NOT NULL REFERENCES blobs (hash),
+                header TEXT NOT NULL,
+                day TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                PRIMARY KEY (request_id, name)
+            );
+            CREATE INDEX IF NOT EXISTS idx_manifests_day ON manifests (day);
+            CREATE INDEX IF NOT EXISTS idx_manifests_hash ON manifests (hash);
+            CREATE INDEX IF NOT EXISTS idx_manifests_created ON manifests (created_at);
+            CREATE TABLE IF NOT EXISTS days (
+                day TEXT PRIMARY KEY,
+                bytes INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        with self._lock:
+            # Stores created before per-day totals existed
+            if self._conn.execute("SELECT NOT EXISTS (SELECT 1 FROM days)").fetchone()[0]:
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO days (day, bytes) "
+                    "SELECT substr(created_at, 1, 10), SUM(stored_size) FROM blobs GROUP BY 1"
+                )
+
+    def blob_path(self, digest: str, codec: str) -> Path:
+        return self.blobs_dir / digest[:2] / f"{digest}{CODEC_EXTENSIONS[codec]}"
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.codec == "zstd":
+            return zstandard.ZstdCompressor(level=self.level or 3).compress(data)
+        return gzip.compress(data, compresslevel=self.level or 6, mtime=0)
+
+    @staticmethod
+    def _decompress(data: bytes, codec: str) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read zstd-compressed reports")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def put_batch(self,
+                  analyses: List[Tuple[str, datetime, Dict[str, ReportSection]]],
+                  rewrite: frozenset = frozenset()) -> Dict[str, int]:
+        """Store the reports of several analyses with one round of fsyncs.
+
+        Blocking; run it off the event loop. Returns counts of new and
+        deduplicated blobs and of logical and stored bytes.
+        """
+        bodies: Dict[str, bytes] = {}
+        first_seen: Dict[str, str] = {}
+        rows = []
+        logical = 0
+        for request_id, created_at, sections in analyses:
+            for name, (header, body) in sections.items():
+                data = body.encode("utf-8")
+                digest = hashlib.sha256(data).hexdigest()
+                bodies[digest] = data
+                first_seen.setdefault(digest, created_at.isoformat())
+                logical += len(data)
+                rows.append((request_id, name, digest, header, created_at.strftime("%Y-%m-%d"), created_at.isoformat()))
+
+        with self._lock:
+            known = {
+                digest for (digest,) in self._conn.execute(
+                    f"SELECT hash FROM blobs WHERE hash IN ({','.join('?' * len(bodies))})", list(bodies)
+                )
+            } if bodies else set()
+
+        # Write missing blobs to temp files, fsync them together, then rename into place
+        staged: List[Tuple[Path, Path]] = []
+        new_blobs = []
+        stored = 0
+        try:
+            for digest, data in bodies.items():
+                path = self.blob_path(digest, self.codec)
+                if digest in known and digest not in rewrite and path.exists():
+                    continue
+                compressed = self._compress(data)
+                path.parent.mkdir(parents=True, exist_ok=True)
+                temp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}.tmp")
+                with open(temp_path, "wb") as f:
+                    f.write(compressed)
+                    if self.fsync:
+                        f.flush()
+                        os.fsync(f.fileno())
+                staged.append((temp_path, path))
+                new_blobs.append((digest, self.codec, len(data), len(compressed)))
+                stored += len(compressed)
+            for temp_path, path in staged:
+                os.replace(temp_path, path)
+        except BaseException:
+            for temp_path, _ in staged:
+                temp_path.unlink(missing_ok=True)
+            raise
+        if self.fsync and hasattr(os, "O_DIRECTORY"):
+            for directory in {path.parent for _, path in staged}:
+                fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+                try:
+                    os.fsync(fd)
+                finally:
+                    os.close(fd)
+
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for digest, codec, size, stored_size in new_blobs:
+                    # Another worker may have stored the same blob since we looked
+                    inserted = self._conn.execute(
+                        "INSERT OR IGNORE INTO blobs (hash, codec, size, stored_size, refs, created_at) "
+                        "VALUES (?, ?, ?, ?, 0, ?)",
+                        (digest, codec, size, stored_size, first_seen[digest])
+                    ).rowcount
+                    if inserted:
+                        self._add_day_bytes(first_seen[digest][:10], stored_size)
+                present = {
+                    digest for (digest,) in self._conn.execute(
+                        f"SELECT hash FROM blobs WHERE hash IN ({','.join('?' * len(bodies))})", list(bodies)
+                    )
+                } if bodies else set()
+                stale = frozenset(bodies) - present
+                if stale:
+                    # A retention sweep removed blobs we took as stored; write them again
+                    self._conn.execute("ROLLBACK")
+                else:
+                    for row in rows:
+                        previous = self._conn.execute(
+                            "SELECT hash FROM manifests WHERE request_id = ? AND name = ?", row[:2]
+                        ).fetchone()
+                        if previous is not None:
+                            self._conn.execute("UPDATE blobs SET refs = refs - 1 WHERE hash = ?", previous)
+                        self._conn.execute(
+                            "INSERT OR REPLACE INTO manifests (request_id, name, hash, header, day, created_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            row
+                        )
+                        self._conn.execute("UPDATE blobs SET refs = refs + 1 WHERE hash = ?", (row[2],))
+                    self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if stale:
+            return self.put_batch(analyses, rewrite=stale)
+        return {
+            "reports": len(rows),
+            "new_blobs": len(new_blobs),
+            "deduplicated": len(rows) - len(new_blobs),
+            "logical_bytes": logical,
+            "stored_bytes": stored
+        }
+
+    def _add_day_bytes(self, day: str, delta: int) -> None:
+        self._conn.execute(
+            "INSERT INTO days (day, bytes) VALUES (?, ?) "
+            "ON CONFLICT (day) DO UPDATE SET bytes = bytes + excluded.bytes",
+            (day, delta)
+        )
+
+    def days(self) -> List[Tuple[str, int]]:
+        """Stored bytes per day, oldest first; a blob counts toward the day of its oldest reference"""
+        with self._lock:
+            return self._conn.execute("SELECT day, bytes FROM days ORDER BY day").fetchall()
+
+    def total_bytes(self) -> int:
+        """Stored bytes across all days"""
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(bytes), 0) FROM days").fetchone()[0]
+
+    def days_before(self, day: str) -> List[str]:
+        """Days older than `day` that still have manifests, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT day FROM manifests WHERE day < ? ORDER BY day", (day,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def oldest_day(self) -> Optional[str]:
+        """The oldest day that still has manifests"""
+        with self._lock:
+            return self._conn.execute("SELECT MIN(day) FROM manifests").fetchone()[0]
+
+    def expire_day(self, day: str) -> Dict[str, int]:
+        """Remove every manifest from `day` and the blobs no other analysis references.
+
+        Blobs from `day` that later analyses still reference survive and their
+        bytes move to the day of their oldest remaining reference. Blocking.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Only blobs this day referenced can lose their last reference or be counted here
+                self._conn.execute("CREATE TEMP TABLE IF NOT EXISTS expiring (hash TEXT PRIMARY KEY)")
+                self._conn.execute("DELETE FROM expiring")
+                self._conn.execute("INSERT INTO expiring SELECT DISTINCT hash FROM manifests WHERE day = ?", (day,))
+                self._conn.execute(
+                    "UPDATE blobs SET refs = refs - "
+                    "(SELECT COUNT(*) FROM manifests m WHERE m.hash = blobs.hash AND m.day = ?) "
+                    "WHERE hash IN (SELECT hash FROM expiring)",
+                    (day,)
+                )
+                removed = self._conn.execute("DELETE FROM manifests WHERE day = ?", (day,)).rowcount
+                orphans = self._conn.execute(
+                    "SELECT hash, codec, stored_size, substr(created_at, 1, 10) FROM blobs "
+                    "WHERE refs <= 0 AND hash IN (SELECT hash FROM expiring)"
+                ).fetchall()
+                self._conn.executemany("DELETE FROM blobs WHERE hash = ?", [(row[0],) for row in orphans])
+                for _, _, stored_size, blob_day in orphans:
+                    self._add_day_bytes(blob_day, -stored_size)
+
+                survivors = self._conn.execute(
+                    "SELECT b.hash, b.stored_size, MIN(m.created_at) FROM blobs b "
+                    "JOIN manifests m ON m.hash = b.hash "
+                    "WHERE b.hash IN (SELECT hash FROM expiring) AND substr(b.created_at, 1, 10) = ? "
+                    "GROUP BY b.hash",
+                    (day,)
+                ).fetchall()
+                for digest, stored_size, created_at in survivors:
+                    self._conn.execute("UPDATE blobs SET created_at = ? WHERE hash = ?", (created_at, digest))
+                    self._add_day_bytes(day, -stored_size)
+                    self._add_day_bytes(created_at[:10], stored_size)
+                self._conn.execute("DELETE FROM days WHERE day = ? AND bytes <= 0", (day,))
+
+                # Unlink inside the write transaction: a writer that took one of these
+                # blobs as stored finds it missing when it commits and writes it again
+                freed = 0
+                for digest, codec, stored_size, _ in orphans:
+                    try:
+                        self.blob_path(digest, codec).unlink()
+                        freed += stored_size
+                    except FileNotFoundError:
+                        pass
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return {"reports": removed, "blobs": len(orphans), "bytes": freed}
+
+    def get_manifest(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Get the reports stored for an analysis, or None if it has none"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT m.name, m.hash, m.created_at, b.size, b.stored_size FROM manifests m "
+                "JOIN blobs b ON b.hash = m.hash WHERE m.request_id = ? ORDER BY m.name",
+                (request_id,)
+            ).fetchall()
+        if not rows:
+            return None
+        return {
+            "request_id": request_id,
+            "created_at": rows[0][2],
+            "reports": [
+                {"name": name, "hash": digest, "size": size, "stored_size": stored_size}
+                for name, digest, _, size, stored_size in rows
+            ]
+        }
+
+    def read(self, request_id: str, name: str) -> Optional[str]:
+        """Get one report as markdown, or None if it is not stored"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT m.header, m.hash, b.codec FROM manifests m "
+                "JOIN blobs b ON b.hash = m.hash WHERE m.request_id = ? AND m.name = ?",
+                (request_id, name)
+            ).fetchone()
+        if row is None:
+            return None
+        return self._render(*row)
+
+    def _render(self, header: str, digest: str, codec: str) -> str:
+        body = self._decompress(self.blob_path(digest, codec).read_bytes(), codec)
+        return header + body.decode("utf-8") + "\n\n"
+
+    def iter_reports(self,
+                     since: Optional[datetime] = None,
+                     until: Optional[datetime] = None,
+                     batch_size: int = 200) -> Iterator[Tuple[str, str, str, str]]:
+        """Yield (request_id, name, created_at, markdown) for stored reports, oldest analysis first.
+
+        Blocking. Pages through the manifests by (created_at, request_id,
+        name), so memory stays at one page however many reports match.
+        """
+        clauses = ["m.created_at >= ?", "(m.created_at > ? OR (m.request_id, m.name) > (?, ?))"]
+        bounds: List[str] = []
+        if since:
+            clauses.append("m.created_at >= ?")
+            bounds.append(since.isoformat())
+        if until:
+            clauses.append("m.created_at < ?")
+            bounds.append(until.isoformat())
+        sql = (
+            "SELECT m.created_at, m.request_id, m.name, m.header, m.hash, b.codec FROM manifests m "
+            f"JOIN blobs b ON b.hash = m.hash WHERE {' AND '.join(clauses)} "
+            "ORDER BY m.created_at, m.request_id, m.name LIMIT ?"
+        )
+        last = ("", "", "")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, [last[0], *last, *bounds, batch_size]).fetchall()
+            for created_at, request_id, name, header, digest, codec in rows:
+                try:
+                    text = self._render(header, digest, codec)
+                except FileNotFoundError:
+                    # Expired by a retention sweep since the page was read
+                    continue
+                yield request_id, name, created_at, text
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][:3]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get blob counts, logical versus stored bytes and the dedup ratio"""
+        with self._lock:
+            blobs, stored, unique = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(stored_size), 0), COALESCE(SUM(size), 0) FROM blobs"
+            ).fetchone()
+            reports, logical = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(b.size), 0) FROM manifests m JOIN blobs b ON b.hash = m.hash"
+            ).fetchone()
+        return {
+            "codec": self.codec,
+            "blobs": blobs,
+            "reports": reports,
+            "logical_mb": round(logical / 2**20, 3),
+            "stored_mb": round(stored / 2**20, 3),
+            "dedup_ratio": round(logical / unique, 2) if unique else 0.0,
+            "compression_ratio": round(unique / stored, 2) if stored else 0.0
+        }
+
+    def close(self) -> None:
+        """Close the index database"""
+        with self._lock:
+            self._conn.close()
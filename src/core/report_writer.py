@@ -0,0 +1,266 @@
+"""Background report writer feeding the report blob store in batches"""
+
+import asyncio
+import contextvars
+import logging
+import time
+from collections import deque
+from contextlib import ExitStack
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+from ..config.settings import settings
+from ..models.schemas import AnalysisResult
+from .metrics import FAILURES, REPORT_QUEUE_DEPTH, REPORT_WRITE_LATENCY
+from .report_store import ReportBlobStore, ReportSection
+from .tracing import NOOP_SPAN, Tracer
+
+logger = logging.getLogger(__name__)
+
+
+def report_sections(result: AnalysisResult) -> Dict[str, ReportSection]:
+    """Split each completed phase's markdown report into its header and body, keyed by file name.
+
+    The header carries the analysis date and differs on every run; the body
+    is the agent's text, which repeats across runs for the same tickers.
+    """
+    sections = {}
+    if result.stock_analysis:
+        sections["stock_analyst_report.md"] = (
+            "# Stock Analysis Report\n\n"
+            f"**Companies:** {result.stock_analysis.company_symbols}\n\n"
+            f"**Analysis Date:** {result.stock_analysis.analysis_date.isoformat()}\n\n"
+            "## Complete Analysis\n\n",
+            result.stock_analysis.market_analysis
+        )
+    if result.investment_ranking:
+        sections["research_analyst_report.md"] = (
+            "# Investment Ranking Report\n\n"
+            f"**Analysis Date:** {result.investment_ranking.analysis_date.isoformat()}\n\n"
+            "## Complete Ranking Analysis\n\n",
+            result.investment_ranking.ranked_companies
+        )
+    if result.portfolio_allocation:
+        sections["investment_report.md"] = (
+            "# Investment Portfolio Report\n\n"
+            f"**Analysis Date:** {result.portfolio_allocation.analysis_date.isoformat()}\n\n"
+            "## Complete Portfolio Analysis\n\n",
+            result.portfolio_allocation.allocation_strategy
+        )
+    return sections
+
+
+@dataclass
+class ReportJob:
+    """Reports of one analysis waiting to be written"""
+
+    request_id: str
+    result: AnalysisResult
+    span: Any = NOOP_SPAN
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class ReportWriter:
+    """Writes analysis reports off the request path.
+
+    Analyses hand their result to a queue and return immediately. A worker
+    task drains the queue in batches and stores each batch with one thread
+    hop into the blob store, which writes new blobs atomically and commits
+    the batch's manifests in one transaction, so a burst of analyses shares
+    one round of fsyncs. A failed batch is retried up to `max_attempts`
+    times with exponential backoff from `retry_delay`, which is safe since
+    storing a report twice leaves one manifest; the request IDs of batches
+    that still fail are kept for the stats.
+    """
+
+    def __init__(self,
+                 store: ReportBlobStore,
+                 tracer: Optional[Tracer] = None,
+                 batch_size: int = 32,
+                 batch_window: float = 0.05,
+                 max_queue: int = 1000,
+                 max_attempts: int = 3,
+                 retry_delay: float = 0.5,
+                 window: int = 1000):
+        self.store = store
+        self.tracer = tracer
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.max_queue = max_queue
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.jobs_written = 0
+        self.reports_written = 0
+        self.blobs_written = 0
+        self.deduplicated = 0
+        self.logical_bytes = 0
+        self.stored_bytes = 0
+        self.batches = 0
+        self.retries = 0
+        self.failures = 0
+        self._failed: Deque[str] = deque(maxlen=100)
+        self._latencies: Deque[float] = deque(maxlen=window)
+        self._queue: Optional[asyncio.Queue] = None
+        self._task: Optional["asyncio.Task"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+        REPORT_QUEUE_DEPTH.set_function(lambda: self.pending)
+
+    @classmethod
+    def from_settings(cls, tracer: Optional[Tracer] = None) -> "ReportWriter":
+        """Build the writer from application settings"""
+        store = ReportBlobStore(
+            settings.reports_dir / "store",
+            compression=settings.report_compression,
+            level=settings.report_compression_level,
+            fsync=settings.report_fsync
+        )
+        return cls(
+            store,
+            tracer=tracer,
+            batch_size=settings.report_batch_size,
+            batch_window=settings.report_batch_window,
+            max_queue=settings.report_queue_size,
+            max_attempts=settings.report_write_attempts,
+            retry_delay=settings.report_retry_delay
+        )
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def _ensure_worker(self) -> None:
+        loop = asyncio.get_running_loop()
+        if self.running and self._loop is loop:
+            return
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        # A fresh context keeps the first submitter's request ID and span off the worker
+        self._task = loop.create_task(self._run(), name="report-writer", context=contextvars.Context())
+
+    async def submit(self, request_id: str, result: AnalysisResult) -> None:
+        """Queue an analysis's reports; only waits when the queue is full"""
+        self._ensure_worker()
+        span = self.tracer.current_span() if self.tracer is not None else NOOP_SPAN
+        await self._queue.put(ReportJob(request_id, result, span))
+
+    async def flush(self) -> None:
+        """Wait until every queued report is durable"""
+        if self.running:
+            await self._queue.join()
+
+    async def stop(self) -> None:
+        """Drain the queue and stop the worker"""
+        if self._task is None:
+            return
+        if self.running:
+            await self.flush()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            # Gather whatever else arrives within the window into the same round of fsyncs
+            deadline = loop.time() + self.batch_window
+            while len(batch) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write_with_retries(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_with_retries(self, batch: List[ReportJob]) -> None:
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self._write_batch(batch)
+                return
+            except Exception as e:
+                if attempt < self.max_attempts:
+                    delay = self.retry_delay * 2 ** (attempt - 1)
+                    self.retries += 1
+                    logger.warning(
+                        "Failed to save reports for %d analyses (attempt %d/%d), retrying in %.1fs: %s",
+                        len(batch), attempt, self.max_attempts, delay, e
+                    )
+                    await asyncio.sleep(delay)
+                    continue
+                self.failures += len(batch)
+                self._failed.extend(job.request_id for job in batch)
+                FAILURES.labels("report_write", type(e).__name__).inc(len(batch))
+                logger.error(
+                    "Gave up saving reports for %d analyses after %d attempts (%s): %s",
+                    len(batch), attempt, ", ".join(job.request_id for job in batch), e
+                )
+
+    async def _write_batch(self, batch: List[ReportJob]) -> None:
+        started = time.monotonic()
+        with ExitStack() as spans:
+            if self.tracer is not None:
+                for job in batch:
+                    spans.enter_context(self.tracer.start_span(
+                        "report_write",
+                        parent=job.span,
+                        request_id=job.request_id,
+                        batch_size=len(batch),
+                        queued_ms=round((started - job.enqueued_at) * 1000, 3)
+                    ))
+            analyses = [(job.request_id, job.result.created_at, report_sections(job.result)) for job in batch]
+            written = await asyncio.to_thread(self.store.put_batch, analyses)
+
+        finished = time.monotonic()
+        self.batches += 1
+        self.jobs_written += len(batch)
+        self.reports_written += written["reports"]
+        self.blobs_written += written["new_blobs"]
+        self.deduplicated += written["deduplicated"]
+        self.logical_bytes += written["logical_bytes"]
+        self.stored_bytes += written["stored_bytes"]
+        for job in batch:
+            latency = finished - job.enqueued_at
+            self._latencies.append(latency)
+            REPORT_WRITE_LATENCY.observe(latency)
+            logger.info("Reports saved for analysis %s", job.request_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get queue depth, throughput and enqueue-to-durable latency"""
+        ordered = sorted(self._latencies)
+        count = len(ordered)
+
+        def percentile(q: float) -> float:
+            return round(ordered[min(count - 1, int(q * count))] * 1000, 3) if count else 0.0
+
+        return {
+            "running": self.running,
+            "pending": self.pending,
+            "jobs_written": self.jobs_written,
+            "reports_written": self.reports_written,
+            "blobs_written": self.blobs_written,
+            "deduplicated": self.deduplicated,
+            "logical_bytes": self.logical_bytes,
+            "stored_bytes": self.stored_bytes,
+            "batches": self.batches,
+            "avg_batch_size": round(self.jobs_written / self.batches, 2) if self.batches else 0.0,
+            "retries": self.retries,
+            "failures": self.failures,
+            "failed_request_ids": list(self._failed),
+            "latency_p50_ms": percentile(0.5),
+            "latency_p95_ms": percentile(0.95),
+            "latency_max_ms": round(ordered[-1] * 1000, 3) if count else 0.0
+        }
@@ -0,0 +1,269 @@
+"""Resilience layer for agent calls: error classification, retries and circuit breakers"""
+
+import asyncio
+import logging
+import random
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Any, Awaitable, Callable, Dict, Optional, TypeVar
+
+from ..config.settings import settings
+from . import exceptions
+from .exceptions import (
+    CircuitOpenError,
+    ClientRateLimitError,
+    InvestmentAnalyzerError,
+    ModelError,
+    NetworkError,
+    ProviderUnavailableError,
+    RateLimitError
+)
+from .metrics import FAILURES, RETRIES
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Failures worth retrying; everything else is permanent for the request
+TRANSIENT_ERRORS = (NetworkError, RateLimitError, exceptions.TimeoutError)
+
+
+def _status_code(exc: Exception) -> Optional[int]:
+    """Get an HTTP status code from provider SDK exceptions, if any"""
+    for attr in ("status_code", "status", "http_status"):
+        value = getattr(exc, attr, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(exc, "response", None)
+    value = getattr(response, "status_code", None)
+    return value if isinstance(value, int) else None
+
+
+def classify_error(exc: Exception) -> InvestmentAnalyzerError:
+    """Map an arbitrary agent-call exception onto the analyzer exception hierarchy"""
+    if isinstance(exc, InvestmentAnalyzerError):
+        return exc
+
+    status_code = _status_code(exc)
+    name = type(exc).__name__.lower()
+    text = str(exc)
+    message = text.lower()
+
+    if status_code == 429 or "ratelimit" in name or "rate limit" in message or "429" in message:
+        error = RateLimitError(f"Provider rate limit exceeded: {text}", details=type(exc).__name__)
+    elif isinstance(exc, (TimeoutError, asyncio.TimeoutError)) or "timeout" in name or "timed out" in message:
+        error = exceptions.TimeoutError(f"Provider call timed out: {text}", details=type(exc).__name__)
+    elif (status_code is not None and status_code >= 500) or "overloaded" in message or "unavailable" in message:
+        error = ProviderUnavailableError(f"Provider unavailable: {text}", details=type(exc).__name__)
+    elif isinstance(exc, (ConnectionError, OSError)) or "connection" in name or "connection" in message:
+        error = NetworkError(f"Network error: {text}", details=type(exc).__name__)
+    else:
+        error = ModelError(text or type(exc).__name__, details=type(exc).__name__)
+
+    error.__cause__ = exc
+    return error
+
+
+def is_transient(error: Exception) -> bool:
+    """Check whether a classified error is worth retrying"""
+    return isinstance(error, TRANSIENT_ERRORS)
+
+
+@dataclass
+class RetryPolicy:
+    """Bounded retries with full-jitter exponential backoff"""
+    max_attempts: int = 3
+    base_delay: float = 1.0
+    max_delay: float = 30.0
+
+    def backoff(self, attempt: int) -> float:
+        """Get the delay before retry number `attempt` (1-based)"""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+
+class BreakerState(str, Enum):
+    """Circuit breaker state"""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Per-provider circuit breaker counting consecutive transient failures"""
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 60.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = BreakerState.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.times_opened = 0
+        self.short_circuited = 0
+        self._trial_in_flight = False
+
+    def before_call(self) -> None:
+        """Fail fast while open; let a single trial call through once the timeout passes"""
+        if self.state == BreakerState.CLOSED:
+            return
+
+        if self.state == BreakerState.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = BreakerState.HALF_OPEN
+            self._trial_in_flight = False
+
+        if self.state == BreakerState.HALF_OPEN and not self._trial_in_flight:
+            self._trial_in_flight = True
+            return
+
+        self.short_circuited += 1
+        raise CircuitOpenError(
+            f"Circuit breaker for provider '{self.name}' is open",
+            details=f"Retry after {self.reset_timeout:.0f}s"
+        )
+
+    def release_trial(self) -> None:
+        """Let another trial through after one that ended without a verdict on the provider"""
+        self._trial_in_flight = False
+
+    def record_success(self) -> None:
+        """Close the breaker after a successful call"""
+        if self.state != BreakerState.CLOSED:
+            logger.info("Circuit breaker for '%s' closed", self.name)
+        self.state = BreakerState.CLOSED
+        self.consecutive_failures = 0
+        self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count a transient failure and open the breaker past the threshold"""
+        self.consecutive_failures += 1
+        self._trial_in_flight = False
+        if self.state == BreakerState.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != BreakerState.OPEN:
+                self.times_opened += 1
+                logger.warning(
+                    "Circuit breaker for '%s' opened after %d consecutive failures",
+                    self.name, self.consecutive_failures
+                )
+            self.state = BreakerState.OPEN
+            self.opened_at = time.monotonic()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get breaker state and counters"""
+        return {
+            "state": self.state.value,
+            "consecutive_failures": self.consecutive_failures,
+            "times_opened": self.times_opened,
+            "short_circuited": self.short_circuited
+        }
+
+
+class ResilienceLayer:
+    """Wraps agent calls with error classification, retries and circuit breakers"""
+
+    def __init__(self,
+                 policy: Optional[RetryPolicy] = None,
+                 failure_threshold: int = 5,
+                 reset_timeout: float = 60.0):
+        self.policy = policy or RetryPolicy()
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self.calls = 0
+        self.retries = 0
+        self.recovered = 0
+        self.failures: Dict[str, int] = {}
+
+    @classmethod
+    def from_settings(cls) -> "ResilienceLayer":
+        """Build the resilience layer from application settings"""
+        return cls(
+            policy=RetryPolicy(
+                max_attempts=settings.retry_max_attempts,
+                base_delay=settings.retry_base_delay,
+                max_delay=settings.retry_max_delay
+            ),
+            failure_threshold=settings.circuit_breaker_failure_threshold,
+            reset_timeout=settings.circuit_breaker_reset_timeout
+        )
+
+    def breaker(self, provider: str) -> CircuitBreaker:
+        """Get or create the circuit breaker for a provider"""
+        if provider not in self.breakers:
+            self.breakers[provider] = CircuitBreaker(
+                provider, self.failure_threshold, self.reset_timeout
+            )
+        return self.breakers[provider]
+
+    async def call(self, provider: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run `func` with bounded retries behind the provider's circuit breaker.
+
+        Raises the classified error once retries are exhausted or the error is
+        permanent.
+        """
+        breaker = self.breaker(provider)
+        self.calls += 1
+        attempt = 1
+
+        while True:
+            try:
+                breaker.before_call()
+            except CircuitOpenError as e:
+                self._count_failure(e)
+                raise
+
+            try:
+                result = await func()
+            except asyncio.CancelledError:
+                # A cancelled trial, e.g. a hedging loser, gave no verdict on the provider
+                breaker.release_trial()
+                raise
+            except Exception as e:
+                error = classify_error(e)
+                if isinstance(error, ClientRateLimitError):
+                    # Our own limiter refused the call; the provider was never asked, and a
+                    # retry would only wait out the limiter's longest wait again
+                    breaker.release_trial()
+                    self._count_failure(error)
+                    raise error
+                if is_transient(error):
+                    breaker.record_failure()
+                else:
+                    # The provider answered; a bad request says nothing about its health
+                    breaker.record_success()
+                if not is_transient(error) or attempt >= self.policy.max_attempts:
+                    self._count_failure(error)
+                    raise error
+
+                delay = self.policy.backoff(attempt)
+                self.retries += 1
+                RETRIES.labels(provider, type(error).__name__).inc()
+                logger.warning(
+                    "%s from %s (attempt %d/%d), retrying in %.2fs",
+                    type(error).__name__, provider, attempt, self.policy.max_attempts, delay
+                )
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+
+            breaker.record_success()
+            if attempt > 1:
+                self.recovered += 1
+            return result
+
+    def _count_failure(self, error: Exception) -> None:
+        """Count a final failure by exception type"""
+        name = type(error).__name__
+        self.failures[name] = self.failures.get(name, 0) + 1
+        FAILURES.labels("agent_call", name).inc()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get retry and circuit breaker metrics"""
+        return {
+            "calls": self.calls,
+            "retries": self.retries,
+            "recovered_after_retry": self.recovered,
+            "failures": dict(self.failures),
+            "breakers": {name: breaker.get_stats() for name, breaker in self.breakers.items()}
+        }
@@ -0,0 +1,386 @@
+"""Tiered result storage: hot in memory, warm in SQLite, cold in monthly archives"""
+
+import asyncio
+import heapq
+import json
+import logging
+import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple
+
+from ..config.settings import settings
+from ..models.schemas import AnalysisResult, AnalysisStatus
+from .metrics import RESULT_TIER_LOOKUP_LATENCY, RESULTS_TIERED
+from .state_store import connect_shared_db
+
+logger = logging.getLogger(__name__)
+
+FINISHED = (AnalysisStatus.COMPLETED, AnalysisStatus.FAILED)
+
+
+class ResultArchive:
+    """Append-only monthly archive files of compressed results.
+
+    Each record is a self-describing frame (magic, request ID and zlib
+    payload), so an archive's offset index can be rebuilt by scanning it.
+    Files are only ever appended to; a record is read back with a single
+    positioned read of its frame.
+    """
+
+    MAGIC = b"AR"
+    _HEADER = struct.Struct(">2sHI")
+
+    def __init__(self, directory: Path, fsync: bool = True):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.fsync = fsync
+
+    def path(self, month: str) -> Path:
+        return self.directory / f"results-{month}.arc"
+
+    def append(self, month: str, records: List[Tuple[str, bytes]]) -> List[Tuple[str, int, int]]:
+        """Append records to a month's archive; returns (request_id, offset, length) per record"""
+        entries = []
+        with open(self.path(month), "ab") as f:
+            offset = f.seek(0, os.SEEK_END)
+            for request_id, payload in records:
+                key = request_id.encode("utf-8")
+                data = zlib.compress(payload)
+                frame = self._HEADER.pack(self.MAGIC, len(key), len(data)) + key + data
+                f.write(frame)
+                entries.append((request_id, offset, len(frame)))
+                offset += len(frame)
+            f.flush()
+            if self.fsync:
+                os.fsync(f.fileno())
+        return entries
+
+    def read(self, month: str, offset: int, length: int) -> bytes:
+        """Read and decompress one record"""
+        fd = os.open(self.path(month), os.O_RDONLY)
+        try:
+            frame = os.pread(fd, length, offset)
+        finally:
+            os.close(fd)
+        magic, key_length, _ = self._HEADER.unpack_from(frame)
+        if magic != self.MAGIC:
+            raise ValueError(f"Corrupt archive record at {self.path(month)}:{offset}")
+        return zlib.decompress(frame[self._HEADER.size + key_length:])
+
+    def scan(self, month: str) -> Iterator[Tuple[str, int, int]]:
+        """Yield (request_id, offset, length) for every record in a month's archive"""
+        with open(self.path(month), "rb") as f:
+            offset = 0
+            while True:
+                header = f.read(self._HEADER.size)
+                if len(header) < self._HEADER.size:
+                    return
+                magic, key_length, size = self._HEADER.unpack(header)
+                if magic != self.MAGIC:
+                    raise ValueError(f"Corrupt archive record at {self.path(month)}:{offset}")
+                key = f.read(key_length).decode("utf-8")
+                f.seek(size, os.SEEK_CUR)
+                length = self._HEADER.size + key_length + size
+                yield key, offset, length
+                offset += length
+
+    def months(self) -> List[str]:
+        return sorted(path.stem.split("-", 1)[1] for path in self.directory.glob("results-*.arc"))
+
+    def total_bytes(self) -> int:
+        return sum(path.stat().st_size for path in self.directory.glob("results-*.arc"))
+
+
+class TieredResults:
+    """Moves finished analyses out of memory as they age.
+
+    Hot results live in the analyzer's results cache. Finished results older
+    than `hot_age` are demoted to the warm tier, a SQLite table keyed by
+    request ID; warm results older than `warm_age` are appended to the cold
+    tier's monthly archive and indexed by offset. A lookup that misses the
+    hot tier costs one indexed row in the warm tier, or one indexed row plus
+    one positioned read and decompression in the cold tier.
+    """
+
+    def __init__(self,
+                 hot: MutableMapping,
+                 directory: Path,
+                 hot_age: timedelta = timedelta(hours=24),
+                 warm_age: timedelta = timedelta(days=90),
+                 interval: float = 300.0,
+                 batch_size: int = 500,
+                 window: int = 1000):
+        self.hot = hot
+        self.hot_age = hot_age
+        self.warm_age = warm_age
+        self.interval = interval
+        self.batch_size = batch_size
+        self.archive = ResultArchive(Path(directory) / "archive")
+        self.demoted = 0
+        self.archived = 0
+        self._latencies: Dict[str, Deque[float]] = {tier: deque(maxlen=window) for tier in ("warm", "cold")}
+        self._lock = asyncio.Lock()
+        self._db_lock = threading.Lock()
+        self._conn = connect_shared_db(Path(directory) / "results.db")
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS warm (
+                request_id TEXT PRIMARY KEY,
+                created_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_warm_created ON warm (created_at);
+            CREATE TABLE IF NOT EXISTS cold (
+                request_id TEXT PRIMARY KEY,
+                month TEXT NOT NULL,
+                offset INTEGER NOT NULL,
+                length INTEGER NOT NULL,
+                created_at TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_cold_created ON cold (created_at);
+        """)
+
+    @classmethod
+    def from_settings(cls, hot: MutableMapping) -> "TieredResults":
+        """Build the tiers from application settings"""
+        return cls(
+            hot,
+            settings.reports_dir / "results",
+            hot_age=timedelta(hours=settings.hot_result_hours),
+            warm_age=timedelta(days=settings.warm_result_days),
+            interval=settings.tiering_interval
+        )
+
+    def _observe(self, tier: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        self._latencies[tier].append(elapsed)
+        RESULT_TIER_LOOKUP_LATENCY.labels(tier).observe(elapsed)
+
+    def get_stored(self, request_id: str) -> Optional[AnalysisResult]:
+        """Look a result up in the warm tier, then the cold tier. Blocking"""
+        started = time.perf_counter()
+        with self._db_lock:
+            row = self._conn.execute("SELECT payload FROM warm WHERE request_id = ?", (request_id,)).fetchone()
+        if row is not None:
+            self._observe("warm", started)
+            return AnalysisResult.model_validate_json(row[0])
+
+        started = time.perf_counter()
+        with self._db_lock:
+            row = self._conn.execute(
+                "SELECT month, offset, length FROM cold WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        result = AnalysisResult.model_validate_json(self.archive.read(*row))
+        self._observe("cold", started)
+        return result
+
+    def demote(self, results: List[AnalysisResult]) -> int:
+        """Write results to the warm tier. Blocking; callers drop them from the hot tier afterwards"""
+        if not results:
+            return 0
+        with self._db_lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO warm (request_id, created_at, status, payload) VALUES (?, ?, ?, ?)",
+                    [
+                        (result.request_id, result.created_at.isoformat(), result.status.value, result.model_dump_json())
+                        for result in results
+                    ]
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        self.demoted += len(results)
+        RESULTS_TIERED.labels("warm").inc(len(results))
+        return len(results)
+
+    def _hot_before(self, cutoff: datetime) -> List[AnalysisResult]:
+        if hasattr(self.hot, "finished_before"):
+            return self.hot.finished_before(cutoff, self.batch_size)
+        # The dict keeps analyses in creation order, so stop at the first recent one
+        results = []
+        for result in self.hot.values():
+            if result.created_at >= cutoff or len(results) >= self.batch_size:
+                break
+            if result.status in FINISHED:
+                results.append(result)
+        return results
+
+    async def demote_before(self, cutoff: datetime) -> int:
+        """Move finished hot results created before `cutoff` to the warm tier"""
+        demoted = 0
+        async with self._lock:
+            while True:
+                results = self._hot_before(cutoff)
+                if not results:
+                    break
+                await asyncio.to_thread(self.demote, results)
+                for result in results:
+                    self.hot.pop(result.request_id, None)
+                demoted += len(results)
+                if len(results) < self.batch_size:
+                    break
+        return demoted
+
+    def archive_before(self, cutoff: datetime) -> int:
+        """Append warm results created before `cutoff` to the monthly archives. Blocking"""
+        archived = 0
+        while True:
+            with self._db_lock:
+                # The write lock also serializes archive appends across worker processes
+                self._conn.execute("BEGIN IMMEDIATE")
+                try:
+                    rows = self._conn.execute(
+                        "SELECT request_id, created_at, payload FROM warm WHERE created_at < ? "
+                        "ORDER BY created_at LIMIT ?",
+                        (cutoff.isoformat(), self.batch_size)
+                    ).fetchall()
+                    by_month: Dict[str, List[Tuple[str, str, str]]] = {}
+                    for row in rows:
+                        by_month.setdefault(row[1][:7], []).append(row)
+                    for month, month_rows in by_month.items():
+                        entries = self.archive.append(
+                            month, [(request_id, payload.encode("utf-8")) for request_id, _, payload in month_rows]
+                        )
+                        self._conn.executemany(
+                            "INSERT OR REPLACE INTO cold (request_id, month, offset, length, created_at) "
+                            "VALUES (?, ?, ?, ?, ?)",
+                            [
+                                (request_id, month, offset, length, created_at)
+                                for (request_id, offset, length), (_, created_at, _) in zip(entries, month_rows)
+                            ]
+                        )
+                    self._conn.executemany("DELETE FROM warm WHERE request_id = ?", [(row[0],) for row in rows])
+                    self._conn.execute("COMMIT")
+                except BaseException:
+                    self._conn.execute("ROLLBACK")
+                    raise
+            archived += len(rows)
+            if len(rows) < self.batch_size:
+                break
+        self.archived += archived
+        RESULTS_TIERED.labels("cold").inc(archived)
+        return archived
+
+    def rebuild_index(self, month: str) -> int:
+        """Re-index a month's archive from its frames, e.g. after restoring it from backup"""
+        rows = []
+        for request_id, offset, length in self.archive.scan(month):
+            result = AnalysisResult.model_validate_json(self.archive.read(month, offset, length))
+            rows.append((request_id, month, offset, length, result.created_at.isoformat()))
+        with self._db_lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO cold (request_id, month, offset, length, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows
+            )
+        return len(rows)
+
+    def delete(self, request_id: str) -> bool:
+        """Forget a result in the warm and cold tiers; archived bytes stay until the file is dropped"""
+        with self._db_lock:
+            warm = self._conn.execute("DELETE FROM warm WHERE request_id = ?", (request_id,)).rowcount
+            cold = self._conn.execute("DELETE FROM cold WHERE request_id = ?", (request_id,)).rowcount
+        return bool(warm or cold)
+
+    def _pages(self,
+               select: str,
+               since: Optional[datetime],
+               until: Optional[datetime],
+               extra: Tuple[str, ...] = (),
+               params: Tuple[Any, ...] = ()) -> Iterator[tuple]:
+        """Keyset-paginate `select` (whose first columns are created_at, request_id) oldest first"""
+        clauses = ["created_at >= ?", "(created_at > ? OR request_id > ?)", *extra]
+        bounds: List[Any] = list(params)
+        if since:
+            clauses.append("created_at >= ?")
+            bounds.append(since.isoformat())
+        if until:
+            clauses.append("created_at < ?")
+            bounds.append(until.isoformat())
+        sql = f"{select} WHERE {' AND '.join(clauses)} ORDER BY created_at, request_id LIMIT ?"
+        last = ("", "")
+        while True:
+            with self._db_lock:
+                rows = self._conn.execute(sql, [last[0], *last, *bounds, self.batch_size]).fetchall()
+            yield from rows
+            if len(rows) < self.batch_size:
+                return
+            last = rows[-1][:2]
+
+    def iter_payloads(self,
+                      since: Optional[datetime] = None,
+                      until: Optional[datetime] = None,
+                      status: Optional[AnalysisStatus] = None) -> Iterator[Tuple[str, str, str]]:
+        """Yield (created_at, request_id, JSON payload) from the warm and cold tiers, oldest first. Blocking"""
+        warm = self._pages(
+            "SELECT created_at, request_id, payload FROM warm", since, until,
+            ("status = ?",) if status else (), (status.value,) if status else ()
+        )
+
+        def cold() -> Iterator[Tuple[str, str, str]]:
+            for created_at, request_id, month, offset, length in self._pages(
+                "SELECT created_at, request_id, month, offset, length FROM cold", since, until
+            ):
+                try:
+                    payload = self.archive.read(month, offset, length).decode("utf-8")
+                except (OSError, ValueError, zlib.error) as e:
+                    logger.warning("Skipping unreadable archived result %s: %s", request_id, e)
+                    continue
+                # The cold index has no status column; archived results are rare enough to decode
+                if status and json.loads(payload).get("status") != status.value:
+                    continue
+                yield created_at, request_id, payload
+
+        return heapq.merge(cold(), warm)
+
+    async def run(self) -> None:
+        """Demote and archive every `interval` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                now = datetime.now()
+                demoted = await self.demote_before(now - self.hot_age)
+                archived = await asyncio.to_thread(self.archive_before, now - self.warm_age)
+                if demoted or archived:
+                    logger.info("Moved %d analyses to the warm tier and %d to the cold tier", demoted, archived)
+            except Exception as e:
+                logger.error("Result tiering failed: %s", e)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get per-tier counts and lookup latency"""
+        with self._db_lock:
+            warm = self._conn.execute("SELECT COUNT(*) FROM warm").fetchone()[0]
+            cold = self._conn.execute("SELECT COUNT(*) FROM cold").fetchone()[0]
+
+        def latency(tier: str) -> Dict[str, float]:
+            ordered = sorted(self._latencies[tier])
+            count = len(ordered)
+            return {
+                "lookups": count,
+                "p50_ms": round(ordered[count // 2] * 1000, 3) if count else 0.0,
+                "p99_ms": round(ordered[min(count - 1, int(0.99 * count))] * 1000, 3) if count else 0.0
+            }
+
+        return {
+            "hot": {"count": len(self.hot), "max_age_hours": self.hot_age.total_seconds() / 3600},
+            "warm": {"count": warm, "max_age_days": self.warm_age.days, **latency("warm")},
+            "cold": {
+                "count": cold,
+                "archives": len(self.archive.months()),
+                "mb": round(self.archive.total_bytes() / 2**20, 2),
+                **latency("cold")
+            },
+            "demoted": self.demoted,
+            "archived": self.archived
+        }
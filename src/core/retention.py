@@ -0,0 +1,179 @@
+"""Retention sweeper for stored reports, legacy report directories and cached results"""
+
+import asyncio
+import inspect
+import logging
+import os
+import shutil
+from collections import deque
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple, Union
+
+from ..config.settings import settings
+from .metrics import REPORT_STORE_BYTES, RESULTS_EVICTED, RETENTION_REMOVED
+from .report_store import ReportBlobStore
+
+logger = logging.getLogger(__name__)
+
+
+class RetentionSweeper:
+    """Enforces the report age limit and disk cap.
+
+    Each sweep expires whole days from the report store's day index, oldest
+    first: every day older than `max_age_days`, then more days while the
+    store is above `max_bytes`. Only expired days are touched, so a sweep
+    costs the same however much history is kept. Cached results older than
+    the age limit go to `expire_results`, which deletes them or, with result
+    tiering on, demotes them to disk.
+
+    Pre-store per-analysis report directories are aged out by modification
+    time, at most `legacy_batch` per sweep, and count toward the disk cap;
+    being older than anything in the store, they go first when it is
+    exceeded. Nothing writes them any more, so they are listed once per
+    process, oldest first, and the list is consumed as they are removed.
+    """
+
+    def __init__(self,
+                 store: ReportBlobStore,
+                 expire_results: Callable[[datetime], Union[int, Awaitable[int]]],
+                 legacy_dir: Optional[Path] = None,
+                 max_age_days: int = 30,
+                 max_bytes: Optional[int] = None,
+                 interval: float = 3600.0,
+                 legacy_batch: int = 1000):
+        self.store = store
+        self.expire_results = expire_results
+        self.legacy_dir = legacy_dir
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.legacy_batch = legacy_batch
+        self.sweeps = 0
+        # (mtime, path, bytes) of legacy directories, oldest first; listed on the first sweep
+        self._legacy: Optional[Deque[Tuple[float, str, int]]] = None
+        self._legacy_bytes = 0
+        self.last_sweep: Optional[datetime] = None
+        self.removed = {"results": 0, "reports": 0, "blobs": 0, "legacy_dirs": 0, "bytes": 0, "capped_days": 0}
+
+        REPORT_STORE_BYTES.set_function(store.total_bytes)
+
+    @classmethod
+    def from_settings(cls,
+                      store: ReportBlobStore,
+                      expire_results: Callable[[datetime], Union[int, Awaitable[int]]]) -> "RetentionSweeper":
+        """Build the sweeper from application settings"""
+        return cls(
+            store,
+            expire_results,
+            legacy_dir=settings.reports_dir / "investment",
+            max_age_days=settings.max_report_age_days,
+            max_bytes=int(settings.max_reports_mb * 2**20) if settings.max_reports_mb else None,
+            interval=settings.retention_interval
+        )
+
+    async def sweep(self, max_age_days: Optional[int] = None) -> Dict[str, int]:
+        """Expire everything older than `max_age_days`, then enforce the disk cap"""
+        cutoff = datetime.now() - timedelta(days=max_age_days or self.max_age_days)
+        # The results cache belongs to the event loop; the disk work does not
+        results = self.expire_results(cutoff)
+        if inspect.isawaitable(results):
+            results = await results
+        removed = await asyncio.to_thread(self._sweep_disk, cutoff)
+        removed["results"] = results
+
+        self.sweeps += 1
+        self.last_sweep = datetime.now()
+        for kind, count in removed.items():
+            self.removed[kind] += count
+        RESULTS_EVICTED.labels("retention").inc(results)
+        for kind in ("reports", "blobs", "legacy_dirs"):
+            RETENTION_REMOVED.labels(kind).inc(removed[kind])
+
+        if any(removed.values()):
+            logger.info(
+                "Retention sweep removed %d results, %d reports, %d blobs (%.1fMB) and %d legacy report directories",
+                results, removed["reports"], removed["blobs"], removed["bytes"] / 2**20, removed["legacy_dirs"]
+            )
+        return removed
+
+    def _sweep_disk(self, cutoff: datetime) -> Dict[str, int]:
+        removed = {"reports": 0, "blobs": 0, "legacy_dirs": 0, "bytes": 0, "capped_days": 0}
+
+        def add(expired: Dict[str, int]) -> None:
+            for kind, count in expired.items():
+                removed[kind] += count
+
+        for day in self.store.days_before(cutoff.strftime("%Y-%m-%d")):
+            add(self.store.expire_day(day))
+
+        legacy = self._legacy_dirs()
+        while legacy and legacy[0][0] < cutoff.timestamp() and removed["legacy_dirs"] < self.legacy_batch:
+            add(self._remove_legacy())
+
+        if self.max_bytes:
+            # Whole days go oldest first; a day whose blobs are all still shared frees nothing
+            while self.store.total_bytes() + self._legacy_bytes > self.max_bytes:
+                if legacy:
+                    add(self._remove_legacy())
+                    continue
+                day = self.store.oldest_day()
+                if day is None:
+                    break
+                add(self.store.expire_day(day))
+                removed["capped_days"] += 1
+        return removed
+
+    def _legacy_dirs(self) -> Deque[Tuple[float, str, int]]:
+        """List the legacy report directories oldest first, sized only when there is a disk cap"""
+        if self._legacy is not None:
+            return self._legacy
+        found = []
+        if self.legacy_dir is not None and self.legacy_dir.is_dir():
+            with os.scandir(self.legacy_dir) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_dir(follow_symlinks=False):
+                            continue
+                        size = 0
+                        if self.max_bytes:
+                            with os.scandir(entry.path) as files:
+                                size = sum(f.stat().st_size for f in files if f.is_file(follow_symlinks=False))
+                        found.append((entry.stat().st_mtime, entry.path, size))
+                    except OSError as e:
+                        logger.warning("Skipping report directory %s: %s", entry.path, e)
+        found.sort()
+        self._legacy = deque(found)
+        self._legacy_bytes = sum(size for _, _, size in found)
+        return self._legacy
+
+    def _remove_legacy(self) -> Dict[str, int]:
+        """Delete the oldest legacy report directory"""
+        _, path, size = self._legacy.popleft()
+        self._legacy_bytes -= size
+        try:
+            shutil.rmtree(path)
+        except FileNotFoundError:
+            return {}
+        except OSError as e:
+            logger.warning("Could not remove report directory %s: %s", path, e)
+            return {}
+        return {"legacy_dirs": 1, "bytes": size}
+
+    async def run(self) -> None:
+        """Sweep now and then every `interval` seconds until cancelled"""
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error("Retention sweep failed: %s", e)
+            await asyncio.sleep(self.interval)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "max_age_days": self.max_age_days,
+            "max_mb": round(self.max_bytes / 2**20, 1) if self.max_bytes else None,
+            "sweeps": self.sweeps,
+            "last_sweep": self.last_sweep.isoformat() if self.last_sweep else None,
+            "removed": dict(self.removed)
+        }
@@ -0,0 +1,260 @@
+"""Runtime estimates and admission scheduling for analyses"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+from ..config.settings import settings
+from .agents import PHASE_AGENTS
+from .metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_WAIT, ETA_ACCURACY
+
+logger = logging.getLogger(__name__)
+
+
+class RuntimeEstimator:
+    """Predicts phase durations from an analysis's size.
+
+    Size is the estimated token count of the first phase's prompt, which
+    grows with the number of tickers and the length of the custom message.
+    Each phase keeps a window of recent (size, seconds) runs and predicts
+    with a least-squares line through them; with too few runs, or runs of
+    a single size, it predicts their mean, and with none the configured
+    default.
+    """
+
+    def __init__(self, default_seconds: float = 30.0, window: int = 200, min_samples: int = 5):
+        self.default_seconds = default_seconds
+        self.window = window
+        self.min_samples = min_samples
+        self._samples: Dict[str, Deque[Tuple[int, float]]] = {}
+
+    def record(self, phase: str, size: int, seconds: float) -> None:
+        self._samples.setdefault(phase, deque(maxlen=self.window)).append((size, seconds))
+
+    def _fit(self, phase: str) -> Optional[Tuple[float, float, float]]:
+        """(mean size, mean seconds, seconds per size unit) for a phase, or None without history"""
+        samples = self._samples.get(phase)
+        if not samples:
+            return None
+        count = len(samples)
+        mean_x = sum(x for x, _ in samples) / count
+        mean_y = sum(y for _, y in samples) / count
+        if count < self.min_samples:
+            return mean_x, mean_y, 0.0
+        var_x = sum((x - mean_x) ** 2 for x, _ in samples)
+        if var_x == 0:
+            return mean_x, mean_y, 0.0
+        # A bigger analysis never predicts faster, whatever the noise says
+        slope = max(sum((x - mean_x) * (y - mean_y) for x, y in samples) / var_x, 0.0)
+        return mean_x, mean_y, slope
+
+    def predict(self, phase: str, size: int) -> float:
+        fit = self._fit(phase)
+        if fit is None:
+            return self.default_seconds
+        mean_x, mean_y, slope = fit
+        return max(mean_y + slope * (size - mean_x), 0.0)
+
+    def estimate(self, size: int) -> Dict[str, float]:
+        """Predicted seconds for each phase of an analysis of `size`"""
+        return {phase: self.predict(phase, size) for phase in PHASE_AGENTS}
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = {}
+        for phase in self._samples:
+            fit = self._fit(phase)
+            stats[phase] = {
+                "samples": len(self._samples[phase]),
+                "mean_seconds": round(fit[1], 3) if fit else None,
+                "seconds_per_1k_tokens": round(fit[2] * 1000, 3) if fit else None
+            }
+        return stats
+
+
+@dataclass
+class _Job:
+    """One analysis known to the scheduler, waiting or running"""
+    request_id: str
+    size: int
+    estimates: Dict[str, float]
+    enqueued_at: float
+    key: Tuple[float, int]
+    future: Optional[asyncio.Future] = None
+    admitted_at: Optional[float] = None
+    phase: Optional[str] = None
+    phase_started: float = 0.0
+    done: Set[str] = field(default_factory=set)
+
+    @property
+    def total(self) -> float:
+        return sum(self.estimates.values())
+
+    def remaining(self, now: float) -> float:
+        """Estimated seconds of work left once running"""
+        left = 0.0
+        for phase, seconds in self.estimates.items():
+            if phase in self.done:
+                continue
+            if phase == self.phase:
+                seconds = max(seconds - (now - self.phase_started), 0.0)
+            left += seconds
+        return left
+
+
+class AnalysisScheduler:
+    """Admits analyses to at most `max_concurrent` run slots.
+
+    Analyses beyond the limit wait as pending. `fifo` admits them in
+    arrival order; `sjf` admits the shortest estimated job first, aged so
+    that every second spent waiting counts as `aging_rate` seconds less
+    work. Since all waiting jobs age at the same rate, the aged order is
+    fixed at arrival and a heap keyed on it stays exact. Without a limit
+    every analysis is admitted at once and the scheduler only tracks ETAs.
+    Limits and queues are per worker process.
+    """
+
+    def __init__(self,
+                 estimator: RuntimeEstimator,
+                 max_concurrent: Optional[int] = None,
+                 policy: str = "fifo",
+                 aging_rate: float = 1.0):
+        if policy not in ("fifo", "sjf"):
+            raise ValueError(f"Unknown scheduler policy: {policy}")
+        self.estimator = estimator
+        self.max_concurrent = max_concurrent
+        self.policy = policy
+        self.aging_rate = aging_rate
+        self.admitted = 0
+        self._jobs: Dict[str, _Job] = {}
+        self._queue: List[Tuple[Tuple[float, int], _Job]] = []
+        self._running: Set[str] = set()
+        self._order = itertools.count()
+
+        ADMISSION_QUEUE_DEPTH.set_function(lambda: len(self._queue))
+
+    @classmethod
+    def from_settings(cls) -> "AnalysisScheduler":
+        """Build the scheduler from application settings"""
+        return cls(
+            RuntimeEstimator(settings.eta_default_phase_seconds, settings.eta_window),
+            max_concurrent=settings.max_concurrent_analyses,
+            policy=settings.scheduler_policy.lower(),
+            aging_rate=settings.scheduler_aging_rate
+        )
+
+    def is_saturated(self) -> bool:
+        """Whether a new analysis would have to wait"""
+        return bool(self.max_concurrent) and (bool(self._queue) or len(self._running) >= self.max_concurrent)
+
+    async def acquire(self, request_id: str, size: int) -> float:
+        """Wait for a run slot; returns the seconds waited"""
+        now = time.monotonic()
+        estimates = self.estimator.estimate(size)
+        total = sum(estimates.values())
+        # The arrival counter breaks ties and keeps equal keys in arrival order
+        key = (total + self.aging_rate * now if self.policy == "sjf" else now, next(self._order))
+        job = _Job(request_id, size, estimates, now, key)
+        self._jobs[request_id] = job
+
+        if not self.is_saturated():
+            self._admit(job)
+            return 0.0
+
+        job.future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._queue, (key, job))
+        logger.info(
+            "Analysis %s queued at position %d (estimated %.0fs)",
+            request_id, self._position(job), total
+        )
+        try:
+            await job.future
+        except asyncio.CancelledError:
+            if job.admitted_at is not None:
+                self.release(request_id)
+            else:
+                self._queue = [entry for entry in self._queue if entry[1] is not job]
+                heapq.heapify(self._queue)
+                self._jobs.pop(request_id, None)
+            raise
+        waited = job.admitted_at - job.enqueued_at
+        ADMISSION_WAIT.observe(waited)
+        return waited
+
+    def _admit(self, job: _Job) -> None:
+        job.admitted_at = time.monotonic()
+        self._running.add(job.request_id)
+        self.admitted += 1
+
+    def release(self, request_id: str) -> None:
+        """Free an analysis's slot and admit the next waiting one"""
+        job = self._jobs.pop(request_id, None)
+        if job is None or job.admitted_at is None:
+            return
+        self._running.discard(request_id)
+        if job.total > 0:
+            ETA_ACCURACY.observe((time.monotonic() - job.admitted_at) / job.total)
+        while self._queue and (not self.max_concurrent or len(self._running) < self.max_concurrent):
+            _, waiting = heapq.heappop(self._queue)
+            # Cancelled while queued; its task cleans up when it next runs
+            if waiting.future.done():
+                continue
+            self._admit(waiting)
+            waiting.future.set_result(None)
+
+    def phase_started(self, request_id: str, phase: str) -> None:
+        job = self._jobs.get(request_id)
+        if job is not None:
+            job.phase, job.phase_started = phase, time.monotonic()
+
+    def phase_finished(self, request_id: str, phase: str, seconds: float) -> None:
+        """Mark a phase done and add its duration to the estimator's history"""
+        job = self._jobs.get(request_id)
+        if job is None:
+            return
+        job.done.add(phase)
+        job.phase = None
+        self.estimator.record(phase, job.size, seconds)
+
+    def _ahead_of(self, job: _Job) -> List[_Job]:
+        return [waiting for key, waiting in self._queue if key < job.key]
+
+    def _position(self, job: _Job) -> int:
+        return len(self._ahead_of(job)) + 1
+
+    def eta(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Queue position and estimated completion of a pending or running analysis"""
+        job = self._jobs.get(request_id)
+        if job is None:
+            return None
+        now = time.monotonic()
+        position = None
+        if job.admitted_at is not None:
+            remaining = job.remaining(now)
+        else:
+            ahead = self._ahead_of(job)
+            position = len(ahead) + 1
+            # Work ahead of this job drains through every slot at once
+            backlog = sum(self._jobs[r].remaining(now) for r in self._running) + sum(j.total for j in ahead)
+            remaining = backlog / (self.max_concurrent or 1) + job.total
+        return {
+            "queue_position": position,
+            "estimated_seconds": round(job.total, 1),
+            "remaining_seconds": round(remaining, 1),
+            "eta": datetime.now() + timedelta(seconds=remaining)
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "policy": self.policy,
+            "max_concurrent": self.max_concurrent,
+            "running": len(self._running),
+            "queued": len(self._queue),
+            "admitted": self.admitted,
+            "estimator": self.estimator.get_stats()
+        }
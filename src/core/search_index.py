@@ -0,0 +1,185 @@
+"""Full-text search over analysis reports with SQLite FTS5"""
+
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from ..config.settings import settings
+from .state_store import connect_shared_db
+
+logger = logging.getLogger(__name__)
+
+
+class SearchQueryError(ValueError):
+    """The search expression is not valid FTS5 syntax"""
+
+
+class AnalysisSearchIndex:
+    """FTS5 index with one document per analysis phase.
+
+    Documents are added as each phase completes, so an analysis is
+    searchable while it is still running. Tickers are an indexed FTS column,
+    which lets a ticker filter narrow the match inside the full-text index;
+    dates and status live in a side table joined on rowid.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_shared_db(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY,
+                request_id TEXT NOT NULL,
+                phase TEXT NOT NULL,
+                companies TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                status TEXT NOT NULL,
+                UNIQUE (request_id, phase)
+            );
+            CREATE INDEX IF NOT EXISTS idx_documents_created ON documents (created_at);
+            CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5(
+                body, tickers, tokenize = 'porter unicode61'
+            );
+        """)
+
+    @classmethod
+    def from_settings(cls) -> "AnalysisSearchIndex":
+        """Build the index from application settings"""
+        return cls(settings.reports_dir / "search.db")
+
+    def add(self,
+            request_id: str,
+            phase: str,
+            body: str,
+            companies: List[str],
+            created_at: datetime,
+            status: str) -> None:
+        """Index one phase's report, replacing an earlier version of it"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM documents WHERE request_id = ? AND phase = ?", (request_id, phase)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute("DELETE FROM documents_fts WHERE rowid = ?", row)
+                    self._conn.execute("DELETE FROM documents WHERE id = ?", row)
+                doc_id = self._conn.execute(
+                    "INSERT INTO documents (request_id, phase, companies, created_at, status) VALUES (?, ?, ?, ?, ?)",
+                    (request_id, phase, ",".join(companies), created_at.isoformat(), status)
+                ).lastrowid
+                self._conn.execute(
+                    "INSERT INTO documents_fts (rowid, body, tickers) VALUES (?, ?, ?)",
+                    (doc_id, body, " ".join(symbol.upper() for symbol in companies))
+                )
+                self._conn.execute("UPDATE documents SET status = ? WHERE request_id = ?", (status, request_id))
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def set_status(self, request_id: str, status: str) -> None:
+        """Update the status of every indexed phase of an analysis"""
+        with self._lock:
+            self._conn.execute("UPDATE documents SET status = ? WHERE request_id = ?", (status, request_id))
+
+    def delete(self, request_id: str) -> int:
+        """Remove an analysis from the index"""
+        return self._delete("request_id = ?", (request_id,))
+
+    def delete_created_before(self, cutoff: datetime) -> int:
+        """Remove analyses created before `cutoff`"""
+        return self._delete("created_at < ?", (cutoff.isoformat(),))
+
+    def _delete(self, where: str, params: tuple) -> int:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute(
+                    f"DELETE FROM documents_fts WHERE rowid IN (SELECT id FROM documents WHERE {where})", params
+                )
+                deleted = self._conn.execute(f"DELETE FROM documents WHERE {where}", params).rowcount
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return deleted
+
+    def search(self,
+               query: str,
+               ticker: Optional[str] = None,
+               status: Optional[str] = None,
+               since: Optional[datetime] = None,
+               until: Optional[datetime] = None,
+               limit: int = 20,
+               offset: int = 0,
+               sort: str = "relevance") -> Dict[str, Any]:
+        """Return one page of matching phase reports with snippets.
+
+        `query` uses FTS5 syntax: quote phrases ("supply chain"), combine
+        terms with AND/OR/NOT, suffix a prefix with *. `relevance` ranks
+        every match by BM25, so its cost grows with the number of matches;
+        `recent` walks the index newest first and stops after one page,
+        which stays fast for terms that appear in most reports.
+        """
+        match = f"({query})"
+        if ticker:
+            match += f' AND tickers:"{ticker.upper().replace(chr(34), "")}"'
+
+        clauses, params = ["documents_fts MATCH ?"], [match]
+        if status:
+            clauses.append("d.status = ?")
+            params.append(status)
+        if since:
+            clauses.append("d.created_at >= ?")
+            params.append(since.isoformat())
+        if until:
+            clauses.append("d.created_at < ?")
+            params.append(until.isoformat())
+
+        sql = (
+            "SELECT d.request_id, d.phase, d.companies, d.created_at, d.status, "
+            "snippet(documents_fts, 0, '**', '**', '…', 16), documents_fts.rank "
+            "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid "
+            f"WHERE {' AND '.join(clauses)} "
+            f"ORDER BY {'documents_fts.rowid DESC' if sort == 'recent' else 'documents_fts.rank'} LIMIT ? OFFSET ?"
+        )
+        # One extra row tells whether there is a next page without counting every match
+        params += [limit + 1, offset]
+        try:
+            with self._lock:
+                rows = self._conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            raise SearchQueryError(str(e)) from e
+
+        hits = [
+            {
+                "request_id": request_id,
+                "phase": phase,
+                "companies": companies.split(",") if companies else [],
+                "created_at": created_at,
+                "status": doc_status,
+                "snippet": snippet,
+                "score": round(-score, 4)
+            }
+            for request_id, phase, companies, created_at, doc_status, snippet, score in rows[:limit]
+        ]
+        return {
+            "query": query,
+            "results": hits,
+            "next_offset": offset + limit if len(rows) > limit else None
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+        return {"documents": documents, "path": str(self.path)}
+
+    def optimize(self) -> None:
+        """Merge the FTS5 index segments; worth running after bulk loads"""
+        with self._lock:
+            self._conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
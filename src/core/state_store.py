@@ -0,0 +1,274 @@
+"""Shared analysis state backed by SQLite for multi-worker deployments"""
+
+import asyncio
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from collections.abc import MutableMapping
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from ..models.schemas import AnalysisResult, AnalysisStatus
+
+logger = logging.getLogger(__name__)
+
+
+def connect_shared_db(path: Path) -> sqlite3.Connection:
+    """Open a WAL-mode SQLite connection that can be shared by several processes"""
+    conn = sqlite3.connect(
+        str(path),
+        timeout=30,
+        isolation_level=None,
+        check_same_thread=False
+    )
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA busy_timeout=30000")
+    return conn
+
+
+class SQLiteResultCache(MutableMapping):
+    """Dict-like analysis registry shared by all worker processes.
+
+    Each worker runs the analyses it accepts; rows that are still pending or
+    in progress are visible to every worker. Unfinished rows carry a lease
+    that their worker renews every `lease_seconds / 3`; a row whose lease
+    has expired belongs to a worker that died or hung, and is failed by
+    whichever worker sweeps it first. Worker IDs include a random suffix,
+    so a recycled PID or a container restart never revives a lease.
+    """
+
+    def __init__(self, path: Path, lease_seconds: float = 60.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.recovered = 0
+        self._lock = threading.Lock()
+        self._conn = connect_shared_db(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS analyses (
+                request_id TEXT PRIMARY KEY,
+                status TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                worker_pid INTEGER NOT NULL,
+                updated_at REAL NOT NULL,
+                payload TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_analyses_status_created
+                ON analyses (status, created_at);
+            CREATE INDEX IF NOT EXISTS idx_analyses_created
+                ON analyses (created_at);
+        """)
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(analyses)")}
+        if "lease_owner" not in columns:
+            # Files from before leases: their unfinished rows expire on the first sweep
+            self._conn.execute("ALTER TABLE analyses ADD COLUMN lease_owner TEXT NOT NULL DEFAULT ''")
+            self._conn.execute("ALTER TABLE analyses ADD COLUMN lease_expires REAL NOT NULL DEFAULT 0")
+        self.recover_orphaned()
+        logger.info("Using shared analysis state at %s", path)
+
+    def __getitem__(self, request_id: str) -> AnalysisResult:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT payload FROM analyses WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        if row is None:
+            raise KeyError(request_id)
+        return AnalysisResult.model_validate_json(row[0])
+
+    def __setitem__(self, request_id: str, result: AnalysisResult) -> None:
+        now = time.time()
+        unfinished = result.status in (AnalysisStatus.PENDING, AnalysisStatus.IN_PROGRESS)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO analyses "
+                "(request_id, status, created_at, worker_pid, updated_at, payload, lease_owner, lease_expires) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    request_id,
+                    result.status.value,
+                    result.created_at.isoformat(),
+                    os.getpid(),
+                    now,
+                    result.model_dump_json(),
+                    self.worker_id,
+                    now + self.lease_seconds if unfinished else 0.0
+                )
+            )
+
+    def __delitem__(self, request_id: str) -> None:
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM analyses WHERE request_id = ?", (request_id,)
+            )
+        if cursor.rowcount == 0:
+            raise KeyError(request_id)
+
+    def __contains__(self, request_id: object) -> bool:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM analyses WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        return row is not None
+
+    def __iter__(self) -> Iterator[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT request_id FROM analyses").fetchall()
+        return iter([row[0] for row in rows])
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM analyses").fetchone()[0]
+
+    def items(self) -> List[Tuple[str, AnalysisResult]]:
+        """Load all analyses with a single query"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT request_id, payload FROM analyses"
+            ).fetchall()
+        return [
+            (request_id, AnalysisResult.model_validate_json(payload))
+            for request_id, payload in rows
+        ]
+
+    def values(self) -> List[AnalysisResult]:
+        """Load all analysis results with a single query"""
+        return [result for _, result in self.items()]
+
+    def newest(self, status: Optional[AnalysisStatus] = None, limit: int = 50, offset: int = 0) -> List[AnalysisResult]:
+        """Load one page of analyses, newest first"""
+        where, params = ("WHERE status = ? ", [status.value]) if status else ("", [])
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT payload FROM analyses {where}ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                [*params, limit, offset]
+            ).fetchall()
+        return [AnalysisResult.model_validate_json(row[0]) for row in rows]
+
+    def count_by_status(self, since: datetime) -> Dict[str, Tuple[int, int]]:
+        """Count analyses per status, in all and created after `since`"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*), SUM(created_at > ?) FROM analyses GROUP BY status", (since.isoformat(),)
+            ).fetchall()
+        return {status: (total, recent) for status, total, recent in rows}
+
+    def queue_depth(self) -> int:
+        """Number of analyses pending or in progress across all workers"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM analyses WHERE status IN (?, ?)",
+                (AnalysisStatus.PENDING.value, AnalysisStatus.IN_PROGRESS.value)
+            ).fetchone()[0]
+
+    def delete_created_before(self, cutoff: datetime) -> int:
+        """Delete analyses created before `cutoff`"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM analyses WHERE created_at < ?", (cutoff.isoformat(),)
+            )
+        return cursor.rowcount
+
+    def finished_before(self, cutoff: datetime, limit: int) -> List[AnalysisResult]:
+        """Load up to `limit` finished analyses created before `cutoff`, oldest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT payload FROM analyses WHERE created_at < ? AND status IN (?, ?) "
+                "ORDER BY created_at LIMIT ?",
+                (cutoff.isoformat(), AnalysisStatus.COMPLETED.value, AnalysisStatus.FAILED.value, limit)
+            ).fetchall()
+        return [AnalysisResult.model_validate_json(row[0]) for row in rows]
+
+    def iter_payloads(self,
+                      since: Optional[datetime] = None,
+                      until: Optional[datetime] = None,
+                      status: Optional[AnalysisStatus] = None,
+                      batch_size: int = 500) -> Iterator[Tuple[str, str, str]]:
+        """Yield (created_at, request_id, JSON payload) oldest first, one page at a time"""
+        # Spelled out rather than as a row value so the created_at index drives the scan
+        clauses, params = ["created_at >= ?", "(created_at > ? OR request_id > ?)"], []
+        if since:
+            clauses.append("created_at >= ?")
+            params.append(since.isoformat())
+        if until:
+            clauses.append("created_at < ?")
+            params.append(until.isoformat())
+        if status:
+            clauses.append("status = ?")
+            params.append(status.value)
+        sql = (
+            "SELECT created_at, request_id, payload FROM analyses "
+            f"WHERE {' AND '.join(clauses)} ORDER BY created_at, request_id LIMIT ?"
+        )
+        last = ("", "")
+        while True:
+            with self._lock:
+                rows = self._conn.execute(sql, [last[0], *last, *params, batch_size]).fetchall()
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            last = rows[-1][:2]
+
+    def renew_leases(self) -> int:
+        """Extend the leases of this worker's unfinished analyses"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE analyses SET lease_expires = ? WHERE lease_owner = ? AND status IN (?, ?)",
+                (
+                    time.time() + self.lease_seconds,
+                    self.worker_id,
+                    AnalysisStatus.PENDING.value,
+                    AnalysisStatus.IN_PROGRESS.value
+                )
+            )
+        return cursor.rowcount
+
+    def recover_orphaned(self) -> int:
+        """Fail unfinished analyses whose lease has expired"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT request_id, payload FROM analyses WHERE status IN (?, ?) AND lease_expires < ?",
+                    (AnalysisStatus.PENDING.value, AnalysisStatus.IN_PROGRESS.value, now)
+                ).fetchall()
+                for request_id, payload in rows:
+                    result = AnalysisResult.model_validate_json(payload)
+                    result.status = AnalysisStatus.FAILED
+                    result.error_message = "Worker exited before the analysis completed"
+                    result.completed_at = datetime.now()
+                    self._conn.execute(
+                        "UPDATE analyses SET status = ?, updated_at = ?, payload = ?, lease_expires = 0 "
+                        "WHERE request_id = ?",
+                        (result.status.value, now, result.model_dump_json(), request_id)
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+        if rows:
+            self.recovered += len(rows)
+            logger.warning("Marked %d orphaned analyses as failed", len(rows))
+        return len(rows)
+
+    async def run(self) -> None:
+        """Renew this worker's leases and fail expired ones until cancelled"""
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            try:
+                await asyncio.to_thread(self.renew_leases)
+                await asyncio.to_thread(self.recover_orphaned)
+            except Exception as e:
+                logger.error("Analysis lease sweep failed: %s", e)
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,135 @@
+"""Inverted index from ticker symbol to the analyses that included it"""
+
+import base64
+import logging
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ..config.settings import settings
+from .state_store import connect_shared_db
+
+logger = logging.getLogger(__name__)
+
+
+class InvalidCursorError(ValueError):
+    """A pagination cursor that this index did not issue"""
+
+
+def normalize_symbol(symbol: str) -> str:
+    return symbol.strip().upper()
+
+
+def encode_cursor(created_at: str, request_id: str) -> str:
+    return base64.urlsafe_b64encode(f"{created_at}|{request_id}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        created_at, request_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+        datetime.fromisoformat(created_at)
+    except ValueError as e:
+        raise InvalidCursorError(cursor) from e
+    return created_at, request_id
+
+
+class TickerIndex:
+    """Posting lists of (created_at, request_id) per symbol, newest first.
+
+    Rows are clustered by (symbol, created_at, request_id), so a page of one
+    symbol's history, or its latest analysis, is a single index range scan
+    however many analyses exist. Cursors encode the last row returned,
+    which keeps pages stable while new analyses arrive.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = connect_shared_db(path)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ticker_postings (
+                symbol TEXT NOT NULL,
+                created_at TEXT NOT NULL,
+                request_id TEXT NOT NULL,
+                status TEXT NOT NULL,
+                PRIMARY KEY (symbol, created_at, request_id)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_ticker_postings_request ON ticker_postings (request_id);
+            CREATE INDEX IF NOT EXISTS idx_ticker_postings_created ON ticker_postings (created_at);
+        """)
+
+    @classmethod
+    def from_settings(cls) -> "TickerIndex":
+        """Build the index from application settings"""
+        return cls(settings.reports_dir / "tickers.db")
+
+    def record(self, request_id: str, companies: List[str], created_at: datetime, status: str) -> None:
+        """Add an analysis under each of its symbols, or update its status"""
+        created = created_at.isoformat()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO ticker_postings (symbol, created_at, request_id, status) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (symbol, created_at, request_id) DO UPDATE SET status = excluded.status",
+                [(symbol, created, request_id, status) for symbol in {normalize_symbol(c) for c in companies}]
+            )
+
+    def delete(self, request_id: str) -> int:
+        """Remove an analysis from every symbol's postings"""
+        with self._lock:
+            return self._conn.execute("DELETE FROM ticker_postings WHERE request_id = ?", (request_id,)).rowcount
+
+    def delete_created_before(self, cutoff: datetime) -> int:
+        """Remove postings of analyses created before `cutoff`"""
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM ticker_postings WHERE created_at < ?", (cutoff.isoformat(),)
+            ).rowcount
+
+    def history(self,
+                symbol: str,
+                limit: int = 50,
+                cursor: Optional[str] = None,
+                status: Optional[str] = None) -> Dict[str, Any]:
+        """One page of a symbol's analyses, newest first"""
+        clauses, params = ["symbol = ?"], [normalize_symbol(symbol)]
+        if cursor:
+            clauses.append("(created_at, request_id) < (?, ?)")
+            params.extend(decode_cursor(cursor))
+        if status:
+            clauses.append("status = ?")
+            params.append(status)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT created_at, request_id, status FROM ticker_postings "
+                f"WHERE {' AND '.join(clauses)} ORDER BY created_at DESC, request_id DESC LIMIT ?",
+                params + [limit + 1]
+            ).fetchall()
+
+        page = rows[:limit]
+        return {
+            "symbol": normalize_symbol(symbol),
+            "analyses": [
+                {"request_id": request_id, "created_at": created_at, "status": row_status}
+                for created_at, request_id, row_status in page
+            ],
+            "next_cursor": encode_cursor(page[-1][0], page[-1][1]) if len(rows) > limit else None
+        }
+
+    def latest(self, symbol: str, status: Optional[str] = "completed") -> Optional[str]:
+        """Request ID of the newest analysis of `symbol`, by default the newest completed one"""
+        query = "SELECT request_id FROM ticker_postings WHERE symbol = ?"
+        params = [normalize_symbol(symbol)]
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        with self._lock:
+            row = self._conn.execute(query + " ORDER BY created_at DESC LIMIT 1", params).fetchone()
+        return row[0] if row else None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            symbols, postings = self._conn.execute(
+                "SELECT COUNT(DISTINCT symbol), COUNT(*) FROM ticker_postings"
+            ).fetchone()
+        return {"symbols": symbols, "postings": postings}
@@ -0,0 +1,40 @@
+"""Token estimation and model naming helpers"""
+
+from dataclasses import dataclass
+from typing import Any, Optional
+
+# Rough average for English prose across OpenAI and Anthropic tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens in a prompt or completion"""
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def provider_of(model: str) -> str:
+    """Get the provider prefix of a model identifier like 'openai/gpt-4o-mini'"""
+    return model.split("/", 1)[0] if "/" in model else "openai"
+
+
+@dataclass
+class CallUsage:
+    """Token usage of one agent call"""
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int = 0
+    reported: bool = False  # True when the provider reported usage, False for estimates
+
+
+def usage_from_output(output: Any) -> Optional[CallUsage]:
+    """Get provider-reported usage from an Upsonic run output, if present"""
+    usage = getattr(output, "usage", None)
+    prompt_tokens = getattr(usage, "input_tokens", None)
+    if not prompt_tokens:
+        return None
+    return CallUsage(
+        prompt_tokens=prompt_tokens,
+        completion_tokens=getattr(usage, "output_tokens", 0) or 0,
+        cached_tokens=getattr(usage, "cache_read_tokens", 0) or 0,
+        reported=True
+    )
@@ -0,0 +1,491 @@
+"""Tracing for analyses: spans, head sampling and batched exporters"""
+
+import abc
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from ..config.settings import settings
+
+try:
+    import fcntl
+except ImportError:
+    # No flock outside POSIX; the file exporter then assumes a single process
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Span:
+    """One timed operation within a trace"""
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    start_ns: int
+    end_ns: Optional[int] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = "ok"
+    error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, exc: BaseException) -> None:
+        """Mark the span failed without raising"""
+        self.status = "error"
+        self.error = f"{type(exc).__name__}: {exc}"
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end_ns or time.time_ns()) - self.start_ns) / 1e6
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class _NoopSpan:
+    """Stands in for spans of unsampled traces so call sites need no checks"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def record_error(self, exc: BaseException) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# Innermost open span of the current task; asyncio copies it into child tasks
+_current_span: ContextVar[Any] = ContextVar("current_span", default=None)
+
+
+class BatchSpanExporter(abc.ABC):
+    """Exports finished spans from a background thread in batches.
+
+    Spans are handed over through a bounded queue so the event loop never
+    does exporter I/O; when the queue is full new spans are dropped.
+    """
+
+    def __init__(self, batch_size: int = 256, interval: float = 2.0, max_queue: int = 10000):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.exported = 0
+        self._queue: "queue.Queue[Optional[Span]]" = queue.Queue(maxsize=max_queue)
+        self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+
+    def export(self, span: Span) -> None:
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """Flush queued spans and stop the export thread"""
+        if self._thread.is_alive():
+            try:
+                self._queue.put(None, timeout=timeout)
+            except queue.Full:
+                return
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        while True:
+            batch: List[Span] = []
+            deadline = time.monotonic() + self.interval
+            stopping = False
+            while len(batch) < self.batch_size:
+                try:
+                    span = self._queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if span is None:
+                    stopping = True
+                    break
+                batch.append(span)
+
+            if batch:
+                try:
+                    self._write(batch)
+                    self.exported += len(batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    logger.warning("Failed to export %d spans: %s", len(batch), e)
+            if stopping:
+                return
+
+    @abc.abstractmethod
+    def _write(self, batch: List[Span]) -> None:
+        """Send one batch of finished spans to the export target"""
+
+    def read_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Read a trace's spans back from the export target, if it supports that"""
+        return []
+
+
+class JsonlSpanExporter(BatchSpanExporter):
+    """Appends spans to a local JSON Lines file, rotated by size.
+
+    Once the file reaches `max_bytes` it is renamed to `<path>.1`, older
+    files shift up and the oldest beyond `backups` is deleted. Workers in
+    production mode share the file, so appends and rotations hold an
+    exclusive flock on `<path>.lock`. Spans are read back through an index
+    of the (inode, offset) pairs this process wrote for its last
+    `index_traces` traces; inodes survive renames, so a rotation by any
+    worker leaves the index valid and a lookup never scans the file.
+    Traces written by other workers or before a restart are not found.
+    """
+
+    def __init__(self,
+                 path: Path,
+                 max_bytes: int = 50 * 1024 * 1024,
+                 backups: int = 3,
+                 index_traces: int = 10000,
+                 **kwargs):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.index_traces = index_traces
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_path = path.with_name(f"{path.name}.lock")
+        self._index: "OrderedDict[str, List[Tuple[int, int]]]" = OrderedDict()
+        self._index_lock = threading.Lock()
+        super().__init__(**kwargs)
+
+    def _files(self) -> Iterator[Path]:
+        yield self.path
+        for age in range(1, self.backups + 1):
+            yield self.path.with_name(f"{self.path.name}.{age}")
+
+    @contextmanager
+    def _file_lock(self) -> Iterator[None]:
+        """Hold the lock every process appending to this path takes; closing the file releases it"""
+        with open(self._lock_path, "a") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def _rotate(self) -> None:
+        for age in range(self.backups, 0, -1):
+            source = self.path if age == 1 else self.path.with_name(f"{self.path.name}.{age - 1}")
+            if source.exists():
+                source.replace(self.path.with_name(f"{self.path.name}.{age}"))
+        if self.backups == 0:
+            self.path.unlink(missing_ok=True)
+
+    def _write(self, batch: List[Span]) -> None:
+        lines = [(json.dumps(span.to_dict(), default=str) + "\n").encode("utf-8") for span in batch]
+        with self._file_lock():
+            # Checked under the lock, since another worker may have just rotated
+            try:
+                if self.path.stat().st_size >= self.max_bytes:
+                    self._rotate()
+            except FileNotFoundError:
+                pass
+            with open(self.path, "ab") as f:
+                inode = os.fstat(f.fileno()).st_ino
+                position = f.seek(0, 2)
+                f.write(b"".join(lines))
+
+        offsets = []
+        for span, line in zip(batch, lines):
+            offsets.append((span.trace_id, position))
+            position += len(line)
+        with self._index_lock:
+            for trace_id, offset in offsets:
+                entries = self._index.get(trace_id)
+                if entries is None:
+                    entries = self._index[trace_id] = []
+                    while len(self._index) > self.index_traces:
+                        self._index.popitem(last=False)
+                entries.append((inode, offset))
+
+    def read_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        with self._index_lock:
+            entries = list(self._index.get(trace_id, []))
+        if not entries:
+            return []
+
+        spans = []
+        handles: Dict[int, Any] = {}
+        try:
+            # Open each live file once and key it by inode, wherever rotation has moved it
+            for path in self._files():
+                try:
+                    f = open(path, "rb")
+                except OSError:
+                    continue
+                inode = os.fstat(f.fileno()).st_ino
+                if inode in handles:
+                    f.close()
+                else:
+                    handles[inode] = f
+            for inode, offset in entries:
+                f = handles.get(inode)
+                if f is None:
+                    # Rotated out past the last backup
+                    continue
+                try:
+                    f.seek(offset)
+                    span = json.loads(f.readline())
+                except (OSError, ValueError) as e:
+                    # Truncated or overwritten outside the exporter
+                    logger.debug("Unreadable span of trace %s at offset %d: %s", trace_id, offset, e)
+                    continue
+                if isinstance(span, dict) and span.get("trace_id") == trace_id:
+                    spans.append(span)
+        finally:
+            for f in handles.values():
+                f.close()
+        return spans
+
+
+class OTLPHttpSpanExporter(BatchSpanExporter):
+    """Sends spans to an OTLP/HTTP collector using the JSON encoding"""
+
+    def __init__(self, endpoint: str, service_name: str, **kwargs):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self._client = httpx.Client(timeout=10.0)
+        super().__init__(**kwargs)
+
+    @staticmethod
+    def _attribute(key: str, value: Any) -> Dict[str, Any]:
+        if isinstance(value, bool):
+            encoded = {"boolValue": value}
+        elif isinstance(value, int):
+            encoded = {"intValue": str(value)}
+        elif isinstance(value, float):
+            encoded = {"doubleValue": value}
+        else:
+            encoded = {"stringValue": str(value)}
+        return {"key": key, "value": encoded}
+
+    def _encode(self, span: Span) -> Dict[str, Any]:
+        encoded = {
+            "traceId": span.trace_id,
+            "spanId": span.span_id,
+            "name": span.name,
+            "kind": 1,
+            "startTimeUnixNano": str(span.start_ns),
+            "endTimeUnixNano": str(span.end_ns),
+            "attributes": [self._attribute(k, v) for k, v in span.attributes.items()],
+            "status": {"code": 2, "message": span.error or ""} if span.status == "error" else {"code": 1},
+        }
+        if span.parent_id:
+            encoded["parentSpanId"] = span.parent_id
+        return encoded
+
+    def _write(self, batch: List[Span]) -> None:
+        payload = {
+            "resourceSpans": [{
+                "resource": {"attributes": [self._attribute("service.name", self.service_name)]},
+                "scopeSpans": [{
+                    "scope": {"name": "investment-analyzer"},
+                    "spans": [self._encode(span) for span in batch],
+                }],
+            }]
+        }
+        response = self._client.post(self.endpoint, json=payload)
+        response.raise_for_status()
+
+
+class Tracer:
+    """Creates spans and keeps recent traces in memory for timelines.
+
+    Sampling is decided once per root span; every span under an unsampled
+    root is a no-op. Spans started outside any root are not recorded.
+    """
+
+    def __init__(self,
+                 enabled: bool = True,
+                 sample_rate: float = 1.0,
+                 exporter: Optional[BatchSpanExporter] = None,
+                 buffer_traces: int = 500):
+        self.enabled = enabled
+        self.sample_rate = sample_rate
+        self.exporter = exporter
+        self.buffer_traces = buffer_traces
+        self._recent: "OrderedDict[str, List[Span]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "Tracer":
+        """Build the tracer and its exporter from application settings"""
+        exporter: Optional[BatchSpanExporter] = None
+        if settings.tracing_enabled:
+            kind = settings.trace_exporter.lower()
+            if kind == "file":
+                exporter = JsonlSpanExporter(
+                    settings.trace_file_path,
+                    max_bytes=int(settings.trace_file_max_mb * 1024 * 1024),
+                    backups=settings.trace_file_backups
+                )
+            elif kind == "otlp":
+                exporter = OTLPHttpSpanExporter(settings.trace_otlp_endpoint, settings.app_name)
+        return cls(
+            enabled=settings.tracing_enabled,
+            sample_rate=settings.trace_sample_rate,
+            exporter=exporter,
+            buffer_traces=settings.trace_buffer_size
+        )
+
+    @contextmanager
+    def start_span(self,
+                   name: str,
+                   root: bool = False,
+                   trace_id: Optional[str] = None,
+                   parent: Optional[Any] = None,
+                   **attributes) -> Iterator[Any]:
+        """Open a span as a child of the current one, or a new trace if `root`.
+
+        Pass `parent` to attach work that runs outside the request's task,
+        such as a background writer, to the span that handed it off.
+        """
+        parent = parent if parent is not None else _current_span.get()
+        if not self.enabled:
+            yield NOOP_SPAN
+            return
+
+        if root:
+            if random.random() >= self.sample_rate:
+                token = _current_span.set(NOOP_SPAN)
+                try:
+                    yield NOOP_SPAN
+                finally:
+                    _current_span.reset(token)
+                return
+            trace_id, parent_id = trace_id or uuid.uuid4().hex, None
+        elif parent is None or parent is NOOP_SPAN:
+            yield NOOP_SPAN
+            return
+        else:
+            trace_id, parent_id = parent.trace_id, parent.span_id
+
+        span = Span(
+            trace_id=trace_id,
+            span_id=uuid.uuid4().hex[:16],
+            parent_id=parent_id,
+            name=name,
+            start_ns=time.time_ns(),
+            attributes=attributes
+        )
+        token = _current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            if isinstance(e, Exception):
+                span.record_error(e)
+            else:
+                span.status = "cancelled"
+            raise
+        finally:
+            span.end_ns = time.time_ns()
+            _current_span.reset(token)
+            self._finish(span)
+
+    def current_span(self) -> Any:
+        """The span active in the calling context, or the no-op span"""
+        return _current_span.get() or NOOP_SPAN
+
+    def _finish(self, span: Span) -> None:
+        with self._lock:
+            spans = self._recent.get(span.trace_id)
+            if spans is None:
+                spans = self._recent[span.trace_id] = []
+                while len(self._recent) > self.buffer_traces:
+                    self._recent.popitem(last=False)
+            spans.append(span)
+        if self.exporter is not None:
+            self.exporter.export(span)
+
+    def get_trace(self, trace_id: str) -> List[Dict[str, Any]]:
+        """Get a trace's finished spans, from memory or the exporter"""
+        with self._lock:
+            spans = [span.to_dict() for span in self._recent.get(trace_id, [])]
+        if not spans and self.exporter is not None:
+            spans = self.exporter.read_trace(trace_id)
+        return spans
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Get tracing configuration and exporter counters"""
+        return {
+            "enabled": self.enabled,
+            "sample_rate": self.sample_rate,
+            "exporter": type(self.exporter).__name__ if self.exporter else None,
+            "exported_spans": self.exporter.exported if self.exporter else 0,
+            "dropped_spans": self.exporter.dropped if self.exporter else 0,
+            "buffered_traces": len(self._recent)
+        }
+
+
+def trace_id_for(request_id: str) -> str:
+    """Derive the 32-hex-digit trace ID of an analysis from its request ID"""
+    try:
+        return uuid.UUID(request_id).hex
+    except ValueError:
+        return uuid.uuid5(uuid.NAMESPACE_URL, request_id).hex
+
+
+def build_timeline(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Lay spans out as a flame-style timeline relative to the trace start"""
+    if not spans:
+        return {"trace_id": None, "duration_ms": 0.0, "spans": []}
+
+    by_id = {span["span_id"]: span for span in spans}
+
+    def depth(span: Dict[str, Any]) -> int:
+        level = 0
+        while span.get("parent_id") in by_id:
+            span = by_id[span["parent_id"]]
+            level += 1
+        return level
+
+    origin = min(span["start_ns"] for span in spans)
+    end = max(span["end_ns"] or span["start_ns"] for span in spans)
+    rows = []
+    for span in sorted(spans, key=lambda s: (s["start_ns"], depth(s))):
+        rows.append({
+            "name": span["name"],
+            "depth": depth(span),
+            "offset_ms": round((span["start_ns"] - origin) / 1e6, 3),
+            "duration_ms": round(((span["end_ns"] or span["start_ns"]) - span["start_ns"]) / 1e6, 3),
+            "status": span["status"],
+            "error": span.get("error"),
+            "attributes": span["attributes"],
+        })
+    return {"trace_id": spans[0]["trace_id"], "duration_ms": round((end - origin) / 1e6, 3), "spans": rows}
+
+
+def render_timeline(timeline: Dict[str, Any], width: int = 60) -> str:
+    """Render a timeline as indented text bars, one span per line"""
+    total = timeline["duration_ms"] or 1.0
+    lines = [f"trace {timeline['trace_id']}  {timeline['duration_ms']:.1f} ms"]
+    for row in timeline["spans"]:
+        start = int(width * row["offset_ms"] / total)
+        length = max(1, int(width * row["duration_ms"] / total))
+        label = ("  " * row["depth"] + row["name"])[:36]
+        marker = "" if row["status"] == "ok" else f"  [{row['status']}]"
+        lines.append(
+            f"{label:<36} |{' ' * start}{'#' * length}{' ' * max(0, width - start - length)}| "
+            f"{row['duration_ms']:>10.1f} ms{marker}"
+        )
+    return "\n".join(lines) + "\n"
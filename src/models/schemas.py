@@ -77,6 +77,14 @@ class PortfolioAllocation(BaseModel):
         }
 
 
+class AnalysisEstimate(BaseModel):
+    """Queue position and predicted completion of an unfinished analysis"""
+    queue_position: Optional[int] = Field(None, description="Position among pending analyses; None once running")
+    estimated_seconds: float = Field(..., description="Predicted runtime once admitted")
+    remaining_seconds: float = Field(..., description="Predicted seconds until completion, including any wait")
+    eta: datetime = Field(..., description="Predicted completion time")
+
+
 class AnalysisResult(BaseModel):
     """Complete analysis result"""
     request_id: str = Field(..., description="Unique identifier for the analysis request")
@@ -88,6 +96,7 @@ class AnalysisResult(BaseModel):
     error_message: Optional[str] = Field(None, description="Error message if analysis failed")
     created_at: datetime = Field(default_factory=datetime.now, description="When the analysis was created")
     completed_at: Optional[datetime] = Field(None, description="When the analysis was completed")
+    estimate: Optional[AnalysisEstimate] = Field(None, description="ETA while the analysis is pending or running")
     
     class Config:
         json_encoders = {
@@ -110,11 +119,45 @@ class AnalysisSummary(BaseModel):
         }
 
 
+class SearchHit(BaseModel):
+    """One phase report matching a search"""
+    request_id: str
+    phase: str
+    companies: List[str]
+    created_at: datetime
+    status: AnalysisStatus
+    snippet: str = Field(..., description="Matching excerpt with terms in **bold**")
+    score: float = Field(..., description="BM25 relevance, higher is better")
+
+
+class SearchResults(BaseModel):
+    """A page of search hits"""
+    query: str
+    results: List[SearchHit]
+    next_offset: Optional[int] = Field(None, description="Offset of the next page, if there is one")
+
+
+class TickerAnalysis(BaseModel):
+    """An analysis in a symbol's history"""
+    request_id: str
+    created_at: datetime
+    status: AnalysisStatus
+
+
+class TickerHistory(BaseModel):
+    """A page of one symbol's analyses, newest first"""
+    symbol: str
+    analyses: List[TickerAnalysis]
+    next_cursor: Optional[str] = Field(None, description="Cursor for the next page, if there is one")
+
+
 class HealthCheck(BaseModel):
     """Health check response"""
     status: str = "healthy"
     timestamp: datetime = Field(default_factory=datetime.now)
     version: str = "2.0.0"
+    event_loop_lag_ms: Optional[float] = Field(None, description="Most recent event loop lag")
+    event_loop_lag_p99_ms: Optional[float] = Field(None, description="P99 event loop lag over the recent window")
     
     class Config:
         json_encoders = {
@@ -1,56 +1,111 @@
 """Service layer for investment analysis operations"""
 
+import asyncio
 import logging
-from typing import List, Optional, Dict, Any
+import os
+import uuid
+from pathlib import Path
+from typing import Iterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 
 from ..models.schemas import (
+    AnalysisEstimate,
     AnalysisRequest,
     AnalysisResult,
     AnalysisSummary,
     AnalysisStatus
 )
 from ..core.analyzer import InvestmentAnalyzer
+from ..core.exports import iter_results, stream_ndjson, stream_reports_tar
+from ..core.idempotency import IdempotencyStore, fingerprint
+from ..core.loop_monitor import loop_monitor
+from ..core.memory import AllocationTracker, MemoryGuard, current_rss_bytes, registry_size_by_status
+from ..core.result_tiers import TieredResults
+from ..core.retention import RetentionSweeper
+from ..core.state_store import SQLiteResultCache
+from ..core.tracing import build_timeline, trace_id_for
 from ..config.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Seconds between looks for the analysis of a key claimed by another worker
+IDEMPOTENCY_POLL_INTERVAL = 0.1
+
 
 class InvestmentService:
     """Service layer for investment analysis operations"""
     
     def __init__(self):
         self.analyzer = InvestmentAnalyzer()
+        self.allocations = AllocationTracker()
+        self.memory_guard = MemoryGuard.from_settings(self.evict_oldest_analyses)
+        self.idempotency = IdempotencyStore.from_settings()
+        self.tiers = TieredResults.from_settings(self.analyzer.results_cache) if settings.tiering_enabled else None
+        # With tiering on, aged results are demoted to disk rather than deleted
+        self.retention = RetentionSweeper.from_settings(
+            self.analyzer.report_writer.store,
+            self.tiers.demote_before if self.tiers is not None else self.expire_analyses_before
+        )
+        if settings.tracemalloc_enabled:
+            self.allocations.start(settings.tracemalloc_frames)
     
-    async def create_analysis(self, request: AnalysisRequest) -> AnalysisResult:
+    async def create_analysis(self, request: AnalysisRequest, request_id: Optional[str] = None) -> AnalysisResult:
         """Create a new investment analysis"""
         try:
-            logger.info(f"Creating analysis for companies: {request.companies}")
-            result = await self.analyzer.analyze(request)
+            logger.info("Creating analysis for companies: %s", request.companies)
+            result = await self.analyzer.analyze(request, request_id)
             return result
         except Exception as e:
-            logger.error(f"Failed to create analysis: {str(e)}")
+            logger.error("Failed to create analysis: %s", e)
             raise
     
-    def get_analysis(self, request_id: str) -> Optional[AnalysisResult]:
-        """Get analysis by request ID"""
+    async def claim_idempotency_key(self,
+                                    request: AnalysisRequest,
+                                    key: str) -> Tuple[str, Optional[AnalysisResult]]:
+        """Resolve an Idempotency-Key to a new request ID to run, or the analysis it already started
+        
+        Raises IdempotencyKeyReusedError if the key was used with a different body.
+        """
+        body = fingerprint(request.model_dump(mode="json"))
+        while True:
+            request_id, claimed = await asyncio.to_thread(self.idempotency.claim, key, body, str(uuid.uuid4()))
+            if claimed:
+                return request_id, None
+            existing = await self.get_analysis(request_id)
+            if existing is not None:
+                logger.info("Replaying analysis %s for idempotency key %s", request_id, key)
+                return request_id, existing
+            # A fresh claim is another worker that has not stored its analysis yet; an old one lost it
+            if not await asyncio.to_thread(self.idempotency.release, key, request_id):
+                await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+    
+    async def get_analysis(self, request_id: str) -> Optional[AnalysisResult]:
+        """Get analysis by request ID from memory, then from the disk tiers
+        
+        Unfinished analyses run by this worker carry a fresh ETA.
+        """
         try:
-            return self.analyzer.get_analysis(request_id)
+            result = await self.analyzer.get_analysis(request_id)
+            if result is None and self.tiers is not None:
+                result = await asyncio.to_thread(self.tiers.get_stored, request_id)
+            if result is not None and result.status in (AnalysisStatus.PENDING, AnalysisStatus.IN_PROGRESS):
+                eta = self.analyzer.scheduler.eta(request_id)
+                if eta is not None:
+                    result = result.model_copy(update={"estimate": AnalysisEstimate(**eta)})
+            return result
         except Exception as e:
-            logger.error(f"Failed to get analysis {request_id}: {str(e)}")
+            logger.error("Failed to get analysis %s: %s", request_id, e)
             return None
     
-    def list_analyses(self, 
-                     status: Optional[AnalysisStatus] = None,
-                     limit: int = 50) -> List[AnalysisSummary]:
-        """List analyses with optional filtering"""
+    async def list_analyses(self,
+                            status: Optional[AnalysisStatus] = None,
+                            limit: int = 50,
+                            offset: int = 0) -> List[AnalysisSummary]:
+        """List analyses with optional filtering, newest first, one page at a time"""
         try:
-            analyses = self.analyzer.list_analyses()
-            
-            # Convert to summaries
-            summaries = []
-            for result in analyses.values():
-                summary = AnalysisSummary(
+            analyses = await self.analyzer.list_analyses(status=status, limit=limit, offset=offset)
+            return [
+                AnalysisSummary(
                     request_id=result.request_id,
                     companies=result.companies,
                     status=result.status,
@@ -58,81 +113,261 @@ class InvestmentService:
                     completed_at=result.completed_at,
                     error_message=result.error_message
                 )
-                summaries.append(summary)
-            
-            # Filter by status if provided
-            if status:
-                summaries = [s for s in summaries if s.status == status]
-            
-            # Sort by creation date (newest first) and limit
-            summaries.sort(key=lambda x: x.created_at, reverse=True)
-            return summaries[:limit]
+                for result in analyses
+            ]
             
         except Exception as e:
-            logger.error(f"Failed to list analyses: {str(e)}")
+            logger.error("Failed to list analyses: %s", e)
             return []
     
-    def delete_analysis(self, request_id: str) -> bool:
-        """Delete an analysis from cache"""
+    async def delete_analysis(self, request_id: str) -> bool:
+        """Delete an analysis from cache, the disk tiers and the indexes"""
         try:
-            if request_id in self.analyzer.results_cache:
-                del self.analyzer.results_cache[request_id]
-                logger.info(f"Deleted analysis {request_id}")
-                return True
-            return False
+            deleted = await asyncio.to_thread(self._delete_stored, request_id)
+            cache = self.analyzer.results_cache
+            if not isinstance(cache, SQLiteResultCache) and request_id in cache:
+                del cache[request_id]
+                deleted = True
+            if deleted:
+                logger.info("Deleted analysis %s", request_id)
+            return deleted
         except Exception as e:
-            logger.error(f"Failed to delete analysis {request_id}: {str(e)}")
+            logger.error("Failed to delete analysis %s: %s", request_id, e)
             return False
     
-    def cleanup_old_analyses(self, days: Optional[int] = None) -> int:
+    def _delete_stored(self, request_id: str) -> bool:
+        """Delete an analysis from SQLite-backed state; run off the loop"""
+        deleted = self.tiers.delete(request_id) if self.tiers is not None else False
+        if self.analyzer.search_index is not None:
+            self.analyzer.search_index.delete(request_id)
+        self.analyzer.ticker_index.delete(request_id)
+        cache = self.analyzer.results_cache
+        if isinstance(cache, SQLiteResultCache):
+            try:
+                del cache[request_id]
+                deleted = True
+            except KeyError:
+                pass
+        return deleted
+    
+    async def cleanup_old_analyses(self, days: Optional[int] = None) -> int:
         """Clean up old analyses older than specified days"""
         try:
             days = days or settings.max_report_age_days
             cutoff_date = datetime.now() - timedelta(days=days)
             
-            to_delete = []
-            for request_id, result in self.analyzer.results_cache.items():
-                if result.created_at < cutoff_date:
-                    to_delete.append(request_id)
+            cleaned = await self.expire_analyses_before(cutoff_date)
             
-            for request_id in to_delete:
-                del self.analyzer.results_cache[request_id]
-            
-            logger.info(f"Cleaned up {len(to_delete)} old analyses")
-            return len(to_delete)
+            logger.info("Cleaned up %d old analyses", cleaned)
+            return cleaned
             
         except Exception as e:
-            logger.error(f"Failed to cleanup old analyses: {str(e)}")
+            logger.error("Failed to cleanup old analyses: %s", e)
+            return 0
+    
+    async def expire_analyses_before(self, cutoff: datetime) -> int:
+        """Drop analyses created before `cutoff` without scanning newer ones"""
+        if self.analyzer.search_index is not None:
+            await asyncio.to_thread(self.analyzer.search_index.delete_created_before, cutoff)
+        await asyncio.to_thread(self.analyzer.ticker_index.delete_created_before, cutoff)
+        
+        cache = self.analyzer.results_cache
+        if isinstance(cache, SQLiteResultCache):
+            return await asyncio.to_thread(cache.delete_created_before, cutoff)
+        
+        # The dict keeps analyses in creation order, so expired ones come first
+        expired = []
+        for request_id, result in cache.items():
+            if result.created_at >= cutoff:
+                break
+            expired.append(request_id)
+        for request_id in expired:
+            del cache[request_id]
+        return len(expired)
+    
+    async def run_retention(self, days: Optional[int] = None) -> Dict[str, int]:
+        """Expire old analyses, their reports and legacy report directories now"""
+        return await self.retention.sweep(days)
+    
+    async def evict_oldest_analyses(self, fraction: float) -> int:
+        """Evict a fraction of cached analyses, oldest finished ones first"""
+        try:
+            cache = self.analyzer.results_cache
+            # Snapshot on the loop, choose and demote off it
+            evicted = await asyncio.to_thread(self._demote_oldest, list(cache.items()), fraction)
+            for request_id in evicted:
+                cache.pop(request_id, None)
+            return len(evicted)
+        except Exception as e:
+            logger.error("Failed to evict analyses: %s", e)
             return 0
     
-    def get_service_stats(self) -> Dict[str, Any]:
+    def _demote_oldest(self, cached: List[Tuple[str, AnalysisResult]], fraction: float) -> List[str]:
+        """Pick the oldest finished analyses to evict and move them to the warm tier"""
+        count = int(len(cached) * fraction) or 1
+        finished = sorted(
+            (result.completed_at or result.created_at, request_id, result)
+            for request_id, result in cached
+            if result.status in (AnalysisStatus.COMPLETED, AnalysisStatus.FAILED)
+        )[:count]
+        if self.tiers is not None:
+            # Keep evicted analyses readable from the warm tier
+            self.tiers.demote([result for _, _, result in finished])
+        return [request_id for _, request_id, _ in finished]
+    
+    async def get_memory_report(self, top: int = 20) -> Dict[str, Any]:
+        """Get RSS, the results cache's deep size by status and top allocation sites"""
+        rss = current_rss_bytes()
+        cache = self.analyzer.results_cache
+        report: Dict[str, Any] = {
+            "rss_mb": round(rss / 2**20, 1) if rss is not None else None,
+            "guard": self.memory_guard.get_stats(),
+            "results_cache": {"backend": type(cache).__name__, "count": len(cache)}
+        }
+        if isinstance(cache, dict):
+            # Snapshot on the loop, measure off it
+            results = list(cache.values())
+            report["results_cache"]["by_status"] = await asyncio.to_thread(registry_size_by_status, results)
+        report["tracemalloc"] = await asyncio.to_thread(self.allocations.get_stats, top)
+        return report
+    
+    async def get_analysis_timeline(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Get the span timeline of an analysis, if it was traced"""
+        # Traces no longer in memory are read back from the exporter's file
+        spans = await asyncio.to_thread(self.analyzer.tracer.get_trace, trace_id_for(request_id))
+        return build_timeline(spans) if spans else None
+    
+    async def get_report_manifest(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Get the stored reports of an analysis"""
+        return await asyncio.to_thread(self.analyzer.report_writer.store.get_manifest, request_id)
+    
+    async def get_report(self, request_id: str, name: str) -> Optional[str]:
+        """Get one report of an analysis as markdown"""
+        report = await asyncio.to_thread(self.analyzer.report_writer.store.read, request_id, name)
+        if report is None:
+            # Analyses written before the blob store kept one directory per request
+            legacy_path = settings.reports_dir / "investment" / request_id / name
+            if Path(request_id).name == request_id and Path(name).name == name and legacy_path.is_file():
+                report = await asyncio.to_thread(legacy_path.read_text, encoding="utf-8")
+        return report
+    
+    def export_analyses(self,
+                        since: Optional[datetime] = None,
+                        until: Optional[datetime] = None,
+                        status: Optional[AnalysisStatus] = None) -> Iterator[bytes]:
+        """Stream matching analyses from every tier as NDJSON, oldest first.
+        
+        Call on the event loop; iterate the result off it. Only an in-memory
+        results cache is snapshotted, and that as references, not copies.
+        """
+        cache = self.analyzer.results_cache
+        if isinstance(cache, SQLiteResultCache):
+            sources = [cache.iter_payloads(since, until, status)]
+        else:
+            sources = [iter_results(list(cache.values()), since, until, status)]
+        if self.tiers is not None:
+            sources.append(self.tiers.iter_payloads(since, until, status))
+        return stream_ndjson(sources)
+    
+    def export_reports(self,
+                       since: Optional[datetime] = None,
+                       until: Optional[datetime] = None) -> Iterator[bytes]:
+        """Stream the reports of analyses created in a date range as a tar.gz"""
+        return stream_reports_tar(
+            self.analyzer.report_writer.store.iter_reports(since, until),
+            legacy_dir=settings.reports_dir / "investment",
+            since=since,
+            until=until
+        )
+    
+    async def search_analyses(self,
+                              query: str,
+                              ticker: Optional[str] = None,
+                              status: Optional[AnalysisStatus] = None,
+                              since: Optional[datetime] = None,
+                              until: Optional[datetime] = None,
+                              limit: int = 20,
+                              offset: int = 0,
+                              sort: str = "relevance") -> Optional[Dict[str, Any]]:
+        """Full-text search over phase reports; None when search is disabled"""
+        if self.analyzer.search_index is None:
+            return None
+        return await asyncio.to_thread(
+            self.analyzer.search_index.search,
+            query,
+            ticker=ticker,
+            status=status.value if status else None,
+            since=since,
+            until=until,
+            limit=limit,
+            offset=offset,
+            sort=sort
+        )
+    
+    async def get_ticker_history(self,
+                                 symbol: str,
+                                 limit: int = 50,
+                                 cursor: Optional[str] = None,
+                                 status: Optional[AnalysisStatus] = None) -> Dict[str, Any]:
+        """Get one page of the analyses that included a symbol, newest first"""
+        return await asyncio.to_thread(
+            self.analyzer.ticker_index.history, symbol, limit, cursor, status.value if status else None
+        )
+    
+    async def get_latest_analysis(self, symbol: str) -> Optional[AnalysisResult]:
+        """Get the newest completed analysis that included a symbol"""
+        request_id = await asyncio.to_thread(self.analyzer.ticker_index.latest, symbol)
+        return await self.get_analysis(request_id) if request_id else None
+    
+    def get_phase_report(self) -> Dict[str, Any]:
+        """Get per-phase latency and cost by model configuration"""
+        return self.analyzer.phase_profiler.get_report()
+    
+    def _store_stats(self) -> Dict[str, Any]:
+        """Stats that query the on-disk stores; run off the loop"""
+        stats = {
+            "report_store": self.analyzer.report_writer.store.get_stats(),
+            "tickers": self.analyzer.ticker_index.get_stats()
+        }
+        if self.tiers is not None:
+            stats["tiers"] = self.tiers.get_stats()
+        if self.analyzer.search_index is not None:
+            stats["search"] = self.analyzer.search_index.get_stats()
+        return stats
+    
+    async def get_service_stats(self) -> Dict[str, Any]:
         """Get service statistics"""
         try:
-            analyses = self.analyzer.list_analyses()
+            recent_cutoff = datetime.now() - timedelta(hours=24)
+            counts = await self.analyzer.count_analyses(recent_cutoff)
             
             stats = {
-                "total_analyses": len(analyses),
-                "status_counts": {},
-                "recent_analyses": 0,
-                "service_uptime": datetime.now().isoformat()
+                "total_analyses": sum(total for total, _ in counts.values()),
+                "status_counts": {status: total for status, (total, _) in counts.items()},
+                "recent_analyses": sum(recent for _, recent in counts.values()),
+                "service_uptime": datetime.now().isoformat(),
+                "deployment_mode": settings.deployment_mode,
+                "worker_pid": os.getpid()
             }
             
-            # Count by status
-            for result in analyses.values():
-                status = result.status.value
-                stats["status_counts"][status] = stats["status_counts"].get(status, 0) + 1
-            
-            # Count recent analyses (last 24 hours)
-            recent_cutoff = datetime.now() - timedelta(hours=24)
-            stats["recent_analyses"] = sum(
-                1 for result in analyses.values() 
-                if result.created_at > recent_cutoff
-            )
+            stats["rate_limiter"] = self.analyzer.rate_limiter.get_stats()
+            stats["resilience"] = self.analyzer.resilience.get_stats()
+            stats["concurrency"] = self.analyzer.concurrency.get_stats()
+            stats["hedging"] = self.analyzer.hedger.get_stats()
+            stats["prompt_cache"] = self.analyzer.prompt_cache.get_stats()
+            stats["tracing"] = self.analyzer.tracer.get_stats()
+            stats["report_writer"] = self.analyzer.report_writer.get_stats()
+            stats["retention"] = self.retention.get_stats()
+            stats["idempotency"] = self.idempotency.get_stats()
+            stats["scheduler"] = self.analyzer.scheduler.get_stats()
+            stats["event_loop"] = loop_monitor.get_stats()
+            # Store queries grow with the report history and wait on writer threads
+            stats.update(await asyncio.to_thread(self._store_stats))
             
             return stats
             
         except Exception as e:
-            logger.error(f"Failed to get service stats: {str(e)}")
+            logger.error("Failed to get service stats: %s", e)
             return {"error": str(e)}
 
 
@@ -4,6 +4,7 @@ import streamlit as st
 import requests
 import json
 import time
+import uuid
 from datetime import datetime
 from typing import List, Optional, Dict, Any
 
@@ -31,20 +32,35 @@ def check_api_connection() -> bool:
 
 
 def create_analysis(companies: List[str], message: str) -> Optional[Dict[str, Any]]:
-    """Create a new analysis via API"""
+    """Create a new analysis via API
+    
+    The same companies and message reuse one Idempotency-Key until their
+    analysis finishes, so clicking again after a timeout picks up the
+    running analysis instead of starting a second one.
+    """
     try:
         payload = {
             "companies": companies,
             "message": message
         }
-        response = requests.post(f"{API_BASE_URL}/analyses", json=payload, timeout=300)
-        if response.status_code == 201:
-            return response.json()
+        keys = st.session_state.setdefault("idempotency_keys", {})
+        fingerprint = json.dumps(payload, sort_keys=True)
+        key = keys.setdefault(fingerprint, str(uuid.uuid4()))
+        response = requests.post(
+            f"{API_BASE_URL}/analyses", json=payload, headers={"Idempotency-Key": key}, timeout=300
+        )
+        if response.status_code in (200, 201):
+            result = response.json()
+            if result.get("status") in ("completed", "failed"):
+                keys.pop(fingerprint, None)
+            else:
+                st.info(f"Analysis {result.get('request_id')} is still running. Click again to check on it.")
+            return result
         else:
             st.error(f"API Error: {response.status_code} - {response.text}")
             return None
     except requests.exceptions.Timeout:
-        st.error("Analysis request timed out. The analysis might still be running in the background.")
+        st.error("Analysis request timed out. It is still running; click again to pick it up without starting another.")
         return None
     except Exception as e:
         st.error(f"Error creating analysis: {str(e)}")
@@ -0,0 +1,50 @@
+"""Slot accounting of the adaptive concurrency limit"""
+
+import asyncio
+
+import pytest
+
+from src.core.concurrency import AIMDLimit
+
+
+def test_cancelled_waiter_is_skipped_when_slots_free_up():
+    async def scenario():
+        limit = AIMDLimit("test-cancel", initial=1)
+        await limit.acquire()
+
+        cancelled = asyncio.create_task(limit.acquire())
+        queued = asyncio.create_task(limit.acquire())
+        await asyncio.sleep(0)
+        assert limit.waiting == 2
+
+        # Cancel and release before the cancelled task gets to run
+        cancelled.cancel()
+        limit.release()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await asyncio.wait_for(queued, timeout=1)
+
+        assert limit.in_flight == 1
+        assert limit.waiting == 0
+        limit.release()
+        assert limit.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_limit_is_reusable_after_cancelled_waits():
+    async def scenario():
+        limit = AIMDLimit("test-reuse", initial=1)
+        await limit.acquire()
+        waiters = [asyncio.create_task(limit.acquire()) for _ in range(3)]
+        await asyncio.sleep(0)
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        limit.release()
+
+        await asyncio.wait_for(limit.acquire(), timeout=1)
+        assert limit.in_flight == 1
+        assert limit.waiting == 0
+
+    asyncio.run(scenario())
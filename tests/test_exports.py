@@ -0,0 +1,26 @@
+"""Time bounds of bulk exports"""
+
+import os
+from datetime import datetime
+
+from src.core.exports import _legacy_files, iter_results, naive_local
+from src.models.schemas import AnalysisResult, AnalysisStatus
+
+
+def _result(request_id: str, created_at: datetime) -> AnalysisResult:
+    return AnalysisResult(request_id=request_id, companies=["AAPL"], status=AnalysisStatus.COMPLETED, created_at=created_at)
+
+
+def test_utc_bounds_compare_with_naive_timestamps(tmp_path):
+    since = naive_local(datetime.fromisoformat("2020-01-01T00:00:00Z"))
+    assert since.tzinfo is None
+    assert since == datetime.fromtimestamp(datetime.fromisoformat("2020-01-01T00:00:00+00:00").timestamp())
+
+    results = [_result("old", datetime(2019, 6, 1)), _result("new", datetime.now())]
+    assert [request_id for _, request_id, _ in iter_results(results, since=since)] == ["new"]
+
+    (tmp_path / "legacy").mkdir()
+    (tmp_path / "legacy" / "report.md").write_text("# Report")
+    os.utime(tmp_path / "legacy", (0, 0))
+    assert list(_legacy_files(tmp_path, since, None)) == []
+    assert naive_local(None) is None
@@ -0,0 +1,43 @@
+"""Ticker extraction and fault timing of the offline fake provider"""
+
+import asyncio
+import time
+
+import pytest
+
+from src.core.fake_provider import FakeAgent, FakeLatencyModel, FakeProviderError, _extract_tickers
+from src.core.prompts import (
+    build_investment_ranking_prompt,
+    build_portfolio_allocation_prompt,
+    build_stock_analysis_prompt
+)
+from src.models.schemas import InvestmentRanking, StockAnalysisResult
+
+
+def test_tickers_come_from_the_company_lines_only():
+    stock = StockAnalysisResult(
+        company_symbols="AMD, TSM",
+        market_analysis="**Companies:** AMD, TSM\n\nBoth MUST be watched; ONLY buy on dips.",
+        financial_metrics="n/a",
+        risk_assessment="n/a",
+        recommendations="n/a"
+    )
+    ranking = InvestmentRanking(
+        ranked_companies="Prefer AMD.\n\n**Companies:** AMD, TSM",
+        investment_rationale="n/a",
+        risk_evaluation="n/a",
+        growth_potential="n/a"
+    )
+
+    assert _extract_tickers(build_stock_analysis_prompt("AMD, TSM", "Analyze")) == ["AMD", "TSM"]
+    assert _extract_tickers(build_investment_ranking_prompt(stock)) == ["AMD", "TSM"]
+    assert _extract_tickers(build_portfolio_allocation_prompt(ranking)) == ["AMD", "TSM"]
+
+
+def test_injected_faults_wait_for_the_first_token():
+    agent = FakeAgent(latency=FakeLatencyModel(ttft_ms=100, ttft_jitter=0.0, rate_limit_rate=1.0))
+    started = time.monotonic()
+    with pytest.raises(FakeProviderError) as error:
+        asyncio.run(agent.do_async("COMPANIES TO ANALYZE: AAPL"))
+    assert error.value.status_code == 429
+    assert time.monotonic() - started >= 0.09
@@ -0,0 +1,26 @@
+"""Claiming and releasing Idempotency-Keys"""
+
+import time
+
+import pytest
+
+from src.core.idempotency import IdempotencyKeyReusedError, IdempotencyStore
+
+
+def test_repeat_claims_resolve_to_the_first_request(tmp_path):
+    store = IdempotencyStore(tmp_path / "keys.db")
+    assert store.claim("k", "body", "first") == ("first", True)
+    assert store.claim("k", "body", "second") == ("first", False)
+    with pytest.raises(IdempotencyKeyReusedError):
+        store.claim("k", "other body", "third")
+
+
+def test_fresh_claims_survive_release_until_the_grace_period(tmp_path):
+    store = IdempotencyStore(tmp_path / "keys.db", grace=0.1)
+    store.claim("k", "body", "first")
+    assert not store.release("k", "first")
+
+    time.sleep(0.15)
+    assert not store.release("k", "someone-else")
+    assert store.release("k", "first")
+    assert store.claim("k", "body", "second") == ("second", True)
@@ -0,0 +1,44 @@
+"""High- and low-water eviction of the memory guard"""
+
+import asyncio
+
+from src.core import memory
+from src.core.memory import MemoryGuard
+
+
+def _guard(cache: list, **options) -> MemoryGuard:
+    async def evict(fraction: float) -> int:
+        count = int(len(cache) * fraction) or 1
+        del cache[:count]
+        return count
+
+    return MemoryGuard(evict, high_water_mb=100, **options)
+
+
+def test_constant_rss_does_not_drain_the_cache(monkeypatch):
+    monkeypatch.setattr(memory, "current_rss_bytes", lambda: 200 * 2**20)
+    cache = list(range(100))
+    guard = _guard(cache, max_ineffective=2, cooldown=3600)
+
+    async def scenario():
+        for _ in range(20):
+            await guard.check()
+
+    asyncio.run(scenario())
+    assert guard.evictions == 2
+    assert guard.pauses == 1
+    assert len(cache) == 57
+
+
+def test_eviction_continues_while_rss_falls_and_stops_below_low_water(monkeypatch):
+    readings = iter([150, 120, 95, 85, 95, 95])
+    monkeypatch.setattr(memory, "current_rss_bytes", lambda: next(readings) * 2**20)
+    cache = list(range(100))
+    guard = _guard(cache, low_water_mb=90)
+
+    async def scenario():
+        return [await guard.check() for _ in range(6)]
+
+    # Still evicting at 95MB on the way down; re-armed below 90MB, so 95MB is under the high mark again
+    assert asyncio.run(scenario()) == [25, 18, 14, 0, 0, 0]
+    assert guard.pauses == 0
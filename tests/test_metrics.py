@@ -0,0 +1,40 @@
+"""Prometheus exposition in single-process and multiprocess mode"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from src.core.metrics import MetricsRegistry
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def test_callback_gauge_is_read_at_scrape_time():
+    metrics = MetricsRegistry(namespace="test")
+    gauge = metrics.gauge("waiting", "Waiting calls")
+    values = iter([1, 2])
+    gauge.set_function(lambda: next(values))
+
+    assert "test_waiting 1.0" in metrics.render().decode()
+    assert "test_waiting 2.0" in metrics.render().decode()
+
+
+def test_workers_are_scraped_together(tmp_path):
+    env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": str(ROOT)}
+    worker = (
+        "from src.core.metrics import MetricsRegistry\n"
+        "metrics = MetricsRegistry(namespace='test')\n"
+        "metrics.counter('done_total', 'Done').inc()\n"
+        "metrics.gauge('busy', 'Busy', multiprocess_mode='livesum').set_function(lambda: 2)\n"
+        "metrics.refresh()\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, "-c", worker], env=env, check=True)
+    scrape = subprocess.run(
+        [sys.executable, "-c", "from src.core.metrics import registry; print(registry.render().decode())"],
+        env=env, check=True, capture_output=True, text=True
+    ).stdout
+
+    assert "test_done_total 2.0" in scrape
+    assert "test_busy 4.0" in scrape
@@ -0,0 +1,27 @@
+"""Reservations in the client-side rate limiter"""
+
+import asyncio
+
+import pytest
+
+from src.core.rate_limiter import BucketLimit, ProviderRateLimiter
+
+
+def test_cancelled_wait_refunds_its_reservation():
+    async def scenario():
+        limiter = ProviderRateLimiter(default_limit=BucketLimit(rpm=60), max_wait=600)
+        for _ in range(60):
+            await limiter.acquire("openai/gpt-4o-mini", 10)
+
+        queued = asyncio.create_task(limiter.acquire("openai/gpt-4o-mini", 10))
+        await asyncio.sleep(0.05)
+        assert limiter.waiting == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        # Without the refund this caller would queue behind the cancelled one
+        assert limiter._reserve("openai/gpt-4o-mini", 10) < 1.5
+        assert limiter.get_stats()["refunded"] == 1
+
+    asyncio.run(scenario())
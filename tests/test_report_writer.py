@@ -0,0 +1,61 @@
+"""Retries of failed report batches"""
+
+import asyncio
+
+from src.core.report_store import ReportBlobStore
+from src.core.report_writer import ReportWriter
+from src.models.schemas import AnalysisResult, AnalysisStatus, StockAnalysisResult
+
+
+def _result(request_id: str) -> AnalysisResult:
+    return AnalysisResult(
+        request_id=request_id,
+        companies=["AAPL"],
+        status=AnalysisStatus.COMPLETED,
+        stock_analysis=StockAnalysisResult(
+            company_symbols="AAPL",
+            market_analysis="Steady growth.",
+            financial_metrics="P/E 28.",
+            risk_assessment="Moderate.",
+            recommendations="Hold."
+        )
+    )
+
+
+class _FlakyStore(ReportBlobStore):
+    def __init__(self, root, failures: int):
+        super().__init__(root, fsync=False)
+        self.failures = failures
+
+    def put_batch(self, analyses, rewrite=frozenset()):
+        if self.failures:
+            self.failures -= 1
+            raise OSError("disk busy")
+        return super().put_batch(analyses, rewrite)
+
+
+def _write(store: ReportBlobStore, writer: ReportWriter) -> None:
+    async def scenario():
+        await writer.submit("a", _result("a"))
+        await writer.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failed_batch_is_retried(tmp_path):
+    store = _FlakyStore(tmp_path, failures=2)
+    writer = ReportWriter(store, max_attempts=3, retry_delay=0.01)
+    _write(store, writer)
+
+    stats = writer.get_stats()
+    assert (stats["retries"], stats["failures"], stats["jobs_written"]) == (2, 0, 1)
+    assert store.read("a", "stock_analyst_report.md") is not None
+
+
+def test_batch_failing_every_attempt_is_recorded(tmp_path):
+    writer = ReportWriter(_FlakyStore(tmp_path, failures=5), max_attempts=2, retry_delay=0.01)
+    _write(writer.store, writer)
+
+    stats = writer.get_stats()
+    assert (stats["retries"], stats["failures"]) == (1, 1)
+    assert stats["failed_request_ids"] == ["a"]
@@ -0,0 +1,118 @@
+"""Circuit breaker state transitions in the resilience layer"""
+
+import asyncio
+
+import pytest
+
+from src.core.exceptions import CircuitOpenError, ClientRateLimitError, ModelError, NetworkError
+from src.core.resilience import BreakerState, ResilienceLayer, RetryPolicy
+
+
+def _layer(threshold: int = 2) -> ResilienceLayer:
+    return ResilienceLayer(RetryPolicy(max_attempts=1), failure_threshold=threshold, reset_timeout=60.0)
+
+
+async def _fail(error: Exception):
+    raise error
+
+
+async def _ok():
+    return "ok"
+
+
+def _expire(layer: ResilienceLayer, provider: str = "p") -> None:
+    layer.breaker(provider).opened_at -= layer.reset_timeout
+
+
+def test_breaker_opens_half_opens_and_closes():
+    async def scenario():
+        layer = _layer()
+        for _ in range(2):
+            with pytest.raises(NetworkError):
+                await layer.call("p", lambda: _fail(NetworkError("down")))
+        assert layer.breaker("p").state == BreakerState.OPEN
+
+        with pytest.raises(CircuitOpenError):
+            await layer.call("p", _ok)
+
+        _expire(layer)
+        assert await layer.call("p", _ok) == "ok"
+        assert layer.breaker("p").state == BreakerState.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_failed_trial_reopens_breaker():
+    async def scenario():
+        layer = _layer(threshold=1)
+        with pytest.raises(NetworkError):
+            await layer.call("p", lambda: _fail(NetworkError("down")))
+        _expire(layer)
+        with pytest.raises(NetworkError):
+            await layer.call("p", lambda: _fail(NetworkError("still down")))
+        assert layer.breaker("p").state == BreakerState.OPEN
+        with pytest.raises(CircuitOpenError):
+            await layer.call("p", _ok)
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_trial_lets_the_next_trial_through():
+    async def scenario():
+        layer = _layer(threshold=1)
+        with pytest.raises(NetworkError):
+            await layer.call("p", lambda: _fail(NetworkError("down")))
+        _expire(layer)
+
+        trial = asyncio.create_task(layer.call("p", lambda: asyncio.sleep(3600)))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        assert await layer.call("p", _ok) == "ok"
+        assert layer.breaker("p").state == BreakerState.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_permanent_error_in_trial_closes_breaker():
+    async def scenario():
+        layer = _layer(threshold=1)
+        with pytest.raises(NetworkError):
+            await layer.call("p", lambda: _fail(NetworkError("down")))
+        _expire(layer)
+        with pytest.raises(ModelError):
+            await layer.call("p", lambda: _fail(ModelError("bad request")))
+        assert layer.breaker("p").state == BreakerState.CLOSED
+
+    asyncio.run(scenario())
+
+
+def test_local_rate_limit_does_not_open_breaker():
+    async def scenario():
+        layer = _layer(threshold=1)
+        for _ in range(3):
+            with pytest.raises(ClientRateLimitError):
+                await layer.call("p", lambda: _fail(ClientRateLimitError("wait too long")))
+        assert layer.breaker("p").state == BreakerState.CLOSED
+        assert layer.breaker("p").consecutive_failures == 0
+
+    asyncio.run(scenario())
+
+
+def test_local_rate_limit_is_not_retried():
+    attempts = []
+
+    async def refused():
+        attempts.append(1)
+        raise ClientRateLimitError("wait too long")
+
+    async def scenario():
+        layer = ResilienceLayer(RetryPolicy(max_attempts=3, base_delay=0.0), failure_threshold=5, reset_timeout=60.0)
+        with pytest.raises(ClientRateLimitError):
+            await layer.call("p", refused)
+        assert layer.retries == 0
+
+    asyncio.run(scenario())
+    assert len(attempts) == 1
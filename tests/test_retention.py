@@ -0,0 +1,45 @@
+"""Ageing out and capping legacy per-analysis report directories"""
+
+import asyncio
+import os
+import time
+
+from src.core.report_store import ReportBlobStore
+from src.core.retention import RetentionSweeper
+
+
+def _legacy(root, count: int, age_days: float, size: int = 100) -> None:
+    stamp = time.time() - age_days * 86400
+    for i in range(count):
+        directory = root / f"{age_days:g}-{i}"
+        directory.mkdir(parents=True)
+        (directory / "report.md").write_bytes(b"x" * size)
+        os.utime(directory, (stamp, stamp))
+
+
+def _sweeper(tmp_path, **kwargs) -> RetentionSweeper:
+    return RetentionSweeper(
+        ReportBlobStore(tmp_path / "store", fsync=False), lambda cutoff: 0, legacy_dir=tmp_path / "legacy", **kwargs
+    )
+
+
+def test_young_directories_do_not_hide_old_ones(tmp_path):
+    _legacy(tmp_path / "legacy", 5, age_days=1)
+    _legacy(tmp_path / "legacy", 5, age_days=60)
+    sweeper = _sweeper(tmp_path, max_age_days=30, legacy_batch=2)
+
+    counts = [asyncio.run(sweeper.sweep())["legacy_dirs"] for _ in range(4)]
+
+    assert counts == [2, 2, 1, 0]
+    assert len(os.listdir(tmp_path / "legacy")) == 5
+
+
+def test_disk_cap_counts_legacy_directories(tmp_path):
+    _legacy(tmp_path / "legacy", 4, age_days=1, size=1000)
+    sweeper = _sweeper(tmp_path, max_age_days=30, max_bytes=2500)
+
+    removed = asyncio.run(sweeper.sweep())
+
+    assert removed["legacy_dirs"] == 2
+    assert removed["bytes"] == 2000
+    assert len(os.listdir(tmp_path / "legacy")) == 2
@@ -0,0 +1,31 @@
+"""Admission of queued analyses by the scheduler"""
+
+import asyncio
+
+import pytest
+
+from src.core.scheduler import AnalysisScheduler, RuntimeEstimator
+
+
+def test_cancelled_queued_job_is_skipped_on_release():
+    async def scenario():
+        scheduler = AnalysisScheduler(RuntimeEstimator(), max_concurrent=1)
+        await scheduler.acquire("running", 100)
+
+        cancelled = asyncio.create_task(scheduler.acquire("cancelled", 100))
+        queued = asyncio.create_task(scheduler.acquire("queued", 100))
+        await asyncio.sleep(0)
+
+        # Cancel and release before the cancelled task gets to run
+        cancelled.cancel()
+        scheduler.release("running")
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        await asyncio.wait_for(queued, timeout=1)
+
+        stats = scheduler.get_stats()
+        assert stats["running"] == 1
+        assert stats["queued"] == 0
+        assert scheduler.eta("cancelled") is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,53 @@
+"""Leases, pages and counts in the shared SQLite registry"""
+
+import time
+from datetime import datetime, timedelta
+
+from src.core.state_store import SQLiteResultCache
+from src.models.schemas import AnalysisResult, AnalysisStatus
+
+
+def _running(request_id: str) -> AnalysisResult:
+    return AnalysisResult(request_id=request_id, companies=["AAPL"], status=AnalysisStatus.IN_PROGRESS)
+
+
+def test_expired_leases_are_failed_and_renewed_ones_kept(tmp_path):
+    live = SQLiteResultCache(tmp_path / "state.db", lease_seconds=0.2)
+    dead = SQLiteResultCache(tmp_path / "state.db", lease_seconds=0.2)
+    live["kept"] = _running("kept")
+    dead["lost"] = _running("lost")
+
+    time.sleep(0.15)
+    assert live.renew_leases() == 1
+    time.sleep(0.1)
+
+    assert live.recover_orphaned() == 1
+    assert live["kept"].status == AnalysisStatus.IN_PROGRESS
+    assert live["lost"].status == AnalysisStatus.FAILED
+    # Another worker sweeping the same rows finds nothing left to fail
+    assert dead.recover_orphaned() == 0
+
+
+def test_finished_analyses_hold_no_lease(tmp_path):
+    cache = SQLiteResultCache(tmp_path / "state.db", lease_seconds=0.01)
+    result = _running("done")
+    result.status = AnalysisStatus.COMPLETED
+    cache["done"] = result
+    time.sleep(0.02)
+    assert cache.recover_orphaned() == 0
+    assert cache["done"].status == AnalysisStatus.COMPLETED
+
+
+def test_pages_and_counts_come_from_queries(tmp_path):
+    cache = SQLiteResultCache(tmp_path / "state.db")
+    now = datetime.now()
+    for index in range(5):
+        status = AnalysisStatus.FAILED if index % 2 else AnalysisStatus.COMPLETED
+        cache[f"r{index}"] = AnalysisResult(
+            request_id=f"r{index}", companies=["AAPL"], status=status, created_at=now - timedelta(days=4 - index)
+        )
+
+    assert [r.request_id for r in cache.newest(limit=2)] == ["r4", "r3"]
+    assert [r.request_id for r in cache.newest(limit=2, offset=2)] == ["r2", "r1"]
+    assert [r.request_id for r in cache.newest(AnalysisStatus.FAILED)] == ["r3", "r1"]
+    assert cache.count_by_status(now - timedelta(days=1, hours=12)) == {"completed": (3, 1), "failed": (2, 1)}
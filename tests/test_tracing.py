@@ -0,0 +1,46 @@
+"""Reading spans back from the rotating JSON Lines exporter"""
+
+import time
+
+from src.core.tracing import JsonlSpanExporter, Span
+
+
+def _span(trace_id: str, span_id: str) -> Span:
+    now = time.time_ns()
+    return Span(trace_id, span_id, None, "work", now, now)
+
+
+def test_read_trace_survives_rotation_and_bad_lines(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = JsonlSpanExporter(path, max_bytes=1, backups=1, interval=0.01)
+    try:
+        exporter._write([_span("old", "a")])
+        exporter._write([_span("kept", "b")])
+        exporter._write([_span("kept", "c")])
+    finally:
+        exporter.shutdown()
+
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["traces.jsonl", "traces.jsonl.1", "traces.jsonl.lock"]
+    assert exporter.read_trace("old") == []
+    assert [span["span_id"] for span in exporter.read_trace("kept")] == ["b", "c"]
+
+    path.write_bytes(b"not json\n")
+    assert [span["span_id"] for span in exporter.read_trace("kept")] == ["b"]
+    assert exporter.read_trace("missing") == []
+
+
+def test_workers_sharing_a_file_keep_their_indexes_across_each_others_rotations(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    first = JsonlSpanExporter(path, max_bytes=200, backups=5, interval=0.01)
+    second = JsonlSpanExporter(path, max_bytes=200, backups=5, interval=0.01)
+    try:
+        for index in range(6):
+            first._write([_span("first", f"a{index}")])
+            second._write([_span("second", f"b{index}")])
+    finally:
+        first.shutdown()
+        second.shutdown()
+
+    assert len(list(tmp_path.glob("traces.jsonl.*"))) > 2
+    assert [span["span_id"] for span in first.read_trace("first")] == [f"a{index}" for index in range(6)]
+    assert [span["span_id"] for span in second.read_trace("second")] == [f"b{index}" for index in range(6)]